@@ -2,18 +2,28 @@
 
 from __future__ import annotations
 
-from typing import List
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+import asyncio
+import hmac
 import os
+import time
 from pathlib import Path
 
-from fastapi import FastAPI
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+if TYPE_CHECKING:  # the OpenAI SDK is imported at startup, next to the data load
+    from openai import AsyncOpenAI
+
 # Fallback: allow direct execution (python backend/app/main.py) by injecting backend dir.
 try:
     from app.models import (
         SearchRequest,
-        VenueResult,
+        StructuredSearchRequest,
+        BatchSearchRequest,
+        VenueResultFields,
         PromptSearchRequest,
         PromptSearchResponse,
     )
@@ -21,15 +31,31 @@ try:
         NightTwinSearchEngine,
         SearchQueryParams,
         GuardedSearchResult,
+        data_version,
     )
     from app.services.prompt_parser import PromptParser
+    from app.services.engine_reloader import EngineReloader
+    from app.services.response_encoder import encode_object, select_fields
+    from app.services.embedding_cache import QueryEmbeddingCache
+    from app.services.embedding_provider import OpenAIEmbeddingProvider
+    from app.services.metrics import (
+        CACHE_LOOKUPS,
+        CONTENT_TYPE,
+        GUARDRAIL_OUTCOMES,
+        REGISTRY,
+        RequestMetricsMiddleware,
+        cache_stats_source,
+        stage_timer,
+    )
 except ModuleNotFoundError:  # running as a plain script, not with backend on PYTHONPATH
     import sys, pathlib
     _backend_dir_for_path = pathlib.Path(__file__).resolve().parent.parent
     sys.path.insert(0, str(_backend_dir_for_path))
     from app.models import (
         SearchRequest,
-        VenueResult,
+        StructuredSearchRequest,
+        BatchSearchRequest,
+        VenueResultFields,
         PromptSearchRequest,
         PromptSearchResponse,
     )
@@ -37,8 +63,25 @@ except ModuleNotFoundError:  # running as a plain script, not with backend on PY
         NightTwinSearchEngine,
         SearchQueryParams,
         GuardedSearchResult,
+        data_version,
     )
     from app.services.prompt_parser import PromptParser
+    from app.services.engine_reloader import EngineReloader
+    from app.services.response_encoder import encode_object, select_fields
+    from app.services.embedding_cache import QueryEmbeddingCache
+    from app.services.embedding_provider import OpenAIEmbeddingProvider
+    from app.services.metrics import (
+        CACHE_LOOKUPS,
+        CONTENT_TYPE,
+        GUARDRAIL_OUTCOMES,
+        REGISTRY,
+        RequestMetricsMiddleware,
+        cache_stats_source,
+        stage_timer,
+    )
+
+
+_app_import_seconds = time.perf_counter() - _import_started
 
 
 # Simple .env loader (dependency-free)
@@ -86,28 +129,252 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    RequestMetricsMiddleware,
+    endpoints=["/search", "/search/batch", "/prompt-search", "/health", "/metrics", "/admin/reload"],
+)
 
-search_engine: NightTwinSearchEngine | None = None
+# Serving engine snapshot; replaced on data reloads (see EngineReloader)
+engine_reloader: EngineReloader | None = None
+_reload_watch_task: asyncio.Task | None = None
+_reload_request_task: asyncio.Task | None = None
+# How often workers check for reload requests written by /admin/reload in another worker
+RELOAD_REQUEST_POLL_SECONDS = 2.0
 prompt_parser: PromptParser | None = None
+# One async OpenAI client (one connection pool) shared by parser and engine
+openai_async_client: AsyncOpenAI | None = None
+# Seconds per startup step (logged once, and reported by /health)
+startup_timings: Dict[str, Any] = {}
+
+
+# Data loaded by the gunicorn master before it forks workers (see
+# gunicorn.conf.py and preload_engine()); None when every worker loads its own.
+_preloaded_engine: NightTwinSearchEngine | None = None
+
+
+def preload_engine() -> None:
+    """
+    Load the engine data in the current (master) process, so forked
+    workers share its arrays instead of each loading a private copy.
+
+    No connections are opened here: the preloaded engine gets a memory-only,
+    disabled query cache, and each worker attaches its own embedding
+    provider and cache at startup (NightTwinSearchEngine.for_worker()).
+    """
+    global _preloaded_engine
+    _preloaded_engine = NightTwinSearchEngine(embedding_cache=QueryEmbeddingCache(max_entries=0))
+
+
+def _build_engine(previous: Optional[NightTwinSearchEngine]) -> NightTwinSearchEngine:
+    """
+    New engine snapshot; reloads keep the embedding provider and query cache.
+    A worker forked after a reload (e.g. gunicorn respawning one) loads the
+    current files itself instead of serving the master's outdated data.
+    """
+    if previous is None:
+        preloaded = _preloaded_engine
+        if preloaded is not None and data_version(preloaded.data_dir) == preloaded.version:
+            return preloaded.for_worker(async_openai_client=openai_async_client)
+        return NightTwinSearchEngine(async_openai_client=openai_async_client)
+    return NightTwinSearchEngine(
+        async_openai_client=openai_async_client,
+        embedding_provider=previous.embedding_provider,
+        embedding_cache=previous.embedding_cache,
+    )
+
+
+def _reload_request_path() -> Optional[Path]:
+    """
+    File through which /admin/reload reaches every worker process:
+    NIGHTTWIN_RELOAD_REQUEST_PATH, else <data dir>/.reload_request when the
+    engine was preloaded for several gunicorn workers; None for one process.
+    """
+    path = os.getenv("NIGHTTWIN_RELOAD_REQUEST_PATH")
+    if path:
+        return Path(path)
+    if _preloaded_engine is not None:
+        return _preloaded_engine.data_dir / ".reload_request"
+    return None
+
+
+def current_engine() -> NightTwinSearchEngine:
+    """
+    The serving snapshot. Handlers read it once per request, so a request
+    runs start to finish on one snapshot even if a reload swaps it meanwhile.
+    """
+    assert engine_reloader is not None, "Search engine not initialized"
+    return engine_reloader.engine
+
+def _json_response(encode: Callable[[], bytes]) -> Response:
+    """Run a JSON encoder, timed as the "serialization" stage."""
+    with stage_timer("serialization"):
+        body = encode()
+    return Response(content=body, media_type="application/json")
+
+
+def _prompt_search_body(
+    status: str,
+    reason: Optional[str],
+    parsed_query: Optional[SearchRequest],
+    venues_json: bytes = b"[]",
+) -> bytes:
+    """A PromptSearchResponse as JSON, with its venues already encoded."""
+    return encode_object(
+        {
+            "status": status,
+            "reason": reason,
+            "parsed_query": parsed_query.model_dump() if parsed_query is not None else None,
+        },
+        raw={"venues": venues_json},
+    )
+
+
+def _invalid_prompt_response(reason: str) -> Response:
+    GUARDRAIL_OUTCOMES.labels("invalid").inc()
+    return _json_response(lambda: _prompt_search_body("invalid", reason, None))
+
+
+def _create_openai_async_client(api_key: Optional[str]) -> Optional[AsyncOpenAI]:
+    if not api_key:
+        return None
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=api_key)
+
+
+def _timed_startup_step(step: str, fn: Callable[..., Any], *args: Any) -> Any:
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        startup_timings[step] = round(time.perf_counter() - start, 4)
 
 
 @app.on_event("startup")
-def startup_event() -> None:
+async def startup_event() -> None:
     """
     Initialize the NightTwinSearchEngine and PromptParser once
     when the FastAPI app starts.
+
+    The independent parts run concurrently in worker threads: the OpenAI
+    SDK import + shared client, the engine data (which itself loads config,
+    venues and nights in parallel) and the prompt parser. The client is
+    handed to the parser and the embedding provider once all are done.
+
+    With NIGHTTWIN_RELOAD_POLL_SECONDS > 0 the data directory is watched and
+    changed artifacts are loaded into a new engine snapshot in the background.
+    With several workers, each also follows reloads requested through another
+    worker's /admin/reload (see _reload_request_path()).
     """
-    global search_engine, prompt_parser
-    search_engine = NightTwinSearchEngine()
-    prompt_parser = PromptParser()
+    global engine_reloader, _reload_watch_task, _reload_request_task, prompt_parser, openai_async_client
+    started = time.perf_counter()
+    openai_async_client, engine_reloader, prompt_parser = await asyncio.gather(
+        asyncio.to_thread(
+            _timed_startup_step, "openai_client", _create_openai_async_client, os.getenv("OPENAI_API_KEY")
+        ),
+        asyncio.to_thread(
+            _timed_startup_step, "engine", EngineReloader, _build_engine, _reload_request_path()
+        ),
+        asyncio.to_thread(_timed_startup_step, "prompt_parser", PromptParser),
+    )
+    if openai_async_client is not None:
+        prompt_parser.async_client = openai_async_client
+        provider = engine_reloader.engine.embedding_provider
+        if isinstance(provider, OpenAIEmbeddingProvider) and provider.async_client is None:
+            provider.async_client = openai_async_client
+
+    startup_timings["app_import"] = round(_app_import_seconds, 4)
+    startup_timings["total"] = round(time.perf_counter() - started, 4)
+    startup_timings["engine_steps"] = dict(engine_reloader.engine.load_timings)
+    print(
+        "[startup] ready in {total:.3f}s (app import {app_import:.3f}s, openai client {openai_client:.3f}s, "
+        "engine {engine:.3f}s, prompt parser {prompt_parser:.3f}s); engine steps: {steps}".format(
+            steps=", ".join(f"{k}={v:.3f}s" for k, v in startup_timings["engine_steps"].items()),
+            **startup_timings,
+        ),
+        flush=True,
+    )
+
+    poll_seconds = float(os.getenv("NIGHTTWIN_RELOAD_POLL_SECONDS", "0"))
+    if poll_seconds > 0:
+        _reload_watch_task = asyncio.create_task(engine_reloader.watch(poll_seconds))
+    if engine_reloader.request_path is not None:
+        _reload_request_task = asyncio.create_task(
+            engine_reloader.watch_requests(RELOAD_REQUEST_POLL_SECONDS)
+        )
+
+    # Cache hit/miss counters are read from the caches at scrape time
+    CACHE_LOOKUPS.add_source(cache_stats_source("query_embedding", engine_reloader.engine.embedding_cache.stats))
+    CACHE_LOOKUPS.add_source(cache_stats_source("prompt_parse", prompt_parser.parse_cache.stats))
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    """Close the shared OpenAI connection pool and the embedding provider's connections."""
+    for task in (_reload_watch_task, _reload_request_task):
+        if task is not None:
+            task.cancel()
+    if engine_reloader is not None and engine_reloader.engine.embedding_provider is not None:
+        await engine_reloader.engine.embedding_provider.aclose()
+    if openai_async_client is not None:
+        await openai_async_client.close()
 
 
 @app.get("/health")
 def health_check():
     """
-    Simple health check endpoint.
+    Simple health check endpoint (plus the serving data snapshot).
+    """
+    if engine_reloader is None:
+        return {"status": "ok"}
+    return {
+        "status": "ok",
+        "data_version": engine_reloader.version,
+        "data_generation": engine_reloader.generation,
+        "startup": startup_timings,
+    }
+
+
+@app.get("/metrics")
+def metrics() -> Response:
+    """
+    Prometheus metrics (text exposition format): request latency, per-stage
+    latency, candidate set sizes, guardrail outcomes and cache hit rates.
+    Counters are per worker process.
+    """
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.post("/admin/reload")
+async def admin_reload(force: bool = False, x_admin_token: str | None = Header(default=None)):
+    """
+    Load changed data artifacts (venues.csv, nights bundle / jsonl,
+    features_config.json) into a new engine snapshot and swap it in.
+    Requests in flight finish on the old snapshot. Unless force=true,
+    nothing is loaded when the files did not change.
+
+    The worker receiving the request reloads before responding; with several
+    workers, the others follow within RELOAD_REQUEST_POLL_SECONDS
+    ("all_workers": true in the response).
+
+    Requires the X-Admin-Token header to match NIGHTTWIN_ADMIN_TOKEN; the
+    endpoint is disabled when that is not set.
     """
-    return {"status": "ok"}
+    expected = os.getenv("NIGHTTWIN_ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (NIGHTTWIN_ADMIN_TOKEN is not set).")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+    assert engine_reloader is not None, "Search engine not initialized"
+
+    try:
+        result = await engine_reloader.request_reload(force=force)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Reload failed, still serving data version {engine_reloader.version}: {e}",
+        ) from e
+    return {**result._asdict(), "all_workers": engine_reloader.request_path is not None}
 
 
 if __name__ == "__main__":
@@ -153,14 +420,20 @@ if __name__ == "__main__":
         raise
 
 
-@app.post("/search", response_model=List[VenueResult])
-def search_structured(req: SearchRequest):
+@app.post(
+    "/search",
+    responses={200: {"model": List[VenueResultFields], "description": "Best venues, best first"}},
+)
+async def search_structured(req: StructuredSearchRequest):
     """
     Structured search endpoint.
     Frontend sends already structured parameters (city, day, time, etc.),
     we simply map them into SearchQueryParams and call the search engine.
+
+    Async: the embedding call is awaited on the event loop and only the
+    scoring runs in a worker thread.
     """
-    assert search_engine is not None, "Search engine not initialized"
+    search_engine = current_engine()
 
     q = SearchQueryParams(
         city=req.city,
@@ -172,26 +445,60 @@ def search_structured(req: SearchRequest):
         tags=req.tags,
     )
 
-    results = search_engine.search(q)
-
-    api_results: List[VenueResult] = []
-    for r in results:
-        api_results.append(
-            VenueResult(
-                venue_id=r.venue_id,
-                name=r.name,
-                city=r.city,
-                area=r.area,
-                venue_type=r.venue_type,
-                score=r.score,
-                reasons=r.reasons,
-            )
+    fields = select_fields(req.fields)
+    results = await search_engine.asearch(
+        q,
+        ann_nprobe=req.ann_nprobe,
+        with_reasons="reasons" in fields,
+    )
+
+    return _json_response(lambda: search_engine.result_encoder.encode_results(results, fields))
+
+
+@app.post(
+    "/search/batch",
+    responses={200: {"model": List[List[VenueResultFields]], "description": "Best venues per query, in request order"}},
+)
+async def search_batch(req: BatchSearchRequest):
+    """
+    Batch version of /search for integrations sending many queries at once
+    (e.g. one per city or per day of the week).
+
+    All query texts are embedded in one embeddings request and queries
+    hitting the same city/weekend partition are scored together, so N
+    queries cost one API round trip and roughly one scan per partition.
+    Returns one list of venues per query, in request order.
+    """
+    search_engine = current_engine()
+
+    qs = [
+        SearchQueryParams(
+            city=item.city,
+            day_of_week=item.day_of_week,
+            time=item.time,
+            group_size=item.group_size,
+            budget_level=item.budget_level,
+            party_level=item.party_level,
+            tags=item.tags,
         )
-    return api_results
+        for item in req.queries
+    ]
+
+    fields = select_fields(req.fields)
+    batch_results = await search_engine.asearch_many(
+        qs,
+        ann_nprobe=req.ann_nprobe,
+        with_reasons="reasons" in fields,
+    )
+
+    return _json_response(lambda: search_engine.result_encoder.encode_batch(batch_results, fields))
 
 
-@app.post("/prompt-search", response_model=PromptSearchResponse)
-def prompt_search(req: PromptSearchRequest):
+@app.post(
+    "/prompt-search",
+    responses={200: {"model": PromptSearchResponse, "description": "Guardrail verdict and venues"}},
+)
+async def prompt_search(req: PromptSearchRequest):
     """
     Prompt-based search endpoint.
 
@@ -204,31 +511,25 @@ def prompt_search(req: PromptSearchRequest):
            - "no_match"  -> no sufficiently similar nights.
            - "too_broad" -> too many very similar nights.
       4. We return PromptSearchResponse with status, reason, parsed_query and venues.
+
+    Async: both OpenAI calls (parse, embedding) are awaited on the event loop;
+    only the scoring runs in a worker thread.
     """
-    assert search_engine is not None, "Search engine not initialized"
+    search_engine = current_engine()
     assert prompt_parser is not None, "Prompt parser not initialized"
 
     # 1) Parse free-text prompt with GPT
-    parsed = prompt_parser.parse_prompt(req.prompt)
+    with stage_timer("parse"):
+        parsed = await prompt_parser.aparse_prompt(req.prompt)
 
     if not parsed.valid:
         # Not even a valid nightlife request
-        return PromptSearchResponse(
-            status="invalid",
-            reason="Your prompt does not look like a nightlife request in Serbia.",
-            parsed_query=None,
-            venues=[],
-        )
+        return _invalid_prompt_response("Your prompt does not look like a nightlife request in Serbia.")
 
     # 2) Convert ParsedPrompt -> SearchRequest (with reasonable fallbacks)
     search_req = prompt_parser.to_search_request(parsed)
     if search_req is None:
-        return PromptSearchResponse(
-            status="invalid",
-            reason="Could not extract a meaningful query from your prompt.",
-            parsed_query=None,
-            venues=[],
-        )
+        return _invalid_prompt_response("Could not extract a meaningful query from your prompt.")
 
     # 3) Map into engine-level query params
     q = SearchQueryParams(
@@ -242,35 +543,22 @@ def prompt_search(req: PromptSearchRequest):
     )
 
     # 4) Run guarded search
-    guarded: GuardedSearchResult = search_engine.search_with_prompt_guardrail(q)
+    fields = select_fields(req.fields)
+    guarded: GuardedSearchResult = await search_engine.asearch_with_prompt_guardrail(
+        q, with_reasons="reasons" in fields
+    )
+    GUARDRAIL_OUTCOMES.labels(guarded.status).inc()
 
     # 5) If prompt is bad (too broad or no match) -> return status and explanation
     if guarded.status != "ok":
-        return PromptSearchResponse(
-            status=guarded.status,
-            reason=guarded.reason,
-            parsed_query=search_req,
-            venues=[],
+        return _json_response(
+            lambda: _prompt_search_body(guarded.status, guarded.reason, search_req)
         )
 
-    # 6) Map internal results to API models
-    venue_results: List[VenueResult] = []
-    for v in guarded.venues:
-        venue_results.append(
-            VenueResult(
-                venue_id=v.venue_id,
-                name=v.name,
-                city=v.city,
-                area=v.area,
-                venue_type=v.venue_type,
-                score=v.score,
-                reasons=v.reasons,
-            )
-        )
-
-    return PromptSearchResponse(
-        status="ok",
-        reason=guarded.reason,
-        parsed_query=search_req,
-        venues=venue_results,
-    )
+    # 6) Encode the venues straight from the engine results
+    return _json_response(lambda: _prompt_search_body(
+        "ok",
+        guarded.reason,
+        search_req,
+        search_engine.result_encoder.encode_results(guarded.venues, fields),
+    ))
@@ -2,8 +2,12 @@
 
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
+from typing_extensions import TypedDict
+
+# Fields of a VenueResult, for the optional `fields` selection of the search endpoints
+VenueResultField = Literal["venue_id", "name", "city", "area", "venue_type", "score", "reasons"]
 
 
 class SearchRequest(BaseModel):
@@ -21,6 +25,29 @@ class SearchRequest(BaseModel):
     tags: List[str] = Field(default_factory=list)  # e.g. ["kafana", "live music"]
 
 
+class StructuredSearchRequest(SearchRequest):
+    """
+    Body of the /search endpoint: a SearchRequest plus optional
+    per-request tuning of the search engine.
+    """
+    # ANN lists probed per partition (None = server default, 0 = exact scan)
+    ann_nprobe: Optional[int] = Field(default=None, ge=0)
+    # VenueResult fields to return (None = all); reasons are only built when requested
+    fields: Optional[List[VenueResultField]] = Field(default=None, min_length=1)
+
+
+class BatchSearchRequest(BaseModel):
+    """
+    Request body for the /search/batch endpoint: several structured
+    queries answered in one round trip (results come back in the same order).
+    """
+    queries: List[SearchRequest] = Field(min_length=1, max_length=100)
+    # ANN lists probed per partition (None = server default, 0 = exact scan)
+    ann_nprobe: Optional[int] = Field(default=None, ge=0)
+    # VenueResult fields to return (None = all); reasons are only built when requested
+    fields: Optional[List[VenueResultField]] = Field(default=None, min_length=1)
+
+
 class VenueResult(BaseModel):
     """
     One recommended venue returned by the search engine.
@@ -34,12 +61,28 @@ class VenueResult(BaseModel):
     reasons: List[str]
 
 
+class VenueResultFields(TypedDict, total=False):
+    """
+    A VenueResult as returned by the search endpoints: only the fields
+    listed in the request's `fields` (all of them when it is not set).
+    """
+    venue_id: int
+    name: str
+    city: str
+    area: str
+    venue_type: str
+    score: float
+    reasons: List[str]
+
+
 class PromptSearchRequest(BaseModel):
     """
     Request body for /prompt-search endpoint.
     The user provides a free-text prompt describing the night out.
     """
     prompt: str
+    # VenueResult fields to return (None = all); reasons are only built when requested
+    fields: Optional[List[VenueResultField]] = Field(default=None, min_length=1)
 
 
 class PromptSearchResponse(BaseModel):
@@ -55,4 +98,4 @@ class PromptSearchResponse(BaseModel):
     status: str                    # "ok" | "too_broad" | "no_match" | "invalid"
     reason: Optional[str] = None   # human-readable explanation
     parsed_query: Optional[SearchRequest] = None
-    venues: List[VenueResult] = Field(default_factory=list)
+    venues: List[VenueResultFields] = Field(default_factory=list)
@@ -0,0 +1,412 @@
+# backend/app/repositories/nights_repository.py
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import json
+import shutil
+
+import numpy as np
+
+
+WEEKEND_DAYS = ("Friday", "Saturday")
+
+# Binary bundle written by scripts/preprocess_nights.py and memory-mapped by the engine.
+NIGHTS_BUNDLE_DIRNAME = "nights_bundle"
+MANIFEST_FILENAME = "manifest.json"
+BUNDLE_FORMAT_VERSION = 1
+
+
+# -----------------------------
+# Internal representations
+# -----------------------------
+
+@dataclass
+class NightRecord:
+    night_id: int
+    venue_id: int
+    city: str
+    day_of_week: str
+    is_weekend: bool
+    struct_features: np.ndarray
+    embedding: Optional[np.ndarray]  # None if not computed
+
+
+@dataclass
+class NightMatrix:
+    """
+    Column-oriented copy of all nights, built once at load time.
+    Row i of every array describes the same night.
+
+    Rows are ordered by (is_weekend, city), so every (city, is_weekend)
+    partition - and each whole weekend/weekday group - is a contiguous
+    block of rows that can be sliced without copying.
+
+    - struct:      (N, D) float32, C-contiguous
+    - embeddings:  (N, E) float32, rows L2-normalized (all-zero if missing),
+                   or None if no night has an embedding
+    - partitions:  (city, is_weekend) -> row slice
+    - week_groups: is_weekend -> row slice across all cities
+    """
+    night_ids: np.ndarray   # (N,) int64
+    venue_ids: np.ndarray   # (N,) int64
+    venue_codes: np.ndarray  # (N,) int32, dense index into venue_code_ids
+    venue_code_ids: np.ndarray  # (V,) int64, sorted unique venue ids
+    city_codes: np.ndarray  # (N,) int32, index into city_names
+    city_names: List[str]   # sorted unique cities
+    day_codes: np.ndarray   # (N,) int8, index into day_names
+    day_names: List[str]    # sorted unique days
+    is_weekend: np.ndarray  # (N,) bool
+    struct: np.ndarray
+    embeddings: Optional[np.ndarray]
+    partitions: Dict[Tuple[str, bool], slice]
+    week_groups: Dict[bool, slice]
+
+    def __len__(self) -> int:
+        return int(self.night_ids.shape[0])
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+
+def l2_normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Return a float32 copy of matrix with unit-length rows (zero rows stay zero)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+def encode_strings(values: List[str]) -> Tuple[np.ndarray, List[str]]:
+    """Map strings to int32 codes into their sorted unique vocabulary."""
+    names = sorted(set(values))
+    index = {name: code for code, name in enumerate(names)}
+    codes = np.array([index[v] for v in values], dtype=np.int32)
+    return codes, names
+
+
+def weekend_mask(day_codes: np.ndarray, day_names: List[str]) -> np.ndarray:
+    weekend_codes = [code for code, day in enumerate(day_names) if day in WEEKEND_DAYS]
+    return np.isin(day_codes, weekend_codes)
+
+
+def index_partitions(
+    city_codes: np.ndarray,
+    city_names: List[str],
+    is_weekend: np.ndarray,
+) -> Tuple[Dict[Tuple[str, bool], slice], Dict[bool, slice]]:
+    """
+    Find the row slice of every (city, is_weekend) partition and of both
+    weekend/weekday groups. Rows must already be in (is_weekend, city) order.
+    """
+    n = int(city_codes.shape[0])
+    partitions: Dict[Tuple[str, bool], slice] = {}
+    week_groups: Dict[bool, slice] = {}
+    if n == 0:
+        return partitions, week_groups
+
+    key = is_weekend.astype(np.int64) * (len(city_names) + 1) + city_codes
+    steps = np.diff(key)
+    if np.any(steps < 0):
+        raise ValueError("Nights are not ordered by (is_weekend, city).")
+
+    bounds = np.flatnonzero(steps) + 1
+    starts = np.concatenate(([0], bounds)).tolist()
+    stops = np.concatenate((bounds, [n])).tolist()
+    for start, stop in zip(starts, stops):
+        weekend = bool(is_weekend[start])
+        partitions[(city_names[city_codes[start]], weekend)] = slice(start, stop)
+        group = week_groups.get(weekend)
+        week_groups[weekend] = slice(group.start if group else start, stop)
+
+    return partitions, week_groups
+
+
+def build_night_matrix(nights: List[NightRecord]) -> NightMatrix:
+    """
+    Stack NightRecords into contiguous float32 matrices.
+
+    Embeddings are pre-normalized so cosine similarity against a unit query
+    is a single matrix-vector product. Nights with a missing embedding (or
+    one whose size differs from the rest) get an all-zero row, which scores
+    0.0 exactly like a per-night cosine similarity would.
+
+    Nights are first (stably) sorted into (is_weekend, city) partitions.
+    """
+    nights = sorted(nights, key=lambda night: (night.is_weekend, night.city))
+    n = len(nights)
+
+    if n:
+        struct = np.stack([night.struct_features for night in nights]).astype(np.float32)
+    else:
+        struct = np.zeros((0, 0), dtype=np.float32)
+
+    emb_dim = next(
+        (night.embedding.shape[0] for night in nights if night.embedding is not None),
+        None,
+    )
+    embeddings: Optional[np.ndarray] = None
+    if emb_dim is not None:
+        raw = np.zeros((n, emb_dim), dtype=np.float32)
+        for i, night in enumerate(nights):
+            if night.embedding is not None and night.embedding.shape == (emb_dim,):
+                raw[i] = night.embedding
+        embeddings = l2_normalize_rows(raw)
+
+    venue_ids = np.array([night.venue_id for night in nights], dtype=np.int64)
+    venue_code_ids, venue_codes = np.unique(venue_ids, return_inverse=True)
+
+    city_codes, city_names = encode_strings([night.city for night in nights])
+    day_codes, day_names = encode_strings([night.day_of_week for night in nights])
+    is_weekend = np.array([night.is_weekend for night in nights], dtype=bool)
+    partitions, week_groups = index_partitions(city_codes, city_names, is_weekend)
+
+    return NightMatrix(
+        night_ids=np.array([night.night_id for night in nights], dtype=np.int64),
+        venue_ids=venue_ids,
+        venue_codes=venue_codes.astype(np.int32),
+        venue_code_ids=venue_code_ids,
+        city_codes=city_codes,
+        city_names=city_names,
+        day_codes=day_codes.astype(np.int8),
+        day_names=day_names,
+        is_weekend=is_weekend,
+        struct=np.ascontiguousarray(struct),
+        embeddings=embeddings,
+        partitions=partitions,
+        week_groups=week_groups,
+    )
+
+
+# -----------------------------
+# JSONL source (nights_features.jsonl)
+# -----------------------------
+
+def load_nights_jsonl(path: Path) -> List[NightRecord]:
+    """Parse nights_features.jsonl into NightRecords (slow path, see load_nights_bundle)."""
+    if not path.exists():
+        raise FileNotFoundError(f"nights_features.jsonl not found at {path}")
+
+    nights: List[NightRecord] = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+
+            night_id = int(rec["night_id"])
+            venue_id = int(rec["venue_id"])
+            city = str(rec.get("city", ""))
+            day_of_week = str(rec.get("day_of_week", ""))
+            is_weekend = day_of_week in WEEKEND_DAYS
+
+            struct_features = np.array(rec["struct_features"], dtype=np.float32)
+
+            emb_list = rec.get("embedding", [])
+            if emb_list:
+                embedding = np.array(emb_list, dtype=np.float32)
+            else:
+                embedding = None
+
+            nights.append(
+                NightRecord(
+                    night_id=night_id,
+                    venue_id=venue_id,
+                    city=city,
+                    day_of_week=day_of_week,
+                    is_weekend=is_weekend,
+                    struct_features=struct_features,
+                    embedding=embedding,
+                )
+            )
+    return nights
+
+
+# -----------------------------
+# Binary bundle (memory-mappable)
+# -----------------------------
+#
+# <data>/nights_bundle/
+#     manifest.json       format version, shapes, vocabularies
+#     night_ids.npy       (N,)   int64
+#     venue_ids.npy       (N,)   int64
+#     venue_codes.npy     (N,)   int32
+#     venue_code_ids.npy  (V,)   int64
+#     city_codes.npy      (N,)   int32
+#     day_codes.npy       (N,)   int8
+#     struct.npy          (N, D) float32
+#     embeddings.npy      (N, E) float32, L2-normalized (absent if no embeddings)
+#     <extra>.npy         optional arrays of derived structures (e.g. the ANN
+#                         index, see app.services.ann_index), listed in the
+#                         manifest like the rest
+#
+# Rows are stored in (is_weekend, city) order so partitions can be sliced
+# straight out of the memory map.
+
+_BUNDLE_ARRAYS = (
+    "night_ids",
+    "venue_ids",
+    "venue_codes",
+    "venue_code_ids",
+    "city_codes",
+    "day_codes",
+    "struct",
+    "embeddings",
+)
+
+
+def write_nights_bundle(
+    bundle_dir: Path,
+    matrix: NightMatrix,
+    embedding_model: str,
+    extra_arrays: Optional[Dict[str, np.ndarray]] = None,
+) -> None:
+    """
+    Write a NightMatrix (plus any extra_arrays) as a binary bundle.
+
+    The bundle is written next to bundle_dir and then renamed into place, so
+    a running server never sees a half-written bundle.
+    """
+    extra_arrays = extra_arrays or {}
+    clashes = set(extra_arrays) & set(_BUNDLE_ARRAYS)
+    if clashes:
+        raise ValueError(f"Extra bundle arrays clash with night arrays: {sorted(clashes)}")
+
+    tmp_dir = bundle_dir.with_name(bundle_dir.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    arrays_meta: Dict[str, Dict[str, Any]] = {}
+    to_write = [(name, getattr(matrix, name)) for name in _BUNDLE_ARRAYS]
+    to_write.extend(extra_arrays.items())
+    for name, arr in to_write:
+        if arr is None:
+            continue
+        arr = np.ascontiguousarray(arr)
+        file_name = f"{name}.npy"
+        np.save(tmp_dir / file_name, arr, allow_pickle=False)
+        arrays_meta[name] = {
+            "file": file_name,
+            "dtype": str(arr.dtype),
+            "shape": list(arr.shape),
+        }
+
+    manifest = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "num_nights": len(matrix),
+        "struct_dim": int(matrix.struct.shape[1]),
+        "embedding_dim": (
+            int(matrix.embeddings.shape[1]) if matrix.embeddings is not None else None
+        ),
+        "embedding_model": embedding_model,
+        "embeddings_normalized": True,
+        "cities": matrix.city_names,
+        "days": matrix.day_names,
+        "arrays": arrays_meta,
+    }
+    (tmp_dir / MANIFEST_FILENAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    old_dir = bundle_dir.with_name(bundle_dir.name + ".old")
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+    if bundle_dir.exists():
+        bundle_dir.rename(old_dir)
+    tmp_dir.rename(bundle_dir)
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+
+
+def read_bundle_manifest(bundle_dir: Path) -> Dict[str, Any]:
+    path = bundle_dir / MANIFEST_FILENAME
+    if not path.exists():
+        raise FileNotFoundError(f"{MANIFEST_FILENAME} not found in {bundle_dir}")
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    version = manifest.get("format_version")
+    if version != BUNDLE_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported nights bundle format {version!r} in {bundle_dir} "
+            f"(expected {BUNDLE_FORMAT_VERSION}). Re-run scripts/preprocess_nights.py."
+        )
+    return manifest
+
+
+def _load_arrays(
+    bundle_dir: Path,
+    manifest: Dict[str, Any],
+    names: Tuple[str, ...],
+    mmap: bool,
+) -> Dict[str, Optional[np.ndarray]]:
+    arrays: Dict[str, Optional[np.ndarray]] = {}
+    for name in names:
+        meta = manifest["arrays"].get(name)
+        if meta is None:
+            arrays[name] = None
+            continue
+        arr = np.load(
+            bundle_dir / meta["file"],
+            mmap_mode="r" if mmap else None,
+            allow_pickle=False,
+        )
+        if list(arr.shape) != meta["shape"] or str(arr.dtype) != meta["dtype"]:
+            raise ValueError(f"{meta['file']} in {bundle_dir} does not match manifest.json")
+        # Plain ndarray view over the mapping (keeps np.memmap out of results)
+        arrays[name] = np.asarray(arr)
+    return arrays
+
+
+def load_bundle_arrays(
+    bundle_dir: Path,
+    names: Tuple[str, ...],
+    mmap: bool = True,
+) -> Dict[str, Optional[np.ndarray]]:
+    """Load extra arrays written with write_nights_bundle(extra_arrays=...); None if absent."""
+    return _load_arrays(bundle_dir, read_bundle_manifest(bundle_dir), names, mmap)
+
+
+def load_nights_bundle(bundle_dir: Path, mmap: bool = True) -> NightMatrix:
+    """
+    Load a bundle written by write_nights_bundle().
+
+    With mmap=True the large matrices are memory-mapped read-only: nothing is
+    parsed, pages are loaded on first touch and shared through the OS page
+    cache between processes reading the same bundle.
+    """
+    manifest = read_bundle_manifest(bundle_dir)
+    n = int(manifest["num_nights"])
+    arrays = _load_arrays(bundle_dir, manifest, _BUNDLE_ARRAYS, mmap)
+
+    for name in ("night_ids", "venue_ids", "venue_codes", "city_codes", "day_codes", "struct"):
+        arr = arrays[name]
+        if arr is None or arr.shape[0] != n:
+            raise ValueError(f"{name} in {bundle_dir} is missing or has the wrong length")
+    if arrays["venue_code_ids"] is None:
+        raise ValueError(f"venue_code_ids is missing in {bundle_dir}")
+
+    city_names = list(manifest["cities"])
+    day_names = list(manifest["days"])
+    city_codes = arrays["city_codes"]
+    day_codes = arrays["day_codes"]
+    is_weekend = weekend_mask(day_codes, day_names)
+    partitions, week_groups = index_partitions(city_codes, city_names, is_weekend)
+
+    return NightMatrix(
+        night_ids=arrays["night_ids"],
+        venue_ids=arrays["venue_ids"],
+        venue_codes=arrays["venue_codes"],
+        venue_code_ids=arrays["venue_code_ids"],
+        city_codes=city_codes,
+        city_names=city_names,
+        day_codes=day_codes,
+        day_names=day_names,
+        is_weekend=is_weekend,
+        struct=arrays["struct"],
+        embeddings=arrays["embeddings"],
+        partitions=partitions,
+        week_groups=week_groups,
+    )
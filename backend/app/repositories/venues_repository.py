@@ -0,0 +1,69 @@
+# backend/app/repositories/venues_repository.py
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+import csv
+
+
+# -----------------------------
+# Internal representations
+# -----------------------------
+
+@dataclass
+class VenueInfo:
+    venue_id: int
+    name: str
+    city: str
+    area: str
+    venue_type: str
+    avg_budget_level: float
+    avg_party_level: float
+    typical_start_time: str
+    typical_end_time: str
+    top_vibe_tags: List[str]
+
+
+# -----------------------------
+# venues.csv (written by scripts/build_venues.py)
+# -----------------------------
+
+def _float_or_nan(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return float("nan")
+
+
+def load_venues_csv(path: Path) -> Dict[int, VenueInfo]:
+    """
+    Read venues.csv into VenueInfo objects keyed by venue_id.
+
+    Plain csv module: a few thousand rows take milliseconds, where pandas
+    costs its import plus a Series per row. Empty numeric cells become NaN,
+    empty text cells stay "".
+    """
+    if not path.exists():
+        raise FileNotFoundError(f"venues.csv not found at {path}")
+
+    venues: Dict[int, VenueInfo] = {}
+    with path.open(newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            vid = int(float(row["venue_id"]))
+            top_tags_str = row.get("top_vibe_tags") or ""
+            venues[vid] = VenueInfo(
+                venue_id=vid,
+                name=row["name"],
+                city=row["city"],
+                area=row["area"],
+                venue_type=row["venue_type"],
+                avg_budget_level=_float_or_nan(row.get("avg_budget_level") or ""),
+                avg_party_level=_float_or_nan(row.get("avg_party_level") or ""),
+                typical_start_time=row.get("typical_start_time") or "",
+                typical_end_time=row.get("typical_end_time") or "",
+                top_vibe_tags=[t.strip() for t in top_tags_str.split(",") if t.strip()],
+            )
+    return venues
@@ -0,0 +1,253 @@
+# backend/app/services/ann_index.py
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import math
+
+import numpy as np
+
+from app.repositories.nights_repository import NightMatrix, l2_normalize_rows
+
+
+# Names of the index arrays inside the nights bundle (see write_nights_bundle)
+IVF_ARRAYS = (
+    "ivf_centroids",
+    "ivf_list_offsets",
+    "ivf_list_rows",
+    "ivf_centroid_bounds",
+)
+
+# Partitions smaller than this are cheap to scan exactly and get no lists
+DEFAULT_MIN_PARTITION_SIZE = 20_000
+# Lists probed per partition when a request does not say otherwise
+DEFAULT_NPROBE = 16
+
+KMEANS_ITERATIONS = 10
+KMEANS_MAX_TRAINING_POINTS = 50_000
+ASSIGN_CHUNK_ROWS = 65_536
+
+
+# -----------------------------
+# Index
+# -----------------------------
+
+@dataclass
+class IVFIndex:
+    """
+    Inverted-file (IVF) index over NightMatrix.embeddings, one per
+    (city, is_weekend) partition.
+
+    The nights of each partition are clustered into lists around unit
+    centroids; a query only visits the nights of the nprobe lists whose
+    centroids are closest to it, and those nights are then scored exactly.
+    All partitions share flat arrays:
+
+    - centroids:       (C, E) float32, unit rows
+    - list_offsets:    (C + 1,) int64; list c is list_rows[list_offsets[c]:list_offsets[c + 1]]
+    - list_rows:       (M,) int64, NightMatrix row ids, ascending within a list
+    - centroid_bounds: (C, 2) int64, [start, stop) rows of the partition owning list c
+
+    The lists of one partition are contiguous. Partitions without lists
+    (smaller than the build's min_partition_size) are always scanned in full.
+    """
+    centroids: np.ndarray
+    list_offsets: np.ndarray
+    list_rows: np.ndarray
+    centroid_bounds: np.ndarray
+    # (start, stop) partition rows -> slice of its lists
+    partition_lists: Dict[Tuple[int, int], slice] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.partition_lists = {}
+        n_lists = int(self.centroids.shape[0])
+        if n_lists == 0:
+            return
+        bounds = self.centroid_bounds
+        changes = np.flatnonzero(np.any(bounds[1:] != bounds[:-1], axis=1)) + 1
+        starts = np.concatenate(([0], changes)).tolist()
+        stops = np.concatenate((changes, [n_lists])).tolist()
+        for first, last in zip(starts, stops):
+            start, stop = (int(v) for v in bounds[first])
+            self.partition_lists[(start, stop)] = slice(first, last)
+
+    @property
+    def n_lists(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return int(self.centroids.shape[1])
+
+    def list_members(self, c: int) -> np.ndarray:
+        return self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]]
+
+    def candidate_rows(self, rows: slice, q_unit: np.ndarray, nprobe: int) -> np.ndarray:
+        """
+        Rows of `rows` worth scoring for the unit query q_unit.
+
+        For every indexed partition inside `rows`, the members of its nprobe
+        closest lists; every row not covered by an index is kept. The result
+        is sorted ascending, so ties between equal scores break the same way
+        as in a full scan.
+        """
+        pieces: List[np.ndarray] = []
+        covered: List[Tuple[int, int]] = []
+
+        for (start, stop), lists in self.partition_lists.items():
+            if start < rows.start or stop > rows.stop:
+                continue
+            covered.append((start, stop))
+            n_part_lists = lists.stop - lists.start
+            if nprobe >= n_part_lists:
+                pieces.append(np.arange(start, stop, dtype=np.int64))
+                continue
+            sims = self.centroids[lists] @ q_unit
+            best = np.argpartition(-sims, nprobe - 1)[:nprobe] + lists.start
+            pieces.extend(self.list_members(int(c)) for c in best)
+
+        pos = rows.start
+        for start, stop in sorted(covered):
+            if start > pos:
+                pieces.append(np.arange(pos, start, dtype=np.int64))
+            pos = stop
+        if pos < rows.stop:
+            pieces.append(np.arange(pos, rows.stop, dtype=np.int64))
+
+        if not pieces:
+            return np.zeros(0, dtype=np.int64)
+        out = np.concatenate(pieces)
+        out.sort()
+        return out
+
+    # ---------- Bundle (de)serialization ----------
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "ivf_centroids": self.centroids,
+            "ivf_list_offsets": self.list_offsets,
+            "ivf_list_rows": self.list_rows,
+            "ivf_centroid_bounds": self.centroid_bounds,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, Optional[np.ndarray]]) -> Optional["IVFIndex"]:
+        """Rebuild the index from bundle arrays; None if the bundle has no index."""
+        if any(arrays.get(name) is None for name in IVF_ARRAYS):
+            return None
+        centroids = arrays["ivf_centroids"]
+        offsets = arrays["ivf_list_offsets"]
+        bounds = arrays["ivf_centroid_bounds"]
+        if offsets.shape[0] != centroids.shape[0] + 1 or bounds.shape != (centroids.shape[0], 2):
+            raise ValueError("IVF index arrays in the nights bundle are inconsistent")
+        return cls(
+            centroids=centroids,
+            list_offsets=offsets,
+            list_rows=arrays["ivf_list_rows"],
+            centroid_bounds=bounds,
+        )
+
+
+# -----------------------------
+# Offline build (scripts/preprocess_nights.py)
+# -----------------------------
+
+def default_n_lists(n_rows: int) -> int:
+    """About sqrt(N) lists per partition, the usual IVF starting point."""
+    return max(1, int(round(math.sqrt(n_rows))))
+
+
+def assign_to_centroids(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar (max dot product) centroid for every row of x."""
+    out = np.empty(x.shape[0], dtype=np.int64)
+    for i in range(0, x.shape[0], ASSIGN_CHUNK_ROWS):
+        block = np.asarray(x[i:i + ASSIGN_CHUNK_ROWS], dtype=np.float32)
+        out[i:i + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def spherical_kmeans(
+    x: np.ndarray,
+    k: int,
+    rng: np.random.Generator,
+    n_iter: int = KMEANS_ITERATIONS,
+    max_training_points: int = KMEANS_MAX_TRAINING_POINTS,
+) -> np.ndarray:
+    """
+    k unit centroids for the unit rows of x (k-means under cosine similarity),
+    trained on a random sample of at most max_training_points rows.
+    """
+    n = x.shape[0]
+    if n > max_training_points:
+        sample = np.sort(rng.choice(n, size=max_training_points, replace=False))
+        train = np.asarray(x[sample], dtype=np.float32)
+    else:
+        train = np.asarray(x, dtype=np.float32)
+
+    k = min(k, train.shape[0])
+    centroids = train[rng.choice(train.shape[0], size=k, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assign = assign_to_centroids(train, centroids)
+        counts = np.bincount(assign, minlength=k)
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(train[order], starts[nonempty], axis=0)
+
+        # Re-seed empty lists with random training points
+        empty = np.flatnonzero(~nonempty)
+        if empty.size:
+            sums[empty] = train[rng.choice(train.shape[0], size=empty.size, replace=False)]
+        centroids = l2_normalize_rows(sums)
+
+    return centroids
+
+
+def build_ivf_index(
+    matrix: NightMatrix,
+    min_partition_size: int = DEFAULT_MIN_PARTITION_SIZE,
+    seed: int = 0,
+) -> Optional[IVFIndex]:
+    """
+    Cluster the embeddings of every (city, is_weekend) partition with at
+    least min_partition_size nights. Returns None if there is nothing to
+    index (no embeddings, or only small partitions).
+    """
+    if matrix.embeddings is None:
+        return None
+
+    rng = np.random.default_rng(seed)
+    centroids: List[np.ndarray] = []
+    lists: List[np.ndarray] = []
+    bounds: List[Tuple[int, int]] = []
+
+    for _, rows in sorted(matrix.partitions.items(), key=lambda item: item[1].start):
+        n_rows = rows.stop - rows.start
+        if n_rows < min_partition_size:
+            continue
+        emb = matrix.embeddings[rows]
+        part_centroids = spherical_kmeans(emb, default_n_lists(n_rows), rng)
+        assign = assign_to_centroids(emb, part_centroids)
+        order = np.argsort(assign, kind="stable")  # ascending rows within each list
+        counts = np.bincount(assign, minlength=part_centroids.shape[0])
+        splits = np.cumsum(counts)[:-1]
+        for members in np.split(order + rows.start, splits):
+            lists.append(members.astype(np.int64))
+        centroids.append(part_centroids)
+        bounds.extend([(rows.start, rows.stop)] * part_centroids.shape[0])
+
+    if not centroids:
+        return None
+
+    sizes = np.array([members.shape[0] for members in lists], dtype=np.int64)
+    return IVFIndex(
+        centroids=np.ascontiguousarray(np.vstack(centroids), dtype=np.float32),
+        list_offsets=np.concatenate(([0], np.cumsum(sizes))).astype(np.int64),
+        list_rows=np.concatenate(lists),
+        centroid_bounds=np.array(bounds, dtype=np.int64),
+    )
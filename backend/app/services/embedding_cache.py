@@ -0,0 +1,110 @@
+# backend/app/services/embedding_cache.py
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import hashlib
+import os
+
+import numpy as np
+
+from app.services.ttl_cache import SqliteCacheStore, TTLCache
+
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600  # embeddings of a fixed model don't change
+
+
+def normalize_query_text(text: str) -> str:
+    """Collapse whitespace and case so trivially different texts share an entry."""
+    return " ".join(text.split()).casefold()
+
+
+def embedding_cache_key(text: str, model: str) -> str:
+    payload = f"{model}\n{normalize_query_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _encode_embedding(emb: np.ndarray) -> bytes:
+    return np.asarray(emb, dtype="<f4").tobytes()
+
+
+def _decode_embedding(raw: bytes) -> np.ndarray:
+    # frombuffer over bytes is already read-only
+    return np.frombuffer(raw, dtype="<f4").astype(np.float32, copy=False)
+
+
+def _frozen(embedding: np.ndarray) -> np.ndarray:
+    emb = np.array(embedding, dtype=np.float32)
+    emb.setflags(write=False)
+    return emb
+
+
+class QueryEmbeddingCache:
+    """
+    Cache of query embeddings keyed on (embedding model, normalized text).
+
+    In-memory LRU with TTL, optionally backed by a SQLite file that survives
+    restarts and is shared by all workers pointing at the same path.
+    Cached arrays are read-only; callers must not modify them in place.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        path: Optional[Path] = None,
+    ) -> None:
+        store = SqliteCacheStore(path, table="query_embeddings") if path else None
+        self._cache: TTLCache[np.ndarray] = TTLCache(
+            max_entries=max_entries,
+            ttl_seconds=ttl_seconds,
+            store=store,
+            encode=_encode_embedding,
+            decode=_decode_embedding,
+        )
+
+    @classmethod
+    def from_env(cls) -> "QueryEmbeddingCache":
+        """
+        Configure from environment:
+          NIGHTTWIN_EMBEDDING_CACHE_SIZE  max in-memory entries (0 disables)
+          NIGHTTWIN_EMBEDDING_CACHE_TTL   seconds
+          NIGHTTWIN_EMBEDDING_CACHE_PATH  SQLite file for the persistent tier
+        """
+        path = os.getenv("NIGHTTWIN_EMBEDDING_CACHE_PATH")
+        return cls(
+            max_entries=int(os.getenv("NIGHTTWIN_EMBEDDING_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+            ttl_seconds=float(os.getenv("NIGHTTWIN_EMBEDDING_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+            path=Path(path) if path else None,
+        )
+
+    def get(self, text: str, model: str) -> Optional[np.ndarray]:
+        return self._cache.get(embedding_cache_key(text, model))
+
+    def set(self, text: str, model: str, embedding: np.ndarray) -> None:
+        self._cache.set(embedding_cache_key(text, model), _frozen(embedding))
+
+    # Event-loop variants: the SQLite tier is read / written in a worker thread
+
+    async def aget(self, text: str, model: str) -> Optional[np.ndarray]:
+        return await self._cache.aget(embedding_cache_key(text, model))
+
+    async def aset(self, text: str, model: str, embedding: np.ndarray) -> None:
+        await self._cache.aset(embedding_cache_key(text, model), _frozen(embedding))
+
+    async def aget_many(self, texts: Iterable[str], model: str) -> Dict[str, np.ndarray]:
+        """Cached embeddings by text (texts that are not cached are left out)."""
+        keys = {text: embedding_cache_key(text, model) for text in texts}
+        found = await self._cache.aget_many(dict.fromkeys(keys.values()))
+        return {text: found[key] for text, key in keys.items() if key in found}
+
+    async def aset_many(self, items: Iterable[Tuple[str, np.ndarray]], model: str) -> None:
+        await self._cache.aset_many(
+            (embedding_cache_key(text, model), _frozen(emb)) for text, emb in items
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
@@ -1,35 +1,54 @@
 import os
+from typing import List, Optional
+
 from dotenv import load_dotenv
 from openai import OpenAI
 
-EMBED_MODEL = "text-embedding-3-small"
+from app.services.embedding_provider import EmbeddingProvider, embedding_provider_from_env
+
 CHAT_MODEL = "gpt-4o-mini"
 
 # 1) Load the .env file
 load_dotenv()
 
-# 2) Read the variable
-api_key = os.getenv("OPENAI_API_KEY")
+# 2) Clients are created on first use, so importing this module never needs a key
+_embedding_provider: Optional[EmbeddingProvider] = None
+_chat_client: Optional[OpenAI] = None
 
-# Debug check (optional)
-if not api_key:
-    raise ValueError("OPENAI_API_KEY not found in environment!")
 
-# 3) Initialize OpenAI client
-client = OpenAI(api_key=api_key)
+def get_embedding_provider() -> EmbeddingProvider:
+    """The provider configured by NIGHTTWIN_EMBEDDING_PROVIDER (OpenAI by default)."""
+    global _embedding_provider
+    if _embedding_provider is None:
+        _embedding_provider = embedding_provider_from_env()
+        if _embedding_provider is None:
+            raise ValueError(
+                "OPENAI_API_KEY not found in environment "
+                "(or set NIGHTTWIN_EMBEDDING_PROVIDER=hashing|http)!"
+            )
+    return _embedding_provider
+
+
+def get_embedding(text: str) -> List[float]:
+    return get_embedding_provider().embed([text])[0].tolist()
+
+
+def get_embeddings(texts: List[str]) -> List[List[float]]:
+    return get_embedding_provider().embed(texts).tolist()
 
-def get_embedding(text: str):
-    resp = client.embeddings.create(
-        model=EMBED_MODEL,
-        input=text
-    )
-    return resp.data[0].embedding
 
 def get_text_response(prompt: str):
-    response = client.chat.completions.create(
+    global _chat_client
+    if _chat_client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY not found in environment!")
+        _chat_client = OpenAI(api_key=api_key)
+
+    response = _chat_client.chat.completions.create(
         model=CHAT_MODEL,
         messages=[
             {"role": "user", "content": prompt}
         ]
     )
-    return response.choices[0].message.content
\ No newline at end of file
+    return response.choices[0].message.content
@@ -0,0 +1,129 @@
+# backend/app/services/embedding_projection.py
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Literal, Optional
+
+import numpy as np
+
+from app.repositories.nights_repository import l2_normalize_rows
+
+
+ProjectionKind = Literal["none", "pca", "truncate"]
+PROJECTION_KINDS = ("none", "pca", "truncate")
+
+# Name of the projection matrix inside the nights bundle (see write_nights_bundle)
+PROJECTION_ARRAYS = ("projection_components",)
+
+PCA_MAX_TRAINING_POINTS = 100_000
+PROJECT_CHUNK_ROWS = 65_536
+
+
+# -----------------------------
+# Projection
+# -----------------------------
+
+@dataclass
+class EmbeddingProjection:
+    """
+    Linear map from full embeddings (E dims) to a reduced space (d dims),
+    followed by L2 re-normalization: y = normalize(x @ components).
+
+    Nights are projected once offline; queries are projected by the engine
+    before scoring, so cosine similarity is computed in the reduced space.
+
+    - "truncate": components = first d columns of the identity, i.e.
+      Matryoshka-style prefix truncation (text-embedding-3 models are trained
+      for it).
+    - "pca": top-d principal directions of the night embeddings, fitted
+      without centering so cosine similarities (and the guardrail
+      thresholds built on them) stay close to the full-dimension ones.
+    """
+    components: np.ndarray  # (E, d) float32
+
+    @property
+    def source_dim(self) -> int:
+        return int(self.components.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return int(self.components.shape[1])
+
+    def apply(self, x: np.ndarray) -> np.ndarray:
+        """Project unit (or raw) rows of x, shape (E,) or (N, E); zero rows stay zero."""
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim == 1:
+            return self.apply(x[None, :])[0]
+        out = np.empty((x.shape[0], self.dim), dtype=np.float32)
+        for i in range(0, x.shape[0], PROJECT_CHUNK_ROWS):
+            block = x[i:i + PROJECT_CHUNK_ROWS]
+            out[i:i + block.shape[0]] = l2_normalize_rows(block @ self.components)
+        return out
+
+    # ---------- Bundle (de)serialization ----------
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"projection_components": self.components}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, Optional[np.ndarray]]) -> Optional["EmbeddingProjection"]:
+        components = arrays.get("projection_components")
+        if components is None:
+            return None
+        return cls(components=components)
+
+
+# -----------------------------
+# Offline fitting (scripts/preprocess_nights.py)
+# -----------------------------
+
+def truncation_projection(source_dim: int, dim: int) -> EmbeddingProjection:
+    if not 0 < dim <= source_dim:
+        raise ValueError(f"Projection dim must be in 1..{source_dim}, got {dim}")
+    return EmbeddingProjection(components=np.eye(source_dim, dim, dtype=np.float32))
+
+
+def fit_pca_projection(
+    embeddings: np.ndarray,
+    dim: int,
+    seed: int = 0,
+    max_training_points: int = PCA_MAX_TRAINING_POINTS,
+) -> EmbeddingProjection:
+    """Top-dim eigenvectors of the (uncentered) second-moment matrix of the embeddings."""
+    n, source_dim = embeddings.shape
+    if not 0 < dim <= source_dim:
+        raise ValueError(f"Projection dim must be in 1..{source_dim}, got {dim}")
+
+    if n > max_training_points:
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(n, size=max_training_points, replace=False))
+        train = embeddings[sample]
+    else:
+        train = embeddings
+    train = np.asarray(train, dtype=np.float64)
+    train = train[np.any(train != 0, axis=1)]  # nights without an embedding
+
+    second_moment = train.T @ train
+    _, vectors = np.linalg.eigh(second_moment)  # ascending eigenvalues
+    components = vectors[:, ::-1][:, :dim]
+
+    # Deterministic signs: largest-magnitude entry of each direction positive
+    signs = np.sign(components[np.argmax(np.abs(components), axis=0), np.arange(dim)])
+    signs[signs == 0] = 1.0
+    return EmbeddingProjection(components=np.ascontiguousarray(components * signs, dtype=np.float32))
+
+
+def fit_projection(
+    embeddings: np.ndarray,
+    kind: ProjectionKind,
+    dim: int,
+) -> Optional[EmbeddingProjection]:
+    """Projection selected by kind ("none" -> None)."""
+    if kind == "none":
+        return None
+    if kind == "truncate":
+        return truncation_projection(embeddings.shape[1], dim)
+    if kind == "pca":
+        return fit_pca_projection(embeddings, dim)
+    raise ValueError(f"Unknown embedding projection {kind!r} (expected one of {PROJECTION_KINDS})")
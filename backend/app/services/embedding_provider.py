@@ -0,0 +1,319 @@
+# backend/app/services/embedding_provider.py
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+
+import asyncio
+import hashlib
+import os
+import re
+
+import numpy as np
+
+
+EMBEDDING_PROVIDERS = ("openai", "hashing", "http")
+DEFAULT_OPENAI_MODEL = "text-embedding-3-small"
+DEFAULT_HASHING_DIM = 256
+DEFAULT_HTTP_TIMEOUT_SECONDS = 30.0
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class EmbeddingProviderError(RuntimeError):
+    """
+    Failed embeddings request. status_code / response mirror the OpenAI SDK
+    errors, so callers can apply the same retry rules to every backend.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None, response: Any = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+
+
+class EmbeddingConnectionError(EmbeddingProviderError):
+    """The embeddings server could not be reached (or timed out)."""
+
+
+# -----------------------------
+# Interface
+# -----------------------------
+
+class EmbeddingProvider(ABC):
+    """
+    Turns texts into embedding vectors: embed(texts) -> (len(texts), dim)
+    float32, one row per text, in input order.
+
+    model names the vector space (it is part of every embedding cache key),
+    dim is the output size when the backend knows it up front (else None).
+    aembed() defaults to running embed() in a worker thread.
+    """
+    model: str = ""
+    dim: Optional[int] = None
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> np.ndarray:
+        ...
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.to_thread(self.embed, texts)
+
+    def close(self) -> None:
+        """Release connections this provider opened itself."""
+
+    async def aclose(self) -> None:
+        self.close()
+
+
+def _rows_in_input_order(items: List[Any], n: int) -> np.ndarray:
+    """Stack OpenAI-style response items ({index, embedding}) back into input order."""
+    if len(items) != n:
+        raise EmbeddingProviderError(f"Embeddings response has {len(items)} items for {n} inputs")
+    ordered = sorted(items, key=lambda item: item["index"] if isinstance(item, dict) else item.index)
+    return np.array(
+        [item["embedding"] if isinstance(item, dict) else item.embedding for item in ordered],
+        dtype=np.float32,
+    ).reshape(n, -1)
+
+
+# -----------------------------
+# Backends
+# -----------------------------
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """
+    OpenAI embeddings API. The async client is normally shared with the rest
+    of the app (see app.main) and is then not closed by this provider; the
+    sync client is only created by the first embed() (preprocessing).
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_OPENAI_MODEL,
+        api_key: Optional[str] = None,
+        async_client: Any = None,
+        max_retries: Optional[int] = None,
+    ) -> None:
+        try:
+            from openai import AsyncOpenAI, OpenAI
+        except ImportError as e:
+            raise RuntimeError(
+                "openai library is not installed. Install with 'pip install openai'."
+            ) from e
+
+        self.model = model
+        self._api_key = api_key or os.getenv("OPENAI_API_KEY")
+        retry_kwargs = {"max_retries": max_retries} if max_retries is not None else {}
+        self._client_cls = OpenAI
+        self._async_client_cls = AsyncOpenAI
+        self._retry_kwargs = retry_kwargs
+        self._client: Any = None
+        self.async_client = async_client
+        self._owns_async_client = False
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            self._client = self._client_cls(api_key=self._api_key, **self._retry_kwargs)
+        return self._client
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        resp = self.client.embeddings.create(model=self.model, input=texts)
+        return _rows_in_input_order(resp.data, len(texts))
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if self.async_client is None:
+            self.async_client = self._async_client_cls(api_key=self._api_key, **self._retry_kwargs)
+            self._owns_async_client = True
+        resp = await self.async_client.embeddings.create(model=self.model, input=texts)
+        return _rows_in_input_order(resp.data, len(texts))
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self) -> None:
+        self.close()
+        if self._owns_async_client and self.async_client is not None:
+            await self.async_client.close()
+            self.async_client = None
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Local, deterministic embeddings: lower-cased word unigrams and bigrams
+    are hashed (blake2b) into dim signed buckets and the counts are
+    L2-normalized ("feature hashing").
+
+    No network, no model files and the same vector for the same text on
+    every machine, so texts sharing words land close together. Meant for
+    offline benchmarks, load tests and isolated deployments; it captures
+    wording, not meaning, so it does not replace a real embedding model
+    (and its similarities run lower than text-embedding-3's, so the
+    guardrail thresholds reject more prompts).
+    """
+
+    def __init__(self, dim: int = DEFAULT_HASHING_DIM) -> None:
+        if dim <= 0:
+            raise ValueError(f"Hashing embedding dim must be positive, got {dim}")
+        self.dim = dim
+        self.model = f"hashing-{dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = _TOKEN_RE.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                bucket, sign = _hashed_feature(feature, self.dim)
+                out[row, bucket] += sign
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        # Microseconds of CPU per text: not worth a thread hop
+        return self.embed(texts)
+
+
+@lru_cache(maxsize=65_536)
+def _hashed_feature(feature: str, dim: int) -> Tuple[int, float]:
+    h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return h % dim, 1.0 if h >> 63 else -1.0
+
+
+class HTTPEmbeddingProvider(EmbeddingProvider):
+    """
+    Any server speaking the OpenAI embeddings protocol (POST {base_url}/embeddings
+    with {"model", "input"}), e.g. a local vLLM, llama.cpp, Ollama or TEI
+    server next to the API, which removes the internet round trip from
+    query latency.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        api_key: Optional[str] = None,
+        timeout_seconds: float = DEFAULT_HTTP_TIMEOUT_SECONDS,
+    ) -> None:
+        import httpx
+
+        self._httpx = httpx
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self._headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._timeout = timeout_seconds
+        self.client = httpx.Client(base_url=self.base_url, headers=self._headers, timeout=timeout_seconds)
+        self.async_client: Any = None
+
+    def _parse(self, resp: Any, n: int) -> np.ndarray:
+        if resp.status_code >= 400:
+            raise EmbeddingProviderError(
+                f"Embeddings request to {self.base_url} failed with HTTP {resp.status_code}: {resp.text[:200]}",
+                status_code=resp.status_code,
+                response=resp,
+            )
+        return _rows_in_input_order(resp.json()["data"], n)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        try:
+            resp = self.client.post("/embeddings", json={"model": self.model, "input": texts})
+        except self._httpx.TransportError as e:
+            raise EmbeddingConnectionError(f"Embeddings server {self.base_url} unreachable: {e}") from e
+        return self._parse(resp, len(texts))
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if self.async_client is None:
+            self.async_client = self._httpx.AsyncClient(
+                base_url=self.base_url, headers=self._headers, timeout=self._timeout
+            )
+        try:
+            resp = await self.async_client.post("/embeddings", json={"model": self.model, "input": texts})
+        except self._httpx.TransportError as e:
+            raise EmbeddingConnectionError(f"Embeddings server {self.base_url} unreachable: {e}") from e
+        return self._parse(resp, len(texts))
+
+    def close(self) -> None:
+        self.client.close()
+
+    async def aclose(self) -> None:
+        self.close()
+        if self.async_client is not None:
+            await self.async_client.aclose()
+            self.async_client = None
+
+
+# -----------------------------
+# Configuration
+# -----------------------------
+
+def configured_embedding_provider() -> str:
+    kind = os.getenv("NIGHTTWIN_EMBEDDING_PROVIDER", "openai").strip().lower()
+    if kind not in EMBEDDING_PROVIDERS:
+        raise ValueError(
+            f"Unknown embedding provider {kind!r} (expected one of {', '.join(EMBEDDING_PROVIDERS)})"
+        )
+    return kind
+
+
+def configured_embedding_model() -> str:
+    """Model name of the configured provider, without creating any client."""
+    kind = configured_embedding_provider()
+    if kind == "hashing":
+        return f"hashing-{int(os.getenv('NIGHTTWIN_EMBEDDING_DIM', DEFAULT_HASHING_DIM))}"
+    return os.getenv("NIGHTTWIN_EMBEDDING_MODEL") or DEFAULT_OPENAI_MODEL
+
+
+def embedding_provider_from_env(
+    async_openai_client: Any = None,
+    max_retries: Optional[int] = None,
+) -> Optional[EmbeddingProvider]:
+    """
+    Configure from environment:
+      NIGHTTWIN_EMBEDDING_PROVIDER  openai (default) | hashing | http
+      NIGHTTWIN_EMBEDDING_MODEL     model name (openai, http)
+      NIGHTTWIN_EMBEDDING_DIM       vector size (hashing)
+      NIGHTTWIN_EMBEDDING_BASE_URL  server URL, e.g. http://localhost:8080/v1 (http)
+      NIGHTTWIN_EMBEDDING_API_KEY   bearer token, if the server wants one (http)
+
+    Returns None for "openai" without OPENAI_API_KEY (search then falls back
+    to structured similarity only).
+    """
+    kind = configured_embedding_provider()
+    model = configured_embedding_model()
+
+    if kind == "hashing":
+        return HashingEmbeddingProvider(dim=int(os.getenv("NIGHTTWIN_EMBEDDING_DIM", DEFAULT_HASHING_DIM)))
+
+    if kind == "http":
+        base_url = os.getenv("NIGHTTWIN_EMBEDDING_BASE_URL")
+        if not base_url:
+            raise ValueError("NIGHTTWIN_EMBEDDING_BASE_URL must be set for the http embedding provider")
+        return HTTPEmbeddingProvider(
+            base_url=base_url,
+            model=model,
+            api_key=os.getenv("NIGHTTWIN_EMBEDDING_API_KEY"),
+        )
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+    return OpenAIEmbeddingProvider(
+        model=model,
+        api_key=api_key,
+        async_client=async_openai_client,
+        max_retries=max_retries,
+    )
@@ -0,0 +1,179 @@
+# backend/app/services/engine_reloader.py
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional, Tuple
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+
+from app.services.metrics import DATA_RELOADS
+from app.services.search_engine import NightTwinSearchEngine, data_version
+
+logger = logging.getLogger(__name__)
+
+
+class ReloadResult(NamedTuple):
+    status: str            # "reloaded" | "unchanged"
+    version: str
+    previous_version: str
+    generation: int
+    load_seconds: float
+
+
+class EngineReloader:
+    """
+    Owns the serving NightTwinSearchEngine snapshot and replaces it when the
+    data artifacts change, without a restart.
+
+    A snapshot is never modified after it is built. reload() builds the new
+    engine in a worker thread while the current one keeps serving, checks
+    it (check_snapshot()) and then swaps the reference. Requests read
+    `engine` once and keep that snapshot until they finish; the old one is
+    freed when the last of them lets go (memory-mapped bundle files stay
+    readable after preprocessing renames a new bundle into place).
+
+    While a reload runs both snapshots are in memory.
+
+    build(previous) creates an engine; previous is the serving snapshot
+    (None at startup), so the new one can share its embedding provider and
+    query embedding cache.
+
+    With several worker processes, each has its own reloader. request_path
+    is a file they share: request_reload() reloads this worker and writes a
+    new request id there, and watch_requests() in every other worker
+    reloads when it sees one, so all workers serve the same data.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[Optional[NightTwinSearchEngine]], NightTwinSearchEngine],
+        request_path: Optional[Path] = None,
+    ) -> None:
+        self._build = build
+        self._engine = build(None)
+        self.generation = 1
+        self._lock = asyncio.Lock()
+        self.request_path = request_path
+        # Requests written before this worker started are already in its data
+        self._seen_request = self._read_request()[0] if request_path is not None else None
+
+    @property
+    def engine(self) -> NightTwinSearchEngine:
+        return self._engine
+
+    @property
+    def version(self) -> str:
+        return self._engine.version
+
+    def _build_checked(self, current: NightTwinSearchEngine) -> NightTwinSearchEngine:
+        engine = self._build(current)
+        engine.check_snapshot()
+        if data_version(engine.data_dir) != engine.version:
+            raise RuntimeError("Data files changed while the snapshot was loading; reload again")
+        return engine
+
+    async def reload(self, force: bool = False) -> ReloadResult:
+        """
+        Build, check and swap in a new snapshot. Unless force is set,
+        nothing is loaded when the data fingerprint did not change. On any
+        error the current snapshot keeps serving and the error is raised.
+        """
+        async with self._lock:
+            current = self._engine
+            if not force and await asyncio.to_thread(data_version, current.data_dir) == current.version:
+                DATA_RELOADS.labels("unchanged").inc()
+                return ReloadResult("unchanged", current.version, current.version, self.generation, 0.0)
+
+            start = time.perf_counter()
+            try:
+                engine = await asyncio.to_thread(self._build_checked, current)
+            except Exception:
+                DATA_RELOADS.labels("failed").inc()
+                raise
+            load_seconds = time.perf_counter() - start
+
+            self._engine = engine
+            self.generation += 1
+            DATA_RELOADS.labels("reloaded").inc()
+            logger.info(
+                "engine snapshot %s replaced %s (generation %d, loaded in %.1fs)",
+                engine.version, current.version, self.generation, load_seconds,
+            )
+            return ReloadResult("reloaded", engine.version, current.version, self.generation, load_seconds)
+
+    async def watch(self, poll_seconds: float) -> None:
+        """
+        Poll the data fingerprint every poll_seconds and reload when it has
+        changed and then stayed the same for one more poll (so files still
+        being copied are not picked up half-way). A version that failed to
+        load is not retried until the files change again. Runs until cancelled.
+        """
+        pending: Optional[str] = None
+        failed: Optional[str] = None
+        while True:
+            await asyncio.sleep(poll_seconds)
+            try:
+                version = await asyncio.to_thread(data_version, self._engine.data_dir)
+                if version in (self._engine.version, failed):
+                    pending = None
+                    continue
+                if version != pending:
+                    pending = version
+                    continue
+                pending = None
+                try:
+                    await self.reload()
+                except Exception:
+                    failed = version
+                    raise
+            except Exception:
+                logger.exception("engine snapshot reload failed; still serving %s", self._engine.version)
+
+    # ---------- Reloads across worker processes ----------
+
+    def _read_request(self) -> Tuple[Optional[str], bool]:
+        """(request id, force) of the last reload request, (None, False) if none."""
+        try:
+            request = json.loads(self.request_path.read_text(encoding="utf-8"))  # type: ignore[union-attr]
+            return str(request["id"]), bool(request.get("force", False))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None, False
+
+    def _write_request(self, force: bool) -> str:
+        request_id = uuid.uuid4().hex
+        path = self.request_path
+        assert path is not None
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"id": request_id, "force": force}), encoding="utf-8")
+        os.replace(tmp, path)  # atomic: readers never see a partial file
+        return request_id
+
+    async def request_reload(self, force: bool = False) -> ReloadResult:
+        """
+        reload() this worker, then ask every other worker to do the same
+        (when there is a request_path). Raises like reload(); other workers
+        are only asked once this one has loaded and checked the new data.
+        """
+        result = await self.reload(force=force)
+        if self.request_path is not None:
+            self._seen_request = await asyncio.to_thread(self._write_request, force)
+        return result
+
+    async def watch_requests(self, poll_seconds: float) -> None:
+        """Reload when another worker writes a new reload request. Runs until cancelled."""
+        while True:
+            await asyncio.sleep(poll_seconds)
+            request_id, force = await asyncio.to_thread(self._read_request)
+            if request_id is None or request_id == self._seen_request:
+                continue
+            self._seen_request = request_id
+            try:
+                await self.reload(force=force)
+            except Exception:
+                logger.exception("requested reload failed; still serving %s", self._engine.version)
@@ -0,0 +1,371 @@
+# backend/app/services/metrics.py
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import asyncio
+import inspect
+import math
+import threading
+import time
+
+
+# Latency buckets (seconds): 0.5 ms .. 30 s
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+# Candidate-set size buckets (nights scored per query)
+SIZE_BUCKETS = (
+    100, 300, 1_000, 3_000, 10_000, 30_000, 100_000, 300_000, 1_000_000, 3_000_000, 10_000_000,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# -----------------------------
+# Metric types (Prometheus text format, no dependencies)
+# -----------------------------
+#
+# Each metric has a fixed set of label names; labels(*values) returns the
+# child for one label combination (cached, so hot paths can keep it). A
+# child update is one small lock-protected increment, cheap enough to leave
+# on in production.
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> "_Timer":
+        """Context manager observing the seconds spent inside it."""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: _HistogramChild) -> None:
+        self._child = child
+        self._start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: str) -> Any:
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _snapshot(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            return sorted(self._children.items())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the unlabeled counter."""
+        self.labels().inc(amount)
+
+    def _render_samples(self) -> List[str]:
+        return [
+            f"{self.name}{_label_text(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in self._snapshot()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Observe into the unlabeled histogram."""
+        self.labels().observe(value)
+
+    def _render_samples(self) -> List[str]:
+        lines: List[str] = []
+        for key, child in self._snapshot():
+            with child._lock:
+                counts = list(child.counts)
+                total, count = child.sum, child.count
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+            labels = _label_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class CallbackCounter(_Metric):
+    """
+    Counter whose values are read at scrape time from callbacks returning
+    {label values: value}, for counts something else already keeps (e.g.
+    TTLCache.stats()); costs nothing between scrapes.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._sources: List[Callable[[], Dict[Tuple[str, ...], float]]] = []
+
+    def add_source(self, source: Callable[[], Dict[Tuple[str, ...], float]]) -> None:
+        with self._lock:
+            self._sources.append(source)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            sources = list(self._sources)
+        values: Dict[Tuple[str, ...], float] = {}
+        for source in sources:
+            for key, value in source().items():
+                values[key] = values.get(key, 0.0) + value
+        return [
+            f"{self.name}{_label_text(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+M = TypeVar("M", bound=_Metric)
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: M) -> M:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# -----------------------------
+# NightTwin metrics
+# -----------------------------
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "nighttwin_request_duration_seconds",
+    "HTTP request latency by endpoint (whole request, as seen by the ASGI app).",
+    ["endpoint"],
+))
+REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "nighttwin_requests_total",
+    "HTTP requests by endpoint and status code.",
+    ["endpoint", "status"],
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "nighttwin_stage_duration_seconds",
+    "Time spent per pipeline stage: parse, embedding, threadpool_wait, filter, "
+    "scoring, aggregation, reasons, serialization.",
+    ["stage"],
+))
+CANDIDATE_NIGHTS = REGISTRY.register(Histogram(
+    "nighttwin_candidate_nights",
+    "Nights scored per query (the partition, or the ANN-probed part of it).",
+    buckets=SIZE_BUCKETS,
+))
+GUARDRAIL_OUTCOMES = REGISTRY.register(Counter(
+    "nighttwin_guardrail_outcomes_total",
+    "/prompt-search outcomes: ok, too_broad, no_match, invalid.",
+    ["status"],
+))
+DATA_RELOADS = REGISTRY.register(Counter(
+    "nighttwin_data_reloads_total",
+    "Engine snapshot reloads by result: reloaded, unchanged, failed.",
+    ["result"],
+))
+CACHE_LOOKUPS = REGISTRY.register(CallbackCounter(
+    "nighttwin_cache_lookups_total",
+    "Cache lookups by cache and result (hit, store_hit, miss).",
+    ["cache", "result"],
+))
+
+
+def stage_timer(stage: str) -> _Timer:
+    """with stage_timer("scoring"): ... observes the block into STAGE_SECONDS."""
+    return STAGE_SECONDS.labels(stage).time()
+
+
+def timed_stage(stage: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator: every call of the (sync or async) function is observed as `stage`."""
+    def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with stage_timer(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage_timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+async def to_thread_observed(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    asyncio.to_thread() that records how long the call queued for a free
+    worker thread (stage "threadpool_wait").
+    """
+    submitted = time.perf_counter()
+
+    def run() -> Any:
+        STAGE_SECONDS.labels("threadpool_wait").observe(time.perf_counter() - submitted)
+        return fn(*args, **kwargs)
+
+    return await asyncio.to_thread(run)
+
+
+def cache_stats_source(cache: str, stats: Callable[[], Dict[str, int]]) -> Callable[[], Dict[Tuple[str, ...], float]]:
+    """CACHE_LOOKUPS source for a TTLCache-style stats() dict."""
+    def read() -> Dict[Tuple[str, ...], float]:
+        s = stats()
+        return {
+            (cache, "hit"): s.get("hits", 0),
+            (cache, "store_hit"): s.get("store_hits", 0),
+            (cache, "miss"): s.get("misses", 0),
+        }
+    return read
+
+
+# -----------------------------
+# ASGI middleware
+# -----------------------------
+
+class RequestMetricsMiddleware:
+    """
+    Records REQUEST_SECONDS / REQUESTS_TOTAL for every HTTP request. Paths
+    outside `endpoints` are grouped as "other" to keep label cardinality
+    bounded. Plain ASGI (no BaseHTTPMiddleware), so the overhead is a
+    couple of function calls per request.
+    """
+
+    def __init__(self, app: Any, endpoints: Sequence[str]) -> None:
+        self.app = app
+        self.endpoints = frozenset(endpoints)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable[[], Awaitable[Any]], send: Callable[[Any], Awaitable[None]]) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = scope["path"] if scope["path"] in self.endpoints else "other"
+        status: Optional[int] = None
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+            REQUESTS_TOTAL.labels(endpoint, str(status or 500)).inc()
@@ -2,13 +2,19 @@
 
 from __future__ import annotations
 
-from typing import List, Optional
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 from pydantic import BaseModel, ValidationError, Field
-from openai import OpenAI
+import hashlib
 import os
+import re
 
 from app.models import SearchRequest
+from app.services.ttl_cache import SqliteCacheStore, TTLCache
+
+if TYPE_CHECKING:  # the OpenAI SDK (slow to import) is loaded with the first client
+    from openai import AsyncOpenAI, OpenAI
 
 
 SYSTEM_PROMPT = """
@@ -63,35 +69,179 @@ class ParsedPrompt(BaseModel):
     tags: List[str] = Field(default_factory=list)
 
 
+# Punctuation, except when it sits between two digits ("23:30", "2.5")
+_PUNCTUATION_RE = re.compile(r"(?<!\d)[^\w\s]|[^\w\s](?!\d)")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case, punctuation and whitespace-insensitive form of a prompt, used as cache key."""
+    text = _PUNCTUATION_RE.sub(" ", prompt.casefold())
+    return " ".join(text.split())
+
+
+class PromptParseCache:
+    """
+    Cache of ParsedPrompt results keyed by (model, system prompt, normalized prompt).
+
+    Valid and invalid parses get separate TTLs: an invalid verdict is cheap
+    to redo and more likely to change if the system prompt is tuned.
+    Optionally backed by a SQLite file shared by workers and restarts.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        valid_ttl_seconds: float = 24 * 3600,
+        invalid_ttl_seconds: float = 3600,
+        path: Optional[Path] = None,
+    ) -> None:
+        store = SqliteCacheStore(path, table="parsed_prompts") if path else None
+        self.valid_ttl_seconds = valid_ttl_seconds
+        self.invalid_ttl_seconds = invalid_ttl_seconds
+        self._cache: TTLCache[ParsedPrompt] = TTLCache(
+            max_entries=max_entries,
+            ttl_seconds=valid_ttl_seconds,
+            store=store,
+            encode=lambda parsed: parsed.model_dump_json().encode("utf-8"),
+            decode=ParsedPrompt.model_validate_json,
+        )
+
+    @classmethod
+    def from_env(cls) -> "PromptParseCache":
+        """
+        Configure from environment:
+          NIGHTTWIN_PARSE_CACHE_SIZE         max in-memory entries (0 disables)
+          NIGHTTWIN_PARSE_CACHE_TTL          seconds, valid parses
+          NIGHTTWIN_PARSE_CACHE_INVALID_TTL  seconds, invalid parses
+          NIGHTTWIN_PARSE_CACHE_PATH         SQLite file for the persistent tier
+        """
+        path = os.getenv("NIGHTTWIN_PARSE_CACHE_PATH")
+        return cls(
+            max_entries=int(os.getenv("NIGHTTWIN_PARSE_CACHE_SIZE", 1024)),
+            valid_ttl_seconds=float(os.getenv("NIGHTTWIN_PARSE_CACHE_TTL", 24 * 3600)),
+            invalid_ttl_seconds=float(os.getenv("NIGHTTWIN_PARSE_CACHE_INVALID_TTL", 3600)),
+            path=Path(path) if path else None,
+        )
+
+    @staticmethod
+    def key(prompt: str, model: str) -> str:
+        payload = "\n".join([model, SYSTEM_PROMPT, normalize_prompt(prompt)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str, model: str) -> Optional[ParsedPrompt]:
+        return self._cache.get(self.key(prompt, model))
+
+    def set(self, prompt: str, model: str, parsed: ParsedPrompt) -> None:
+        self._cache.set(self.key(prompt, model), parsed, ttl=self._ttl(parsed))
+
+    async def aget(self, prompt: str, model: str) -> Optional[ParsedPrompt]:
+        return await self._cache.aget(self.key(prompt, model))
+
+    async def aset(self, prompt: str, model: str, parsed: ParsedPrompt) -> None:
+        await self._cache.aset(self.key(prompt, model), parsed, ttl=self._ttl(parsed))
+
+    def _ttl(self, parsed: ParsedPrompt) -> float:
+        return self.valid_ttl_seconds if parsed.valid else self.invalid_ttl_seconds
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+
 class PromptParser:
     """
     Uses OpenAI GPT model to convert a free-text prompt into a structured SearchRequest.
+    Parses are cached by normalized prompt (see PromptParseCache).
     """
 
-    def __init__(self) -> None:
+    def __init__(self, async_client: Optional[AsyncOpenAI] = None) -> None:
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise RuntimeError("OPENAI_API_KEY is not set in the environment.")
 
         # If you run on Yandex Cloud with HTTP(S) proxy, set:
         #   HTTPS_PROXY, HTTP_PROXY environment variables outside this code.
-        self.client = OpenAI(api_key=api_key)
+        self._api_key = api_key
+        self._client: Optional[OpenAI] = None
+        # Async client for aparse_prompt(); normally shared with the search engine.
+        self._async_client: Optional[AsyncOpenAI] = async_client
         # Mini model is cheap and fast, enough for extraction:
         self.model = "gpt-4.1-mini"
 
+        self.parse_cache = PromptParseCache.from_env()
+
+    @property
+    def client(self) -> "OpenAI":
+        """Sync client, created on first use (keeps the SDK import off startup)."""
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI(api_key=self._api_key)
+        return self._client
+
+    @property
+    def async_client(self) -> "AsyncOpenAI":
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+
+            self._async_client = AsyncOpenAI(api_key=self._api_key)
+        return self._async_client
+
+    @async_client.setter
+    def async_client(self, client: "AsyncOpenAI") -> None:
+        self._async_client = client
+
     def parse_prompt(self, prompt: str) -> ParsedPrompt:
         """
         Calls GPT and parses the JSON output into ParsedPrompt.
+        Repeated prompts are answered from the parse cache.
         """
+        cached = self.parse_cache.get(prompt, self.model)
+        if cached is not None:
+            # Callers get their own copy; cached entries stay untouched
+            return cached.model_copy(deep=True)
+
         resp = self.client.responses.create(
             model=self.model,
-            input=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": prompt},
-            ],
+            input=self._build_input(prompt),
             response_format={"type": "json_object"},
         )
+        parsed, cacheable = self._validate_output(resp)
+        if cacheable:
+            self.parse_cache.set(prompt, self.model, parsed.model_copy(deep=True))
+        return parsed
 
+    async def aparse_prompt(self, prompt: str) -> ParsedPrompt:
+        """
+        Async parse_prompt(): awaits GPT on the event loop instead of
+        holding a threadpool thread for the whole round-trip. The parse
+        cache's SQLite tier is read and written in a worker thread.
+        """
+        cached = await self.parse_cache.aget(prompt, self.model)
+        if cached is not None:
+            return cached.model_copy(deep=True)
+
+        resp = await self.async_client.responses.create(
+            model=self.model,
+            input=self._build_input(prompt),
+            response_format={"type": "json_object"},
+        )
+        parsed, cacheable = self._validate_output(resp)
+        if cacheable:
+            await self.parse_cache.aset(prompt, self.model, parsed.model_copy(deep=True))
+        return parsed
+
+    def _build_input(self, prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ]
+
+    def _validate_output(self, resp: Any) -> Tuple[ParsedPrompt, bool]:
+        """
+        Validate the model output; returns (parsed, cacheable). A malformed
+        output falls back to an invalid prompt that must not be cached, so
+        one flaky response does not reject the prompt for everyone.
+        """
         # The responses API returns a JSON string as text in the first output item.
         raw_json = resp.output[0].content[0].text
 
@@ -99,7 +249,7 @@ class PromptParser:
             parsed = ParsedPrompt.model_validate_json(raw_json)
         except ValidationError:
             # In case of a weird model output, fall back to invalid prompt.
-            parsed = ParsedPrompt(
+            return ParsedPrompt(
                 valid=False,
                 city=None,
                 day_of_week=None,
@@ -108,9 +258,9 @@ class PromptParser:
                 budget_level=None,
                 party_level=None,
                 tags=[],
-            )
+            ), False
 
-        return parsed
+        return parsed, True
 
     def to_search_request(self, parsed: ParsedPrompt) -> Optional[SearchRequest]:
         """
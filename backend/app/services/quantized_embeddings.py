@@ -0,0 +1,84 @@
+# backend/app/services/quantized_embeddings.py
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Literal, Optional, Union
+
+import numpy as np
+
+
+EmbeddingStorage = Literal["float32", "float16", "int8"]
+EMBEDDING_STORAGE_MODES = ("float32", "float16", "int8")
+
+# Rows are widened to float32 in blocks of about this many bytes, small
+# enough to stay in L2 while BLAS runs over them
+SCAN_BLOCK_BYTES = 1 << 20
+QUANTIZE_CHUNK_ROWS = 16_384
+
+
+# -----------------------------
+# Quantized copy of the night embeddings
+# -----------------------------
+
+@dataclass
+class QuantizedEmbeddings:
+    """
+    Compact copy of the (unit-row) night embedding matrix for the first-pass scan.
+
+    - "float16": codes are the embeddings in half precision (2x smaller)
+    - "int8":    per-row scaled codes, row ~= codes * scales[row] (4x smaller)
+
+    Dot products are approximate (int8 error is around 1e-3 per similarity),
+    so the engine re-scores its best candidates against the float32 matrix.
+    """
+    mode: EmbeddingStorage
+    codes: np.ndarray             # (N, E) float16 or int8
+    scales: Optional[np.ndarray]  # (N,) float32 for int8, else None
+
+    @classmethod
+    def from_float32(cls, embeddings: np.ndarray, mode: EmbeddingStorage) -> "QuantizedEmbeddings":
+        """Quantize chunk by chunk, so a memory-mapped matrix is never copied whole."""
+        if mode not in ("float16", "int8"):
+            raise ValueError(f"Unsupported quantized embedding storage: {mode!r}")
+        n, dim = embeddings.shape
+        if mode == "float16":
+            codes = np.empty((n, dim), dtype=np.float16)
+            for i in range(0, n, QUANTIZE_CHUNK_ROWS):
+                codes[i:i + QUANTIZE_CHUNK_ROWS] = embeddings[i:i + QUANTIZE_CHUNK_ROWS]
+            return cls(mode=mode, codes=codes, scales=None)
+
+        codes = np.empty((n, dim), dtype=np.int8)
+        scales = np.empty(n, dtype=np.float32)
+        for i in range(0, n, QUANTIZE_CHUNK_ROWS):
+            block = np.asarray(embeddings[i:i + QUANTIZE_CHUNK_ROWS], dtype=np.float32)
+            block_scales = np.abs(block).max(axis=1) / 127.0 if dim else np.zeros(len(block))
+            safe = np.where(block_scales > 0, block_scales, 1.0)[:, None]
+            codes[i:i + block.shape[0]] = np.clip(np.rint(block / safe), -127, 127)
+            scales[i:i + block.shape[0]] = block_scales
+        return cls(mode=mode, codes=codes, scales=scales)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0))
+
+    def dot(self, rows: Union[slice, np.ndarray], q: np.ndarray) -> np.ndarray:
+        """Approximate embeddings[rows] @ q, as float32; q is (E,) or (E, k) for k queries."""
+        codes = self.codes[rows]
+        n, dim = codes.shape
+        q = np.asarray(q, dtype=np.float32)
+        out = np.empty((n,) + q.shape[1:], dtype=np.float32)
+        if n == 0:
+            return out
+
+        block_rows = max(16, SCAN_BLOCK_BYTES // max(1, dim * 4))
+        buf = np.empty((min(block_rows, n), dim), dtype=np.float32)
+        for i in range(0, n, block_rows):
+            block = codes[i:i + block_rows]
+            widened = buf[:block.shape[0]]
+            np.copyto(widened, block, casting="unsafe")
+            np.matmul(widened, q, out=out[i:i + block.shape[0]])
+
+        if self.scales is not None:
+            out *= self.scales[rows].reshape((-1,) + (1,) * (q.ndim - 1))
+        return out
@@ -0,0 +1,99 @@
+# backend/app/services/response_encoder.py
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence
+
+from pydantic_core import to_json
+
+try:  # optional, a bit faster than pydantic's encoder with the same output
+    import orjson
+except ImportError:
+    orjson = None
+
+if TYPE_CHECKING:
+    from app.repositories.venues_repository import VenueInfo
+    from app.services.search_engine import VenueSearchResult
+
+
+# Fields of a venue result, in response order (see app.models.VenueResult)
+VENUE_FIELDS = ("venue_id", "name", "city", "area", "venue_type", "score", "reasons")
+# Fields that only depend on the venue, rendered once per engine snapshot
+STATIC_VENUE_FIELDS = ("venue_id", "name", "city", "area", "venue_type")
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return to_json(value)
+
+
+def encode_object(values: Dict[str, Any], raw: Optional[Dict[str, bytes]] = None) -> bytes:
+    """
+    A JSON object of `values` (encoded here), followed by the `raw` members,
+    whose values are already JSON. Members are joined one by one, so nothing
+    depends on how the encoder lays out a whole object.
+    """
+    members = [dumps(name) + b":" + dumps(value) for name, value in values.items()]
+    members.extend(dumps(name) + b":" + encoded for name, encoded in (raw or {}).items())
+    return b"{" + b",".join(members) + b"}"
+
+
+def select_fields(fields: Optional[Iterable[str]]) -> List[str]:
+    """Requested venue fields in response order; None means all of them."""
+    if fields is None:
+        return list(VENUE_FIELDS)
+    wanted = set(fields)
+    return [name for name in VENUE_FIELDS if name in wanted]
+
+
+# -----------------------------
+# Venue results
+# -----------------------------
+
+class VenueResultEncoder:
+    """
+    Renders VenueSearchResults straight to JSON bytes.
+
+    The static fields of every venue ("venue_id": ..., "name": ..., ...) are
+    rendered once when the snapshot loads, so a response only encodes each
+    result's score (and reasons, if requested) and joins byte strings;
+    no pydantic models are built per result.
+    """
+
+    def __init__(self, venues: Dict[int, VenueInfo]) -> None:
+        self._fragments: Dict[int, Dict[str, bytes]] = {
+            vid: self._static_fragments(vid, venue) for vid, venue in venues.items()
+        }
+
+    @staticmethod
+    def _static_fragments(venue_id: int, venue: Any) -> Dict[str, bytes]:
+        values = {
+            "venue_id": venue_id,
+            "name": venue.name,
+            "city": venue.city,
+            "area": venue.area,
+            "venue_type": venue.venue_type,
+        }
+        return {name: dumps(name) + b":" + dumps(value) for name, value in values.items()}
+
+    def encode_result(self, result: VenueSearchResult, fields: Sequence[str]) -> bytes:
+        static = self._fragments.get(result.venue_id)
+        if static is None:
+            static = self._static_fragments(result.venue_id, result)
+        parts: List[bytes] = []
+        for name in fields:
+            if name == "score":
+                parts.append(b'"score":' + dumps(result.score))
+            elif name == "reasons":
+                parts.append(b'"reasons":' + dumps(result.reasons))
+            else:
+                parts.append(static[name])
+        return b"{" + b",".join(parts) + b"}"
+
+    def encode_results(self, results: Sequence[VenueSearchResult], fields: Sequence[str]) -> bytes:
+        return b"[" + b",".join(self.encode_result(r, fields) for r in results) + b"]"
+
+    def encode_batch(self, batch: Sequence[Sequence[VenueSearchResult]], fields: Sequence[str]) -> bytes:
+        return b"[" + b",".join(self.encode_results(results, fields) for results in batch) + b"]"
@@ -2,18 +2,51 @@
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Literal, NamedTuple
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Literal, NamedTuple, TypeVar, Union
 
+import copy
+import hashlib
 import json
 import math
 import os
+import time
 
 import numpy as np
-import pandas as pd
 from pydantic import BaseModel, Field
-from openai import OpenAI
+
+from app.services.ann_index import DEFAULT_NPROBE, IVF_ARRAYS, IVFIndex
+from app.services.embedding_cache import QueryEmbeddingCache
+from app.services.embedding_projection import PROJECTION_ARRAYS, EmbeddingProjection
+from app.services.embedding_provider import (
+    DEFAULT_OPENAI_MODEL,
+    EmbeddingProvider,
+    embedding_provider_from_env,
+)
+from app.services.metrics import CANDIDATE_NIGHTS, stage_timer, timed_stage, to_thread_observed
+from app.services.quantized_embeddings import (
+    EMBEDDING_STORAGE_MODES,
+    EmbeddingStorage,
+    QuantizedEmbeddings,
+)
+from app.services.response_encoder import VenueResultEncoder
+from app.services.sparse_struct import SPARSE_STRUCT_ARRAYS, SparseStruct, StructQuery, struct_layout
+from app.repositories.nights_repository import (
+    MANIFEST_FILENAME,
+    NIGHTS_BUNDLE_DIRNAME,
+    NightMatrix,
+    NightRecord,
+    build_night_matrix,
+    load_bundle_arrays,
+    load_nights_bundle,
+    load_nights_jsonl,
+)
+from app.repositories.venues_repository import VenueInfo, load_venues_csv
+
+if TYPE_CHECKING:  # the OpenAI SDK is imported only where a client is created
+    from openai import AsyncOpenAI
 
 # Note: internal API models are in app.models; not required here.
 
@@ -40,31 +73,6 @@ class SearchQueryParams(BaseModel):
 # Internal representations
 # -----------------------------
 
-@dataclass
-class NightRecord:
-    night_id: int
-    venue_id: int
-    city: str
-    day_of_week: str
-    is_weekend: bool
-    struct_features: np.ndarray
-    embedding: Optional[np.ndarray]  # None if not computed
-
-
-@dataclass
-class VenueInfo:
-    venue_id: int
-    name: str
-    city: str
-    area: str
-    venue_type: str
-    avg_budget_level: float
-    avg_party_level: float
-    typical_start_time: str
-    typical_end_time: str
-    top_vibe_tags: List[str]
-
-
 @dataclass
 class VenueSearchResult:
     venue_id: int
@@ -76,12 +84,38 @@ class VenueSearchResult:
     reasons: List[str]
 
 
+VenueAggregation = Literal["mean", "max", "softmax"]
+
+# Night rows to score: a contiguous partition slice, or row ids picked by the ANN index
+Rows = Union[slice, np.ndarray]
+
+# With quantized embeddings, this many times top_n_nights candidates are re-scored in float32
+DEFAULT_RESCORE_FACTOR = 4
+
+# Candidates are scored in blocks of this many nights (bounded temporaries per request)
+DEFAULT_SCORE_BLOCK_ROWS = 16_384
+
+# Prompt guardrails (semantic similarity of the query to the partition's nights)
+NO_MATCH_SIMILARITY = 0.6      # best match below this -> "no_match"
+STRONG_MATCH_SIMILARITY = 0.8  # a match at least this close counts as strong
+TOO_BROAD_FRACTION = 0.2       # more strong matches than this share of the partition -> "too_broad"
+
+
 class GuardedSearchResult(NamedTuple):
     status: Literal["ok", "too_broad", "no_match"]
     reason: str
     venues: List[VenueSearchResult]
 
 
+class NightScan(NamedTuple):
+    """Outcome of one streaming pass over a query's candidate nights."""
+    rows: np.ndarray     # night row ids of the best top_n_nights candidates, best first
+    scores: np.ndarray   # their combined scores (float32)
+    candidates: int      # number of candidates scanned
+    max_semantic: float  # best semantic similarity (0.0 without a usable query embedding)
+    strong_matches: int  # candidates with semantic similarity >= STRONG_MATCH_SIMILARITY
+
+
 # -----------------------------
 # Utility functions
 # -----------------------------
@@ -142,27 +176,250 @@ def cosine_similarity(a: Optional[np.ndarray], b: Optional[np.ndarray]) -> float
     return float(np.dot(a, b) / denom)
 
 
+def select_top_k(scores: np.ndarray, k: int, positions: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Indices of the k largest scores, in no particular order.
+
+    Of the scores equal to the k-th best, those with the lowest positions
+    win (positions default to the indices themselves), as in a stable sort.
+    """
+    n = int(scores.shape[0])
+    if k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.intp)
+    if k >= n:
+        return np.arange(n)
+    kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+    top = np.flatnonzero(scores >= kth)
+    if top.shape[0] == k:
+        return top
+    # More scores equal the k-th best than there are places left
+    above = top[scores[top] > kth]
+    ties = top[scores[top] == kth]
+    need = k - above.shape[0]
+    if positions is not None and ties.shape[0] > need:
+        ties = ties[np.argsort(positions[ties], kind="stable")]
+    return np.concatenate([above, ties[:need]])
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k largest scores, best first.
+
+    Uses argpartition, so only the k winners are sorted. Ties are broken
+    by position, like a stable sort over the whole array would.
+    """
+    part = np.sort(select_top_k(scores, k))
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def row_count(rows: Rows) -> int:
+    if isinstance(rows, slice):
+        return rows.stop - rows.start
+    return int(rows.size)
+
+
+def rows_between(rows: Rows, start: int, stop: int) -> Rows:
+    """rows[start:stop], staying a slice for contiguous rows (so blocks are views)."""
+    if isinstance(rows, slice):
+        return slice(rows.start + start, rows.start + stop)
+    return rows[start:stop]
+
+
+def rows_at(rows: Rows, positions: np.ndarray) -> np.ndarray:
+    """Night row ids at the given positions of rows."""
+    if isinstance(rows, slice):
+        return positions + rows.start
+    return rows[positions]
+
+
+class RunningTopK:
+    """
+    The k best (score, position) pairs over a stream of score blocks, so a
+    scan only ever holds k survivors plus the current block. result()
+    orders them best first, ties by position - the same order top_k_indices
+    gives over the whole array.
+
+    Blocks must come in position order: once k survivors are held, a block
+    score only gets in by beating the worst of them (a tie keeps the
+    earlier survivor), which one comparison per score decides.
+    """
+
+    def __init__(self, k: int) -> None:
+        self.k = max(0, k)
+        self.scores = np.zeros(0, dtype=np.float32)
+        self.positions = np.zeros(0, dtype=np.intp)
+
+    def push(self, scores: np.ndarray, offset: int) -> None:
+        """Offer the next block of scores; offset is the position of its first element."""
+        k = self.k
+        if k == 0 or scores.shape[0] == 0:
+            return
+        best = None
+        if self.scores.shape[0] == k:
+            better = np.flatnonzero(scores > self.scores.min())
+            if better.shape[0] == 0:
+                return
+            if better.shape[0] * 2 < scores.shape[0]:
+                best = better[select_top_k(scores[better], k)]
+        if best is None:
+            best = select_top_k(scores, k)
+        merged_scores = np.concatenate([self.scores, scores[best]])
+        merged_positions = np.concatenate([self.positions, best + offset])
+        if merged_scores.shape[0] > k:
+            keep = select_top_k(merged_scores, k, merged_positions)
+            merged_scores, merged_positions = merged_scores[keep], merged_positions[keep]
+        self.scores, self.positions = merged_scores, merged_positions
+
+    def result(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions, scores), best first."""
+        order = np.lexsort((self.positions, -self.scores))
+        return self.positions[order], self.scores[order]
+
+
+def aggregate_venue_scores(
+    scores: np.ndarray,
+    venue_codes: np.ndarray,
+    how: VenueAggregation = "mean",
+    softmax_temperature: float = 0.1,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Segmented reduction of night scores into one score per venue.
+
+    - "mean":    plain average of the venue's night scores
+    - "max":     best night score of the venue
+    - "softmax": mean weighted by exp(score / temperature), so a venue's
+                 strongest nights dominate without ignoring the rest
+
+    Returns (unique venue codes, aggregated scores).
+    """
+    codes, inverse = np.unique(venue_codes, return_inverse=True)
+    n_groups = codes.shape[0]
+    scores = scores.astype(np.float64)
+
+    if how == "mean":
+        sums = np.bincount(inverse, weights=scores, minlength=n_groups)
+        counts = np.bincount(inverse, minlength=n_groups)
+        return codes, sums / counts
+
+    group_max = np.full(n_groups, -np.inf)
+    np.maximum.at(group_max, inverse, scores)
+    if how == "max":
+        return codes, group_max
+
+    if how == "softmax":
+        if softmax_temperature <= 0:
+            raise ValueError("softmax_temperature must be positive")
+        # Shift by each venue's own max: every venue keeps at least one weight of 1.0
+        weights = np.exp((scores - group_max[inverse]) / softmax_temperature)
+        weighted = np.bincount(inverse, weights=weights * scores, minlength=n_groups)
+        norm = np.bincount(inverse, weights=weights, minlength=n_groups)
+        return codes, weighted / norm
+
+    raise ValueError(f"Unknown venue aggregation: {how!r}")
+
+
+def data_version(data_dir: Path) -> str:
+    """
+    Fingerprint of the data artifacts the engine loads from data_dir (names,
+    sizes and modification times), used as the snapshot version id.
+    """
+    paths = [data_dir / name for name in ("features_config.json", "venues.csv", "nights_features.jsonl")]
+    bundle_dir = data_dir / NIGHTS_BUNDLE_DIRNAME
+    if bundle_dir.is_dir():
+        paths.extend(sorted(bundle_dir.iterdir()))
+
+    h = hashlib.sha1()
+    for path in paths:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        h.update(f"{path.relative_to(data_dir)}:{st.st_size}:{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()[:12]
+
+
 # -----------------------------
 # Search Engine
 # -----------------------------
 
+T = TypeVar("T")
+
 class NightTwinSearchEngine:
     """
     NightTwinSearchEngine:
-    - loads venues.csv and nights_features.jsonl
-    - builds in-memory vectors for each night
+    - loads venues.csv and the nights (binary bundle or nights_features.jsonl)
+    - builds contiguous struct / embedding matrices over all nights
     - supports:
         - search()                    basic ranking
+        - search_many()               many queries, one embeddings request and
+                                      one matrix product per partition
         - search_with_prompt_guardrail()  adds "bad prompt" detection
     """
 
-    def __init__(self) -> None:
-        # Load config and data once
-        self.features_config = self._load_features_config()
+    def __init__(
+        self,
+        async_openai_client: Optional[AsyncOpenAI] = None,
+        embedding_storage: Optional[EmbeddingStorage] = None,
+        data_dir: Optional[Path] = None,
+        embedding_provider: Optional[EmbeddingProvider] = None,
+        embedding_cache: Optional[QueryEmbeddingCache] = None,
+    ) -> None:
+        # Data directory: backend/data unless NIGHTTWIN_DATA_DIR (or data_dir) says otherwise
+        self.data_dir = Path(data_dir or os.getenv("NIGHTTWIN_DATA_DIR") or DATA_DIR)
+
+        # Snapshot version: fingerprint of the artifacts as they were when loading started
+        self.version = data_version(self.data_dir)
+        self.loaded_at = time.time()
+
+        # Seconds per loading step (startup breakdown, see /health)
+        self.load_timings: Dict[str, float] = {}
+        started = time.perf_counter()
+
+        # Load config and data once. The three are independent, so they load
+        # concurrently (file reads and numpy work release the GIL).
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="engine-load") as pool:
+            features_config = pool.submit(self._timed, "features_config", self._load_features_config)
+            venues = pool.submit(self._timed, "venues", self._load_venues)
+            night_matrix = pool.submit(self._timed, "nights", self._load_nights_features)
+            self.features_config = features_config.result()
+            self.venues: Dict[int, VenueInfo] = venues.result()
+            self.night_matrix: NightMatrix = night_matrix.result()
         self.numeric_ranges = self.features_config.get("numeric_ranges", {})
 
-        self.venues: Dict[int, VenueInfo] = self._load_venues()
-        self.nights: List[NightRecord] = self._load_nights_features()
+        # Static venue fields pre-rendered as JSON for the API responses
+        self.result_encoder = self._timed("result_encoder", lambda: VenueResultEncoder(self.venues))
+
+        # Optional reduced embedding space and IVF index (only in the binary bundle)
+        self.embedding_projection: Optional[EmbeddingProjection] = self._timed(
+            "embedding_projection", self._load_embedding_projection
+        )
+        self.ann_index: Optional[IVFIndex] = self._timed("ann_index", self._load_ann_index)
+
+        # Struct features without their zeros (categorical codes, packed vibe
+        # bits, numeric columns); None keeps scoring the dense struct matrix.
+        self.sparse_struct: Optional[SparseStruct] = self._timed("sparse_struct", self._load_sparse_struct)
+        self.ann_nprobe = int(os.getenv("NIGHTTWIN_ANN_NPROBE", DEFAULT_NPROBE))
+
+        # Embedding storage for the first-pass scan: "float32" scans the
+        # matrix itself; "float16" / "int8" scan a quantized copy and re-score
+        # the best candidates against the float32 matrix, which (when loaded
+        # from the bundle) stays memory-mapped and is only paged in for them.
+        self.embedding_storage: EmbeddingStorage = (
+            embedding_storage or os.getenv("NIGHTTWIN_EMBEDDING_STORAGE", "float32")  # type: ignore[assignment]
+        )
+        if self.embedding_storage not in EMBEDDING_STORAGE_MODES:
+            raise ValueError(
+                f"Unknown embedding storage {self.embedding_storage!r} "
+                f"(expected one of {', '.join(EMBEDDING_STORAGE_MODES)})"
+            )
+        self.rescore_factor = int(os.getenv("NIGHTTWIN_RESCORE_FACTOR", DEFAULT_RESCORE_FACTOR))
+        self.score_block_rows = max(1, int(os.getenv("NIGHTTWIN_SCORE_BLOCK_ROWS", DEFAULT_SCORE_BLOCK_ROWS)))
+        self.quantized_embeddings: Optional[QuantizedEmbeddings] = None
+        if self.embedding_storage != "float32" and self.night_matrix.embeddings is not None:
+            self.quantized_embeddings = self._timed(
+                "quantize_embeddings",
+                lambda: QuantizedEmbeddings.from_float32(self.night_matrix.embeddings, self.embedding_storage),
+            )
 
         # Vocabularies (for query feature construction)
         self.cities_vocab = self.features_config["cities"]
@@ -175,85 +432,162 @@ class NightTwinSearchEngine:
         # Numeric ranges
         self._prepare_numeric_defaults()
 
-        # OpenAI client (for query embeddings)
-        api_key = os.getenv("OPENAI_API_KEY")
-        self.openai_client = OpenAI(api_key=api_key) if api_key else None
-        self.embedding_model = "text-embedding-3-small"
+        self._timed(
+            "embedding_provider",
+            lambda: self._init_query_embeddings(async_openai_client, embedding_provider, embedding_cache),
+        )
+        self.load_timings["total"] = round(time.perf_counter() - started, 4)
+
+    def _init_query_embeddings(
+        self,
+        async_openai_client: Optional[AsyncOpenAI],
+        embedding_provider: Optional[EmbeddingProvider],
+        embedding_cache: Optional[QueryEmbeddingCache],
+    ) -> None:
+        # Query embeddings (see app.services.embedding_provider). With the
+        # OpenAI backend, the async client is normally shared with
+        # PromptParser and owned by the app (see app.main).
+        self.embedding_provider: Optional[EmbeddingProvider] = (
+            embedding_provider
+            or embedding_provider_from_env(async_openai_client=async_openai_client)
+        )
+        self.embedding_model = (
+            self.embedding_provider.model if self.embedding_provider is not None else DEFAULT_OPENAI_MODEL
+        )
+        self._check_embedding_provider_dim()
+
+        # Query texts repeat a lot (small template), so embeddings are cached.
+        # The cache holds full (unprojected) embeddings, so reloaded snapshots share it.
+        self.embedding_cache = embedding_cache or QueryEmbeddingCache.from_env()
+
+    def for_worker(self, async_openai_client: Optional[AsyncOpenAI] = None) -> "NightTwinSearchEngine":
+        """
+        Engine for a forked worker process: shares every loaded array with
+        this one (copy-on-write pages that are never written, so they stay
+        shared) but gets its own embedding provider and query cache, whose
+        connections must not cross a fork.
+        """
+        engine = copy.copy(self)
+        engine._init_query_embeddings(async_openai_client, None, None)
+        return engine
 
     # ---------- Loading ----------
 
+    def _timed(self, step: str, load: Callable[[], T]) -> T:
+        start = time.perf_counter()
+        try:
+            return load()
+        finally:
+            self.load_timings[step] = round(time.perf_counter() - start, 4)
+
     def _load_features_config(self) -> Dict[str, Any]:
-        path = DATA_DIR / "features_config.json"
+        path = self.data_dir / "features_config.json"
         if not path.exists():
             raise FileNotFoundError(f"features_config.json not found at {path}")
         raw = path.read_text(encoding="utf-8")
         return json.loads(raw)
 
     def _load_venues(self) -> Dict[int, VenueInfo]:
-        path = DATA_DIR / "venues.csv"
-        if not path.exists():
-            raise FileNotFoundError(f"venues.csv not found at {path}")
-        df = pd.read_csv(path)
-
-        venues: Dict[int, VenueInfo] = {}
-        for _, row in df.iterrows():
-            vid = int(row["venue_id"])
-            top_tags_str = str(row.get("top_vibe_tags", "") or "")
-            top_tags = [t.strip() for t in top_tags_str.split(",") if t.strip()]
-
-            venues[vid] = VenueInfo(
-                venue_id=vid,
-                name=str(row["name"]),
-                city=str(row["city"]),
-                area=str(row["area"]),
-                venue_type=str(row["venue_type"]),
-                avg_budget_level=float(row.get("avg_budget_level", float("nan"))),
-                avg_party_level=float(row.get("avg_party_level", float("nan"))),
-                typical_start_time=str(row.get("typical_start_time", "")),
-                typical_end_time=str(row.get("typical_end_time", "")),
-                top_vibe_tags=top_tags,
-            )
-        return venues
-
-    def _load_nights_features(self) -> List[NightRecord]:
-        path = DATA_DIR / "nights_features.jsonl"
-        if not path.exists():
-            raise FileNotFoundError(f"nights_features.jsonl not found at {path}")
+        return load_venues_csv(self.data_dir / "venues.csv")
 
-        nights: List[NightRecord] = []
-        with path.open("r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                rec = json.loads(line)
+    def _load_nights_features(self) -> NightMatrix:
+        """
+        Prefer the memory-mapped binary bundle written by preprocess_nights.py;
+        fall back to parsing nights_features.jsonl.
+        """
+        bundle_dir = self.data_dir / NIGHTS_BUNDLE_DIRNAME
+        if (bundle_dir / MANIFEST_FILENAME).exists():
+            return load_nights_bundle(bundle_dir)
+
+        path = self.data_dir / "nights_features.jsonl"
+        return build_night_matrix(load_nights_jsonl(path))
+
+    def _load_bundle_extras(self, names: Tuple[str, ...]) -> Dict[str, Optional[np.ndarray]]:
+        """Optional arrays stored next to the nights in the bundle (all None without a bundle)."""
+        bundle_dir = self.data_dir / NIGHTS_BUNDLE_DIRNAME
+        if not (bundle_dir / MANIFEST_FILENAME).exists():
+            return {name: None for name in names}
+        return load_bundle_arrays(bundle_dir, names)
+
+    def _load_embedding_projection(self) -> Optional[EmbeddingProjection]:
+        projection = EmbeddingProjection.from_arrays(self._load_bundle_extras(PROJECTION_ARRAYS))
+        embeddings = self.night_matrix.embeddings
+        if projection is not None and embeddings is not None and projection.dim != embeddings.shape[1]:
+            raise ValueError(
+                f"Embedding projection outputs {projection.dim} dims but the bundle's night "
+                f"embeddings have {embeddings.shape[1]}. Re-run scripts/preprocess_nights.py."
+            )
+        return projection
 
-                night_id = int(rec["night_id"])
-                venue_id = int(rec["venue_id"])
-                city = str(rec.get("city", ""))
-                day_of_week = str(rec.get("day_of_week", ""))
-                is_weekend = day_of_week in ("Friday", "Saturday")
+    def _load_ann_index(self) -> Optional[IVFIndex]:
+        index = IVFIndex.from_arrays(self._load_bundle_extras(IVF_ARRAYS))
+        embeddings = self.night_matrix.embeddings
+        if index is None or embeddings is None or index.dim != embeddings.shape[1]:
+            return None
+        return index
 
-                struct_features = np.array(rec["struct_features"], dtype=np.float32)
+    def _load_sparse_struct(self) -> Optional[SparseStruct]:
+        """
+        The bundle's sparse struct store, or one encoded from the dense
+        matrix here (older bundles, nights_features.jsonl). None if the
+        nights do not match the features_config.json layout.
+        """
+        layout = struct_layout(self.features_config)
+        struct = self.night_matrix.struct
+        sparse = SparseStruct.from_arrays(self._load_bundle_extras(SPARSE_STRUCT_ARRAYS))
+        if sparse is not None and sparse.layout == layout and len(sparse) == struct.shape[0]:
+            return sparse
+        return SparseStruct.from_dense(struct, layout)
+
+    def _check_embedding_provider_dim(self) -> None:
+        provider = self.embedding_provider
+        embeddings = self.night_matrix.embeddings
+        if provider is None or provider.dim is None or embeddings is None:
+            return
+        expected = (
+            self.embedding_projection.source_dim
+            if self.embedding_projection is not None
+            else embeddings.shape[1]
+        )
+        if provider.dim != expected:
+            raise ValueError(
+                f"Embedding provider {provider.model!r} outputs {provider.dim} dims but the night "
+                f"embeddings expect {expected}. Re-run scripts/preprocess_nights.py with the same provider."
+            )
 
-                emb_list = rec.get("embedding", [])
-                if emb_list:
-                    embedding = np.array(emb_list, dtype=np.float32)
-                else:
-                    embedding = None
-
-                nights.append(
-                    NightRecord(
-                        night_id=night_id,
-                        venue_id=venue_id,
-                        city=city,
-                        day_of_week=day_of_week,
-                        is_weekend=is_weekend,
-                        struct_features=struct_features,
-                        embedding=embedding,
-                    )
-                )
-        return nights
+    def check_snapshot(self) -> None:
+        """
+        Sanity checks for freshly loaded data, run before a reloaded engine
+        replaces the serving one. Raises ValueError on data that loads but
+        cannot serve: no nights, artifacts from different datasets or
+        preprocessing runs, or a structural search that finds nothing.
+        """
+        m = self.night_matrix
+        if len(m) == 0:
+            raise ValueError(f"No nights loaded from {self.data_dir}")
+
+        venue_ids = m.venue_code_ids.tolist()
+        if not any(vid in self.venues for vid in venue_ids):
+            raise ValueError(f"None of the nights' venues are in {self.data_dir / 'venues.csv'}")
+
+        (city, is_weekend), _ = max(m.partitions.items(), key=lambda item: item[1].stop - item[1].start)
+        probe = SearchQueryParams(
+            city=city,
+            day_of_week="Saturday" if is_weekend else "Wednesday",
+            time="22:00",
+            group_size=2,
+            budget_level=2,
+            party_level=3,
+            tags=[],
+        )
+        struct_dim = self._build_query_struct_features(probe).shape[0]
+        if struct_dim != m.struct.shape[1]:
+            raise ValueError(
+                f"features_config.json describes {struct_dim} struct features but the nights "
+                f"have {m.struct.shape[1]} (artifacts from different preprocessing runs?)"
+            )
+        if not self._search_with_embedding(probe, None, 50, 5, 0.5, "mean", 0.1):
+            raise ValueError(f"Probe search for {city} returned no venues")
 
     def _prepare_numeric_defaults(self) -> None:
         nr = self.numeric_ranges
@@ -358,53 +692,395 @@ class NightTwinSearchEngine:
         )
         return struct_features
 
-    def _build_query_embedding(self, q: SearchQueryParams) -> Optional[np.ndarray]:
-        """
-        Build text for query embedding and call OpenAI.
-        If OpenAI client is not available, return None and use only structural similarity.
-        """
-        if self.openai_client is None:
-            return None
-
+    def _build_query_text(self, q: SearchQueryParams) -> str:
+        """Text that represents the query in embedding space."""
         tags_part = ", ".join(q.tags) if q.tags else "no specific tags"
 
-        text = (
+        return (
             f"We are a group of {q.group_size} friends going out in {q.city} "
             f"on {q.day_of_week} around {q.time}. "
             f"We want a party level around {q.party_level} and budget level {q.budget_level}. "
             f"We are looking for places with vibe: {tags_part}."
         )
 
-        resp = self.openai_client.embeddings.create(
-            model=self.embedding_model,
-            input=text,
-        )
-        emb = np.array(resp.data[0].embedding, dtype=np.float32)
-        return emb
+    def _project_query_embedding(self, emb: np.ndarray) -> np.ndarray:
+        """Map a full query embedding into the nights' (possibly reduced) embedding space."""
+        projection = self.embedding_projection
+        if projection is None or emb.shape != (projection.source_dim,):
+            return emb
+        return projection.apply(emb)
+
+    @timed_stage("embedding")
+    def _build_query_embedding(self, q: SearchQueryParams) -> Optional[np.ndarray]:
+        """
+        Build text for query embedding and embed it with the embedding provider
+        (through the query embedding cache). Without a provider, return None
+        and use only structural similarity.
+
+        The cache keeps full embeddings; the bundle's projection (if any) is
+        applied afterwards, so scoring happens in the reduced space.
+        """
+        if self.embedding_provider is None:
+            return None
+
+        text = self._build_query_text(q)
+        cached = self.embedding_cache.get(text, self.embedding_model)
+        if cached is not None:
+            return self._project_query_embedding(cached)
+
+        emb = self.embedding_provider.embed([text])[0]
+        self.embedding_cache.set(text, self.embedding_model, emb)
+        return self._project_query_embedding(emb)
+
+    @timed_stage("embedding")
+    async def _abuild_query_embedding(self, q: SearchQueryParams) -> Optional[np.ndarray]:
+        """Async twin of _build_query_embedding()."""
+        if self.embedding_provider is None:
+            return None
+
+        text = self._build_query_text(q)
+        cached = await self.embedding_cache.aget(text, self.embedding_model)
+        if cached is not None:
+            return self._project_query_embedding(cached)
+
+        emb = (await self.embedding_provider.aembed([text]))[0]
+        await self.embedding_cache.aset(text, self.embedding_model, emb)
+        return self._project_query_embedding(emb)
+
+    def _split_cached_texts(
+        self, texts: List[str]
+    ) -> Tuple[Dict[str, np.ndarray], List[str]]:
+        """Cached embeddings by text, plus the unique texts that still need embedding."""
+        found: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+        for text in dict.fromkeys(texts):
+            cached = self.embedding_cache.get(text, self.embedding_model)
+            if cached is not None:
+                found[text] = cached
+            else:
+                missing.append(text)
+        return found, missing
+
+    def _store_batch_embeddings(
+        self, found: Dict[str, np.ndarray], missing: List[str], embeddings: np.ndarray
+    ) -> None:
+        for text, emb in zip(missing, embeddings):
+            self.embedding_cache.set(text, self.embedding_model, emb)
+            found[text] = emb
+
+    @timed_stage("embedding")
+    def _build_query_embeddings(self, qs: List[SearchQueryParams]) -> List[Optional[np.ndarray]]:
+        """
+        _build_query_embedding() for many queries: cache hits are reused and
+        all remaining texts go out in a single embeddings request.
+        """
+        if self.embedding_provider is None:
+            return [None] * len(qs)
+
+        texts = [self._build_query_text(q) for q in qs]
+        found, missing = self._split_cached_texts(texts)
+        if missing:
+            self._store_batch_embeddings(found, missing, self.embedding_provider.embed(missing))
+        return [self._project_query_embedding(found[text]) for text in texts]
+
+    @timed_stage("embedding")
+    async def _abuild_query_embeddings(
+        self, qs: List[SearchQueryParams]
+    ) -> List[Optional[np.ndarray]]:
+        """Async twin of _build_query_embeddings()."""
+        if self.embedding_provider is None:
+            return [None] * len(qs)
+
+        texts = [self._build_query_text(q) for q in qs]
+        found = await self.embedding_cache.aget_many(texts, self.embedding_model)
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing:
+            embeddings = await self.embedding_provider.aembed(missing)
+            found.update(zip(missing, embeddings))
+            await self.embedding_cache.aset_many(zip(missing, embeddings), self.embedding_model)
+        return [self._project_query_embedding(found[text]) for text in texts]
 
     # ---------- Filtering by city and weekend/weekday ----------
 
-    def _filter_nights_by_query(self, q: SearchQueryParams) -> List[NightRecord]:
+    def _filter_nights_by_query(self, q: SearchQueryParams) -> slice:
         """
-        Filter nights to those that are most relevant:
+        Return the row slice (into self.night_matrix) of the most relevant nights:
         1) Prefer same city as query.
         2) Within that, prefer same weekend/weekday group.
         If filters become too strict and produce 0 candidates, we fall back.
-        """
-        # 1) Filter by city
-        by_city = [n for n in self.nights if n.city == q.city]
-        if not by_city:
-            # If no nights found for this city in data, fallback to all nights
-            by_city = self.nights
 
-        # 2) Filter by weekend vs weekday
+        Partitions are precomputed at load time, so this is a couple of dict
+        lookups and the slice is a zero-copy view into the matrices.
+        """
+        m = self.night_matrix
         q_is_weekend = q.day_of_week in ("Friday", "Saturday")
-        by_week_group = [n for n in by_city if n.is_weekend == q_is_weekend]
-        if by_week_group:
-            return by_week_group
 
-        # Fallback if no nights for same weekend/weekday group
-        return by_city
+        same_group = m.partitions.get((q.city, q_is_weekend))
+        if same_group is not None:
+            return same_group
+
+        # Fallback if no nights for same weekend/weekday group:
+        # the whole city is then just its other partition.
+        other_group = m.partitions.get((q.city, not q_is_weekend))
+        if other_group is not None:
+            return other_group
+
+        # If no nights found for this city in data, fallback to all nights
+        # (still preferring the same weekend/weekday group).
+        week_group = m.week_groups.get(q_is_weekend)
+        if week_group is not None:
+            return week_group
+        return slice(0, len(m))
+
+    # ---------- Scoring ----------
+
+    def _struct_query(self, query_struct: np.ndarray) -> Union[StructQuery, np.ndarray]:
+        """Query struct vector(s) (D,) or (D, k), prepared for _struct_dot()."""
+        if self.sparse_struct is None:
+            return query_struct
+        return self.sparse_struct.query(query_struct)
+
+    def _struct_dot(self, rows: Rows, struct_query: Union[StructQuery, np.ndarray]) -> np.ndarray:
+        """Struct similarities of the given rows: (n,), or (n, k) for k queries."""
+        if self.sparse_struct is None:
+            return self.night_matrix.struct[rows] @ struct_query
+        return self.sparse_struct.dot(rows, struct_query)
+
+    def _query_unit(self, query_emb: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """Unit-length float32 query embedding, or None if it can't be scored."""
+        m = self.night_matrix
+        if query_emb is None or m.embeddings is None:
+            return None
+        if query_emb.shape != (m.embeddings.shape[1],):
+            return None
+        q_norm = float(np.linalg.norm(query_emb))
+        if q_norm == 0:
+            return None
+        return (query_emb / q_norm).astype(np.float32)
+
+    def _select_candidates(
+        self,
+        partition: slice,
+        q_unit: Optional[np.ndarray],
+        ann_nprobe: Optional[int],
+    ) -> Rows:
+        """
+        Narrow the partition down to the nights of the ann_nprobe closest IVF
+        lists (per indexed partition). Without an index, a query embedding or
+        with ann_nprobe=0 the whole partition is scanned.
+        """
+        nprobe = self.ann_nprobe if ann_nprobe is None else ann_nprobe
+        if self.ann_index is None or q_unit is None or nprobe <= 0:
+            return partition
+        return self.ann_index.candidate_rows(partition, q_unit, nprobe)
+
+    def _candidates_for_query(
+        self,
+        q: SearchQueryParams,
+        q_unit: Optional[np.ndarray],
+        ann_nprobe: Optional[int],
+    ) -> Tuple[slice, Rows]:
+        """(partition, candidates) for one query; the "filter" stage in /metrics."""
+        with stage_timer("filter"):
+            partition = self._filter_nights_by_query(q)
+            candidates = self._select_candidates(partition, q_unit, ann_nprobe)
+        CANDIDATE_NIGHTS.observe(row_count(candidates))
+        return partition, candidates
+
+    @timed_stage("scoring")
+    def _scan_candidates(
+        self,
+        candidates: Rows,
+        query_struct: np.ndarray,
+        q_unit: Optional[np.ndarray],
+        lambda_struct: float,
+        top_n_nights: int,
+    ) -> NightScan:
+        """
+        Score candidate rows block by block (score_block_rows nights at a
+        time), keeping only a running top-n and the guardrail counters, so
+        memory per request stays bounded however big the partition is.
+
+        With quantized embedding storage the scan is approximate: the best
+        rescore_factor * top_n_nights candidates are kept instead and then
+        re-scored exactly. The guardrail counters then come from the
+        approximate similarities.
+        """
+        m = self.night_matrix
+        n = row_count(candidates)
+        weight = np.float32(lambda_struct)
+        quantized = self.quantized_embeddings if q_unit is not None else None
+        keep = top_n_nights if quantized is None else max(1, self.rescore_factor * top_n_nights)
+
+        struct_query = self._struct_query(query_struct)
+        top = RunningTopK(keep)
+        max_semantic = 0.0 if q_unit is None else -np.inf
+        strong_matches = 0
+        for start in range(0, n, self.score_block_rows):
+            block = rows_between(candidates, start, min(n, start + self.score_block_rows))
+            struct_sims = self._struct_dot(block, struct_query)
+            if q_unit is None:
+                top.push(weight * struct_sims, start)
+                continue
+
+            if quantized is None:
+                sem_sims = m.embeddings[block] @ q_unit
+            else:
+                sem_sims = quantized.dot(block, q_unit)
+            max_semantic = max(max_semantic, float(sem_sims.max()))
+            strong_matches += int(np.count_nonzero(sem_sims >= STRONG_MATCH_SIMILARITY))
+            top.push(sem_sims + weight * struct_sims, start)
+
+        positions, scores = top.result()
+        if quantized is not None and positions.size:
+            positions, scores = self._rescore_exact(
+                candidates, np.sort(positions), struct_query, q_unit, weight, top_n_nights
+            )
+        return NightScan(
+            rows=rows_at(candidates, positions),
+            scores=scores,
+            candidates=n,
+            max_semantic=float(max_semantic) if n else 0.0,
+            strong_matches=strong_matches,
+        )
+
+    def _rescore_exact(
+        self,
+        candidates: Rows,
+        positions: np.ndarray,
+        struct_query: Union[StructQuery, np.ndarray],
+        q_unit: np.ndarray,
+        weight: np.float32,
+        top_n_nights: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Re-score the candidates kept by an approximate (quantized) scan
+        against the float32 matrix; returns the best top_n_nights of them
+        as (positions, scores), best first. positions must be ascending,
+        so ties keep breaking by position.
+        """
+        m = self.night_matrix
+        rows = rows_at(candidates, positions)
+        scores = m.embeddings[rows] @ q_unit + weight * self._struct_dot(rows, struct_query)
+        best = top_k_indices(scores, top_n_nights)
+        return positions[best], scores[best]
+
+    @timed_stage("scoring")
+    def _scan_candidates_many(
+        self,
+        candidates: slice,
+        query_structs: List[np.ndarray],
+        q_units: List[Optional[np.ndarray]],
+        lambda_struct: float,
+        top_n_nights: int,
+    ) -> List[NightScan]:
+        """
+        _scan_candidates() for k queries sharing the same candidate rows:
+        one matrix-matrix product per block instead of k scans.
+        """
+        m = self.night_matrix
+        n = row_count(candidates)
+        k = len(query_structs)
+        weight = np.float32(lambda_struct)
+        struct_query = self._struct_query(np.stack(query_structs, axis=1))
+        with_emb = [j for j, q_unit in enumerate(q_units) if q_unit is not None]
+        q_matrix = np.stack([q_units[j] for j in with_emb], axis=1) if with_emb else None
+        quantized = self.quantized_embeddings if with_emb else None
+        rescored = set(with_emb) if quantized is not None else set()
+
+        tops = [
+            RunningTopK(max(1, self.rescore_factor * top_n_nights) if j in rescored else top_n_nights)
+            for j in range(k)
+        ]
+        max_semantic = np.full(k, -np.inf)
+        max_semantic[[j for j in range(k) if j not in with_emb]] = 0.0
+        strong_matches = np.zeros(k, dtype=np.int64)
+        for start in range(0, n, self.score_block_rows):
+            block = rows_between(candidates, start, min(n, start + self.score_block_rows))
+            scores = weight * self._struct_dot(block, struct_query)
+            if q_matrix is not None:
+                if quantized is None:
+                    sem_sims = m.embeddings[block] @ q_matrix
+                else:
+                    sem_sims = quantized.dot(block, q_matrix)
+                scores[:, with_emb] += sem_sims
+                max_semantic[with_emb] = np.maximum(max_semantic[with_emb], sem_sims.max(axis=0))
+                strong_matches[with_emb] += np.count_nonzero(sem_sims >= STRONG_MATCH_SIMILARITY, axis=0)
+            for j, top in enumerate(tops):
+                top.push(np.ascontiguousarray(scores[:, j]), start)
+
+        scans: List[NightScan] = []
+        for j, top in enumerate(tops):
+            positions, scores = top.result()
+            if j in rescored and positions.size:
+                positions, scores = self._rescore_exact(
+                    candidates,
+                    np.sort(positions),
+                    self._struct_query(query_structs[j]),
+                    q_units[j],
+                    weight,
+                    top_n_nights,
+                )
+            scans.append(
+                NightScan(
+                    rows=rows_at(candidates, positions),
+                    scores=scores,
+                    candidates=n,
+                    max_semantic=float(max_semantic[j]) if n else 0.0,
+                    strong_matches=int(strong_matches[j]),
+                )
+            )
+        return scans
+
+    # ---------- Top-k nights -> venues ----------
+
+    def _rank_venues(
+        self,
+        q: SearchQueryParams,
+        scan: NightScan,
+        top_k_venues: int,
+        venue_aggregation: VenueAggregation,
+        softmax_temperature: float,
+        with_reasons: bool = True,
+    ) -> List[VenueSearchResult]:
+        """
+        Reduce the scan's top nights per venue and build results for the
+        best top_k_venues. with_reasons=False leaves reasons empty (no
+        explanation text is built).
+        """
+        if scan.rows.size == 0:
+            return []
+
+        with stage_timer("aggregation"):
+            codes, venue_scores = aggregate_venue_scores(
+                scan.scores,
+                self.night_matrix.venue_codes[scan.rows],
+                how=venue_aggregation,
+                softmax_temperature=softmax_temperature,
+            )
+
+            best = top_k_indices(venue_scores, top_k_venues)
+            venue_ids = self.night_matrix.venue_code_ids[codes[best]]
+
+        results: List[VenueSearchResult] = []
+        with stage_timer("reasons"):
+            for vid, score in zip(venue_ids.tolist(), venue_scores[best].tolist()):
+                venue = self.venues.get(vid)
+                if not venue:
+                    continue
+                reasons = self._build_reasons_for_venue(venue, q) if with_reasons else []
+                results.append(
+                    VenueSearchResult(
+                        venue_id=vid,
+                        name=venue.name,
+                        city=venue.city,
+                        area=venue.area,
+                        venue_type=venue.venue_type,
+                        score=score,
+                        reasons=reasons,
+                    )
+                )
+        return results
 
     # ---------- Core search (no guardrails) ----------
 
@@ -414,67 +1090,202 @@ class NightTwinSearchEngine:
         top_n_nights: int = 50,
         top_k_venues: int = 5,
         lambda_struct: float = 0.5,
+        venue_aggregation: VenueAggregation = "mean",
+        softmax_temperature: float = 0.1,
+        ann_nprobe: Optional[int] = None,
+        with_reasons: bool = True,
     ) -> List[VenueSearchResult]:
         """
         Basic search:
         - filter nights by city and weekend/weekday
         - compute query struct & embedding
         - compute combined similarity vs filtered nights
-        - aggregate to venues
+        - take the top_n nights and aggregate them per venue
+          (venue_aggregation: "mean", "max" or "softmax")
         - return top_k venues
+
+        If the nights bundle has an ANN index, only the nights of the
+        ann_nprobe closest lists of each partition are scored (exactly);
+        None uses the engine default (NIGHTTWIN_ANN_NPROBE), 0 scans everything.
+
+        with_reasons=False skips the explanation texts (results get reasons=[]).
         """
-        query_struct = self._build_query_struct_features(q)
         query_emb = self._build_query_embedding(q)
-        query_struct_vec = query_struct
-
-        candidate_nights = self._filter_nights_by_query(q)
+        return self._search_with_embedding(
+            q,
+            query_emb,
+            top_n_nights=top_n_nights,
+            top_k_venues=top_k_venues,
+            lambda_struct=lambda_struct,
+            venue_aggregation=venue_aggregation,
+            softmax_temperature=softmax_temperature,
+            ann_nprobe=ann_nprobe,
+            with_reasons=with_reasons,
+        )
 
-        night_scores: List[Tuple[float, NightRecord]] = []
+    async def asearch(
+        self,
+        q: SearchQueryParams,
+        top_n_nights: int = 50,
+        top_k_venues: int = 5,
+        lambda_struct: float = 0.5,
+        venue_aggregation: VenueAggregation = "mean",
+        softmax_temperature: float = 0.1,
+        ann_nprobe: Optional[int] = None,
+        with_reasons: bool = True,
+    ) -> List[VenueSearchResult]:
+        """
+        Async search(): awaits the query embedding on the event loop and runs
+        only the CPU-bound scoring in a worker thread.
+        """
+        query_emb = await self._abuild_query_embedding(q)
+        return await to_thread_observed(
+            self._search_with_embedding,
+            q,
+            query_emb,
+            top_n_nights=top_n_nights,
+            top_k_venues=top_k_venues,
+            lambda_struct=lambda_struct,
+            venue_aggregation=venue_aggregation,
+            softmax_temperature=softmax_temperature,
+            ann_nprobe=ann_nprobe,
+            with_reasons=with_reasons,
+        )
 
-        for night in candidate_nights:
-            struct_sim = float(np.dot(query_struct_vec, night.struct_features))
+    def _search_with_embedding(
+        self,
+        q: SearchQueryParams,
+        query_emb: Optional[np.ndarray],
+        top_n_nights: int,
+        top_k_venues: int,
+        lambda_struct: float,
+        venue_aggregation: VenueAggregation,
+        softmax_temperature: float,
+        ann_nprobe: Optional[int] = None,
+        with_reasons: bool = True,
+    ) -> List[VenueSearchResult]:
+        """CPU-only part of search(), given an already computed query embedding."""
+        query_struct = self._build_query_struct_features(q)
+        q_unit = self._query_unit(query_emb)
 
-            if query_emb is not None and night.embedding is not None:
-                sem_sim = cosine_similarity(query_emb, night.embedding)
-            else:
-                sem_sim = 0.0
+        partition, candidates = self._candidates_for_query(q, q_unit, ann_nprobe)
+        scan = self._scan_candidates(
+            candidates, query_struct, q_unit, lambda_struct, top_n_nights
+        )
 
-            score = sem_sim + lambda_struct * struct_sim
-            night_scores.append((score, night))
+        return self._rank_venues(
+            q,
+            scan,
+            top_k_venues=top_k_venues,
+            venue_aggregation=venue_aggregation,
+            softmax_temperature=softmax_temperature,
+            with_reasons=with_reasons,
+        )
 
-        night_scores.sort(key=lambda x: x[0], reverse=True)
-        top_n = night_scores[:top_n_nights]
+    # ---------- Batch search ----------
 
-        venue_scores: Dict[int, List[float]] = {}
-        for score, night in top_n:
-            venue_scores.setdefault(night.venue_id, []).append(score)
+    def search_many(
+        self,
+        qs: List[SearchQueryParams],
+        top_n_nights: int = 50,
+        top_k_venues: int = 5,
+        lambda_struct: float = 0.5,
+        venue_aggregation: VenueAggregation = "mean",
+        softmax_temperature: float = 0.1,
+        ann_nprobe: Optional[int] = None,
+        with_reasons: bool = True,
+    ) -> List[List[VenueSearchResult]]:
+        """
+        search() for many queries at once; results come back in query order.
 
-        aggregated: List[Tuple[float, int]] = []
-        for vid, scores in venue_scores.items():
-            if not scores:
-                continue
-            aggregated.append((sum(scores) / len(scores), vid))
+        All query texts are embedded in one request, and queries that scan
+        the same partition are scored together with a single matrix product.
+        """
+        query_embs = self._build_query_embeddings(qs)
+        return self._search_many_with_embeddings(
+            qs,
+            query_embs,
+            top_n_nights=top_n_nights,
+            top_k_venues=top_k_venues,
+            lambda_struct=lambda_struct,
+            venue_aggregation=venue_aggregation,
+            softmax_temperature=softmax_temperature,
+            ann_nprobe=ann_nprobe,
+            with_reasons=with_reasons,
+        )
 
-        aggregated.sort(key=lambda x: x[0], reverse=True)
-        top_venues = aggregated[:top_k_venues]
+    async def asearch_many(
+        self,
+        qs: List[SearchQueryParams],
+        top_n_nights: int = 50,
+        top_k_venues: int = 5,
+        lambda_struct: float = 0.5,
+        venue_aggregation: VenueAggregation = "mean",
+        softmax_temperature: float = 0.1,
+        ann_nprobe: Optional[int] = None,
+        with_reasons: bool = True,
+    ) -> List[List[VenueSearchResult]]:
+        """Async search_many(): one awaited embeddings request, scoring in a worker thread."""
+        query_embs = await self._abuild_query_embeddings(qs)
+        return await to_thread_observed(
+            self._search_many_with_embeddings,
+            qs,
+            query_embs,
+            top_n_nights=top_n_nights,
+            top_k_venues=top_k_venues,
+            lambda_struct=lambda_struct,
+            venue_aggregation=venue_aggregation,
+            softmax_temperature=softmax_temperature,
+            ann_nprobe=ann_nprobe,
+            with_reasons=with_reasons,
+        )
 
-        results: List[VenueSearchResult] = []
-        for score, vid in top_venues:
-            venue = self.venues.get(vid)
-            if not venue:
+    def _search_many_with_embeddings(
+        self,
+        qs: List[SearchQueryParams],
+        query_embs: List[Optional[np.ndarray]],
+        top_n_nights: int,
+        top_k_venues: int,
+        lambda_struct: float,
+        venue_aggregation: VenueAggregation,
+        softmax_temperature: float,
+        ann_nprobe: Optional[int] = None,
+        with_reasons: bool = True,
+    ) -> List[List[VenueSearchResult]]:
+        """CPU-only part of search_many(), given the query embeddings."""
+        rank_kwargs = dict(
+            top_k_venues=top_k_venues,
+            venue_aggregation=venue_aggregation,
+            softmax_temperature=softmax_temperature,
+            with_reasons=with_reasons,
+        )
+        results: List[List[VenueSearchResult]] = [[] for _ in qs]
+        query_structs = [self._build_query_struct_features(q) for q in qs]
+        q_units = [self._query_unit(emb) for emb in query_embs]
+
+        # Queries scanning the same whole partition share one matrix product;
+        # ANN-narrowed queries each have their own rows and are scored alone.
+        shared: Dict[Tuple[int, int], List[int]] = {}
+        for i, q in enumerate(qs):
+            _, candidates = self._candidates_for_query(q, q_units[i], ann_nprobe)
+            if isinstance(candidates, slice):
+                shared.setdefault((candidates.start, candidates.stop), []).append(i)
                 continue
-            reasons = self._build_reasons_for_venue(venue, q)
-            results.append(
-                VenueSearchResult(
-                    venue_id=vid,
-                    name=venue.name,
-                    city=venue.city,
-                    area=venue.area,
-                    venue_type=venue.venue_type,
-                    score=score,
-                    reasons=reasons,
-                )
+            scan = self._scan_candidates(
+                candidates, query_structs[i], q_units[i], lambda_struct, top_n_nights
             )
+            results[i] = self._rank_venues(q, scan, **rank_kwargs)
+
+        for (start, stop), members in shared.items():
+            scans = self._scan_candidates_many(
+                slice(start, stop),
+                [query_structs[i] for i in members],
+                [q_units[i] for i in members],
+                lambda_struct,
+                top_n_nights,
+            )
+            for i, scan in zip(members, scans):
+                results[i] = self._rank_venues(qs[i], scan, **rank_kwargs)
         return results
 
     # ---------- Search with prompt guardrails ----------
@@ -485,6 +1296,10 @@ class NightTwinSearchEngine:
         top_n_nights: int = 200,
         top_k_venues: int = 5,
         lambda_struct: float = 0.5,
+        venue_aggregation: VenueAggregation = "mean",
+        softmax_temperature: float = 0.1,
+        ann_nprobe: Optional[int] = None,
+        with_reasons: bool = True,
     ) -> GuardedSearchResult:
         """
         Same as search(), but:
@@ -493,33 +1308,75 @@ class NightTwinSearchEngine:
           - "no_match"   -> best semantic similarity < 0.6
           - "too_broad"  -> too many very high semantic matches (>= 0.8)
         """
-        query_struct = self._build_query_struct_features(q)
         query_emb = self._build_query_embedding(q)
-        query_struct_vec = query_struct
-
-        candidate_nights = self._filter_nights_by_query(q)
-
-        night_scores: List[Tuple[float, NightRecord, float]] = []  # (score, night, sem_sim)
-        semantic_sims: List[float] = []
-
-        for night in candidate_nights:
-            struct_sim = float(np.dot(query_struct_vec, night.struct_features))
+        return self._guarded_search_with_embedding(
+            q,
+            query_emb,
+            top_n_nights=top_n_nights,
+            top_k_venues=top_k_venues,
+            lambda_struct=lambda_struct,
+            venue_aggregation=venue_aggregation,
+            softmax_temperature=softmax_temperature,
+            ann_nprobe=ann_nprobe,
+            with_reasons=with_reasons,
+        )
 
-            if query_emb is not None and night.embedding is not None:
-                sem_sim = cosine_similarity(query_emb, night.embedding)
-            else:
-                sem_sim = 0.0
+    async def asearch_with_prompt_guardrail(
+        self,
+        q: SearchQueryParams,
+        top_n_nights: int = 200,
+        top_k_venues: int = 5,
+        lambda_struct: float = 0.5,
+        venue_aggregation: VenueAggregation = "mean",
+        softmax_temperature: float = 0.1,
+        ann_nprobe: Optional[int] = None,
+        with_reasons: bool = True,
+    ) -> GuardedSearchResult:
+        """
+        Async search_with_prompt_guardrail(): embedding on the event loop,
+        scoring and guardrail checks in a worker thread.
+        """
+        query_emb = await self._abuild_query_embedding(q)
+        return await to_thread_observed(
+            self._guarded_search_with_embedding,
+            q,
+            query_emb,
+            top_n_nights=top_n_nights,
+            top_k_venues=top_k_venues,
+            lambda_struct=lambda_struct,
+            venue_aggregation=venue_aggregation,
+            softmax_temperature=softmax_temperature,
+            ann_nprobe=ann_nprobe,
+            with_reasons=with_reasons,
+        )
 
-            total_score = sem_sim + lambda_struct * struct_sim
-            night_scores.append((total_score, night, sem_sim))
-            semantic_sims.append(sem_sim)
+    def _guarded_search_with_embedding(
+        self,
+        q: SearchQueryParams,
+        query_emb: Optional[np.ndarray],
+        top_n_nights: int,
+        top_k_venues: int,
+        lambda_struct: float,
+        venue_aggregation: VenueAggregation,
+        softmax_temperature: float,
+        ann_nprobe: Optional[int] = None,
+        with_reasons: bool = True,
+    ) -> GuardedSearchResult:
+        """CPU-only part of search_with_prompt_guardrail(), given the query embedding."""
+        query_struct = self._build_query_struct_features(q)
+        q_unit = self._query_unit(query_emb)
 
-        # Guardrails only make sense if we actually used semantic similarity
-        if semantic_sims and query_emb is not None:
-            max_sem = max(semantic_sims)
+        partition, candidates = self._candidates_for_query(q, q_unit, ann_nprobe)
+        scan = self._scan_candidates(
+            candidates, query_struct, q_unit, lambda_struct, top_n_nights
+        )
 
+        # Guardrails only make sense if we actually used semantic similarity.
+        # The scan keeps running counters, so no per-candidate similarities
+        # are held to decide.
+        if scan.candidates and query_emb is not None:
             # 1) No good match
-            if max_sem < 0.6:
+            if scan.max_semantic < NO_MATCH_SIMILARITY:
                 return GuardedSearchResult(
                     status="no_match",
                     reason=(
@@ -529,10 +1386,11 @@ class NightTwinSearchEngine:
                     venues=[],
                 )
 
-            # 2) Too broad: many very strong matches
-            high_matches = sum(1 for s in semantic_sims if s >= 0.8)
-            total_nights = len(semantic_sims)
-            if total_nights > 0 and high_matches > 0.2 * total_nights:
+            # 2) Too broad: many very strong matches. With the ANN index only
+            # the probed nights are scored, so this counts the strong matches
+            # among them against the whole partition (a lower bound).
+            total_nights = partition.stop - partition.start
+            if total_nights > 0 and scan.strong_matches > TOO_BROAD_FRACTION * total_nights:
                 return GuardedSearchResult(
                     status="too_broad",
                     reason=(
@@ -543,39 +1401,14 @@ class NightTwinSearchEngine:
                 )
 
         # If we are here -> prompt is OK, do normal ranking
-        night_scores.sort(key=lambda x: x[0], reverse=True)
-        top_n = night_scores[:top_n_nights]
-
-        venue_scores: Dict[int, List[float]] = {}
-        for score, night, _ in top_n:
-            venue_scores.setdefault(night.venue_id, []).append(score)
-
-        aggregated: List[Tuple[float, int]] = []
-        for vid, scores in venue_scores.items():
-            if not scores:
-                continue
-            aggregated.append((sum(scores) / len(scores), vid))
-
-        aggregated.sort(key=lambda x: x[0], reverse=True)
-        top_venues = aggregated[:top_k_venues]
-
-        results: List[VenueSearchResult] = []
-        for score, vid in top_venues:
-            venue = self.venues.get(vid)
-            if not venue:
-                continue
-            reasons = self._build_reasons_for_venue(venue, q)
-            results.append(
-                VenueSearchResult(
-                    venue_id=vid,
-                    name=venue.name,
-                    city=venue.city,
-                    area=venue.area,
-                    venue_type=venue.venue_type,
-                    score=score,
-                    reasons=reasons,
-                )
-            )
+        results = self._rank_venues(
+            q,
+            scan,
+            top_k_venues=top_k_venues,
+            venue_aggregation=venue_aggregation,
+            softmax_temperature=softmax_temperature,
+            with_reasons=with_reasons,
+        )
 
         return GuardedSearchResult(
             status="ok",
@@ -0,0 +1,213 @@
+# backend/app/services/sparse_struct.py
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+
+# Names of the sparse struct arrays inside the nights bundle (see write_nights_bundle)
+SPARSE_STRUCT_ARRAYS = (
+    "struct_layout",
+    "struct_category_codes",
+    "struct_vibe_bits",
+    "struct_numeric",
+)
+
+# One-hot blocks of the struct vector, in features_config.json order
+CATEGORY_BLOCKS = ("cities", "days", "seasons", "location_types", "music_types")
+
+ENCODE_CHUNK_ROWS = 65_536
+
+# BYTE_BITS[b] = the 8 bits of byte b, most significant first (np.packbits order)
+BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).astype(np.float32)
+
+Rows = Union[slice, np.ndarray]
+
+
+def struct_layout(features_config: Dict[str, Any]) -> Tuple[int, ...]:
+    """
+    Block sizes of the struct vector described by features_config.json:
+
+        city | day | season | location_type | music | vibe tags | numeric
+    """
+    return tuple(len(features_config[name]) for name in CATEGORY_BLOCKS) + (
+        len(features_config["vibe_tags"]),
+        len(features_config["numeric_features"]),
+    )
+
+
+def _is_binary(block: np.ndarray) -> bool:
+    return bool(np.all((block == 0) | (block == 1)))
+
+
+# -----------------------------
+# Store
+# -----------------------------
+
+@dataclass
+class StructQuery:
+    """
+    One or more query struct vectors, reduced to the dimensions they use.
+
+    - category_tables: (block, table) for blocks the query is non-zero in;
+                       table[code] is the query's weight for that category
+                       (row 0, "no category", is zero)
+    - vibe_tables:     (byte, table) for packed vibe bytes the query has tags
+                       in; table[b] is the query weight of the bits set in
+                       byte b, i.e. popcount(b & query mask) for 0/1 tags
+    - numeric:         (K,) float32, or (K, k) for k queries
+    """
+    category_tables: List[Tuple[int, np.ndarray]]
+    vibe_tables: List[Tuple[int, np.ndarray]]
+    numeric: np.ndarray
+
+
+@dataclass
+class SparseStruct:
+    """
+    Columnar copy of NightMatrix.struct without its zeros.
+
+    The struct vector is mostly one-hot blocks (city, day, season, location
+    type, music), a multi-hot vibe block and a few numeric values, and
+    queries only fill in some of them. Here every one-hot block is one small
+    integer code per night and the vibe block is packed into bits, so a
+    struct similarity is a couple of table lookups per night plus one small
+    dense product over the numeric columns, instead of a D-wide float dot:
+
+    - category_codes: (B, N) uint8/uint16, 0 = no category, c + 1 = entry c
+    - vibe_bits:      (W, N) uint8, vibe tags packed 8 per byte
+    - numeric:        (K, N) float32
+
+    Every column is stored contiguously, so a scan only reads the columns
+    the query uses. Scores equal the dense dot products up to float rounding.
+    """
+    layout: Tuple[int, ...]
+    category_codes: np.ndarray
+    vibe_bits: np.ndarray
+    numeric: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.numeric.shape[1])
+
+    @property
+    def dim(self) -> int:
+        return int(sum(self.layout))
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.category_codes.nbytes + self.vibe_bits.nbytes + self.numeric.nbytes)
+
+    @classmethod
+    def from_dense(cls, struct: np.ndarray, layout: Tuple[int, ...]) -> Optional["SparseStruct"]:
+        """
+        Encode a dense (N, D) struct matrix, chunk by chunk. Returns None if
+        it does not have this layout (dimension mismatch, or a one-hot /
+        multi-hot block holding anything but single 0/1 entries), in which
+        case the engine keeps scoring the dense matrix.
+        """
+        *category_sizes, vibe_size, numeric_size = layout
+        n, dim = struct.shape
+        if dim != sum(layout):
+            return None
+
+        code_dtype = np.uint8 if max(category_sizes, default=0) < 255 else np.uint16
+        category_codes = np.zeros((len(category_sizes), n), dtype=code_dtype)
+        vibe_bits = np.zeros(((vibe_size + 7) // 8, n), dtype=np.uint8)
+        numeric = np.empty((numeric_size, n), dtype=np.float32)
+        for i in range(0, n, ENCODE_CHUNK_ROWS):
+            chunk = np.asarray(struct[i:i + ENCODE_CHUNK_ROWS], dtype=np.float32)
+            stop = i + chunk.shape[0]
+            offset = 0
+            for b, size in enumerate(category_sizes):
+                block = chunk[:, offset:offset + size]
+                if not _is_binary(block) or np.any(block.sum(axis=1) > 1):
+                    return None
+                if size:
+                    category_codes[b, i:stop] = np.where(block.any(axis=1), block.argmax(axis=1) + 1, 0)
+                offset += size
+
+            block = chunk[:, offset:offset + vibe_size]
+            if not _is_binary(block):
+                return None
+            if vibe_size:
+                vibe_bits[:, i:stop] = np.packbits(block.astype(bool), axis=1).T
+            offset += vibe_size
+
+            numeric[:, i:stop] = chunk[:, offset:].T
+
+        return cls(
+            layout=tuple(int(size) for size in layout),
+            category_codes=category_codes,
+            vibe_bits=vibe_bits,
+            numeric=numeric,
+        )
+
+    # ---------- Scoring ----------
+
+    def query(self, query_struct: np.ndarray) -> StructQuery:
+        """Prepare a (D,) query vector, or (D, k) for k queries, for dot()."""
+        q = np.asarray(query_struct, dtype=np.float32)
+        if q.shape[0] != self.dim:
+            raise ValueError(f"Query struct has {q.shape[0]} dims, the nights have {self.dim}")
+        cols = q.reshape(q.shape[0], -1)
+        k = cols.shape[1]
+
+        *category_sizes, vibe_size, _ = self.layout
+        category_tables: List[Tuple[int, np.ndarray]] = []
+        offset = 0
+        for b, size in enumerate(category_sizes):
+            block = cols[offset:offset + size]
+            if np.any(block):
+                table = np.zeros((size + 1, k), dtype=np.float32)
+                table[1:] = block
+                category_tables.append((b, table))
+            offset += size
+
+        vibe_tables: List[Tuple[int, np.ndarray]] = []
+        vibe = np.zeros((self.vibe_bits.shape[0] * 8, k), dtype=np.float32)
+        vibe[:vibe_size] = cols[offset:offset + vibe_size]
+        for w in range(self.vibe_bits.shape[0]):
+            weights = vibe[w * 8:(w + 1) * 8]
+            if np.any(weights):
+                vibe_tables.append((w, BYTE_BITS @ weights))
+        offset += vibe_size
+
+        numeric = np.ascontiguousarray(cols[offset:])
+        if q.ndim == 1:
+            category_tables = [(b, table[:, 0].copy()) for b, table in category_tables]
+            vibe_tables = [(w, table[:, 0].copy()) for w, table in vibe_tables]
+            numeric = numeric[:, 0].copy()
+        return StructQuery(category_tables=category_tables, vibe_tables=vibe_tables, numeric=numeric)
+
+    def dot(self, rows: Rows, query: StructQuery) -> np.ndarray:
+        """struct[rows] @ query_struct as float32: (n,), or (n, k) for k queries."""
+        out = self.numeric[:, rows].T @ query.numeric
+        for b, table in query.category_tables:
+            out += np.take(table, self.category_codes[b, rows], axis=0)
+        for w, table in query.vibe_tables:
+            out += np.take(table, self.vibe_bits[w, rows], axis=0)
+        return out
+
+    # ---------- Bundle (de)serialization ----------
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "struct_layout": np.array(self.layout, dtype=np.int64),
+            "struct_category_codes": self.category_codes,
+            "struct_vibe_bits": self.vibe_bits,
+            "struct_numeric": self.numeric,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, Optional[np.ndarray]]) -> Optional["SparseStruct"]:
+        if any(arrays.get(name) is None for name in SPARSE_STRUCT_ARRAYS):
+            return None
+        return cls(
+            layout=tuple(int(size) for size in arrays["struct_layout"].tolist()),
+            category_codes=arrays["struct_category_codes"],
+            vibe_bits=arrays["struct_vibe_bits"],
+            numeric=arrays["struct_numeric"],
+        )
@@ -0,0 +1,242 @@
+# backend/app/services/ttl_cache.py
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+
+# -----------------------------
+# Persistent tier
+# -----------------------------
+
+class SqliteCacheStore:
+    """
+    Small key -> bytes store with expiry, backed by one SQLite file.
+
+    SQLite (WAL mode) lets several uvicorn workers, and restarts of the same
+    worker, share one cache file without any extra service. Any storage error
+    is logged and treated as a miss: the cache must never fail a request.
+    """
+
+    def __init__(self, path: Path, table: str) -> None:
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table!r}")
+        self.path = Path(path)
+        self.table = table
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=5.0, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(f"DELETE FROM {table} WHERE expires_at <= ?", (time.time(),))
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("cache store read failed (%s): %s", self.path, e)
+            return None
+        if row is None or row[1] <= time.time():
+            return None
+        return bytes(row[0]), float(row[1])
+
+    def set(self, key: str, value: bytes, expires_at: float) -> None:
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                )
+        except sqlite3.Error as e:
+            logger.warning("cache store write failed (%s): %s", self.path, e)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# -----------------------------
+# In-memory LRU
+# -----------------------------
+
+class TTLCache(Generic[V]):
+    """
+    Thread-safe bounded LRU cache with a TTL per entry.
+
+    - get() refreshes recency; expired entries count as misses.
+    - set() accepts a per-entry ttl (defaults to ttl_seconds).
+    - With a store, misses fall through to it and sets are written through,
+      using encode/decode to convert values to/from bytes.
+    - aget()/aset() (and the *_many variants) are for the event loop: the
+      in-memory tier is used inline, store reads and writes run in a worker
+      thread, since the store can block on its lock or a busy SQLite file.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        store: Optional[SqliteCacheStore] = None,
+        encode: Optional[Callable[[V], bytes]] = None,
+        decode: Optional[Callable[[bytes], V]] = None,
+    ) -> None:
+        if store is not None and (encode is None or decode is None):
+            raise ValueError("A persistent store needs both encode and decode.")
+        self.max_entries = max(0, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.store = store
+        self._encode = encode
+        self._decode = decode
+
+        self._data: "OrderedDict[str, Tuple[V, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[V]:
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        return self._get_stored(key)
+
+    async def aget(self, key: str) -> Optional[V]:
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        if self.store is None:
+            return self._get_stored(key)  # counts the miss
+        return await asyncio.to_thread(self._get_stored, key)
+
+    async def aget_many(self, keys: Iterable[str]) -> Dict[str, V]:
+        """Values of the keys that are cached; the store is read in one thread hop."""
+        found: Dict[str, V] = {}
+        missing: List[str] = []
+        for key in keys:
+            value = self._get_memory(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+        if missing:
+            if self.store is None:
+                stored = [self._get_stored(key) for key in missing]
+            else:
+                stored = await asyncio.to_thread(lambda: [self._get_stored(key) for key in missing])
+            found.update((key, value) for key, value in zip(missing, stored) if value is not None)
+        return found
+
+    def _get_memory(self, key: str) -> Optional[V]:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+        return None
+
+    def _get_stored(self, key: str) -> Optional[V]:
+        # memory tier already missed
+        if self.store is not None:
+            stored = self.store.get(key)
+            if stored is not None:
+                raw, expires_at = stored
+                try:
+                    value = self._decode(raw)  # type: ignore[misc]
+                except Exception as e:
+                    logger.warning("dropping undecodable cache entry %s: %s", key, e)
+                else:
+                    with self._lock:
+                        self.store_hits += 1
+                        self._put(key, value, expires_at)
+                    return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: V, ttl: Optional[float] = None) -> None:
+        expires_at = self._set_memory(key, value, ttl)
+        if expires_at is not None:
+            self._set_stored(key, value, expires_at)
+
+    async def aset(self, key: str, value: V, ttl: Optional[float] = None) -> None:
+        expires_at = self._set_memory(key, value, ttl)
+        if expires_at is not None and self.store is not None:
+            await asyncio.to_thread(self._set_stored, key, value, expires_at)
+
+    async def aset_many(self, items: Iterable[Tuple[str, V]], ttl: Optional[float] = None) -> None:
+        """set() for several entries; the store is written in one thread hop."""
+        writes = []
+        for key, value in items:
+            expires_at = self._set_memory(key, value, ttl)
+            if expires_at is not None:
+                writes.append((key, value, expires_at))
+        if writes and self.store is not None:
+            await asyncio.to_thread(lambda: [self._set_stored(*write) for write in writes])
+
+    def _set_memory(self, key: str, value: V, ttl: Optional[float]) -> Optional[float]:
+        """Store in memory; returns the expiry, or None if the entry is not cached at all."""
+        ttl = self.ttl_seconds if ttl is None else float(ttl)
+        if ttl <= 0:
+            return None
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._put(key, value, expires_at)
+        return expires_at
+
+    def _set_stored(self, key: str, value: V, expires_at: float) -> None:
+        if self.store is not None:
+            self.store.set(key, self._encode(value), expires_at)  # type: ignore[misc]
+
+    def _put(self, key: str, value: V, expires_at: float) -> None:
+        # caller holds self._lock
+        if self.max_entries == 0:
+            return
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,64 @@
+"""
+Production multi-worker server: gunicorn managing uvicorn workers, with the
+search data loaded once in the master and shared with every worker.
+
+Run (from backend/):
+    pip install gunicorn
+    gunicorn -c gunicorn.conf.py app.main:app
+
+How the sharing works:
+  * preload_app imports app.main in the master and on_starting() loads the
+    engine data there (app.main.preload_engine()).
+  * Workers are forked from the master, so they start with its memory; the
+    nights bundle is memory-mapped (page cache, shared by construction) and
+    the arrays built at load time (quantized embeddings, jsonl fallback)
+    are shared copy-on-write pages that nothing writes to.
+  * gc.freeze() before each fork moves every object loaded so far out of the
+    collector's reach, so garbage collections in workers do not write to
+    (and thereby copy) the pages holding them.
+  * Each worker attaches its own embedding provider and query cache at
+    startup; clients and SQLite connections are never shared across a fork.
+
+Memory therefore grows with per-request state, not with the worker count,
+and one worker per core is affordable.
+
+Data reloads reach every worker: POST /admin/reload reloads the worker that
+receives it and writes a reload request (<data dir>/.reload_request, or
+NIGHTTWIN_RELOAD_REQUEST_PATH) that the other workers poll and follow within
+a couple of seconds; NIGHTTWIN_RELOAD_POLL_SECONDS makes every worker watch
+the files itself. A reloaded bundle is memory-mapped again and its pages stay
+shared, but everything built from it at load time (quantized embeddings,
+jsonl fallback, ...) is private to each worker, so after a reload memory
+grows with the worker count again. Only a full restart of gunicorn (stop and
+start, not HUP: with preload_app, HUP re-forks from the master's old data)
+brings back one shared copy. Workers forked after a reload notice the
+master's data is outdated and load the current files themselves.
+
+Settings (environment):
+  PORT             listen port (default 8000)
+  WEB_CONCURRENCY  worker count (default: one per CPU core)
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# First request of a worker can include the embedding client warm-up
+timeout = 60
+graceful_timeout = 30
+
+
+def on_starting(server):
+    from app.main import preload_engine
+
+    preload_engine()
+    gc.collect()
+    server.log.info("NightTwin engine data preloaded in the master process")
+
+
+def pre_fork(server, worker):
+    gc.freeze()
@@ -0,0 +1,406 @@
+"""
+benchmark_engine.py
+
+Offline micro-benchmark of NightTwinSearchEngine: load time, peak RSS and
+p50 / p99 latency of search() and search_with_prompt_guardrail(), per
+partition size. Query embeddings come from a local stub (no OpenAI calls),
+so only the engine itself is measured.
+
+Two modes:
+
+1) One data directory (e.g. written by generate_synthetic_nights.py):
+
+    cd backend
+    python -m scripts.benchmark_engine --data-dir data/synthetic_1m
+
+2) A size sweep: generate (or reuse) one synthetic data directory per size
+   under --work-dir and benchmark each in a fresh process, so load time and
+   peak RSS are not polluted by the previous size:
+
+    cd backend
+    python -m scripts.benchmark_engine --sizes 10000,100000,1000000,10000000 --work-dir /tmp/nighttwin_bench
+
+Engine settings come from the usual environment variables
+(NIGHTTWIN_EMBEDDING_STORAGE, NIGHTTWIN_RESCORE_FACTOR, ...) or the flags
+below; --ann-min-partition-size adds an IVF index to generated bundles and
+--embedding-provider env embeds queries with the configured provider
+instead of the stub.
+"""
+
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import hashlib
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.embedding_cache import QueryEmbeddingCache
+from app.services.embedding_provider import EmbeddingProvider
+from app.services.search_engine import NightTwinSearchEngine, SearchQueryParams
+from scripts.generate_synthetic_nights import (
+    DEFAULT_EMBEDDING_DIM,
+    generate_dataset,
+    synthetic_embedding,
+    topic_vectors,
+)
+
+# -----------------------------
+# Configuration
+# -----------------------------
+
+DEFAULT_QUERIES_PER_PARTITION = 20
+WARMUP_QUERIES = 5
+QUERY_NOISE = 0.5  # query embeddings sit this far (noise norm) from a real night
+SEED = 0
+
+# Partition size buckets for the latency report (upper bounds)
+SIZE_BUCKETS = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+QUERY_TAGS_FALLBACK = ["loud", "chill", "crowded", "live music"]
+
+
+# -----------------------------
+# Stubbed query embeddings
+# -----------------------------
+
+class StubEmbeddingProvider(EmbeddingProvider):
+    """
+    Embedding provider returning deterministic vectors without any network
+    call, shaped like the synthetic night embeddings.
+
+    Texts registered with register() get that exact vector (the benchmark
+    places each query next to a night of its partition, as a real prompt
+    would be); any other text gets a vector near a topic picked from a hash
+    of the text. The size is only known once the nights are loaded, see
+    set_dim().
+    """
+
+    def __init__(self, seed: int = SEED) -> None:
+        self.model = "benchmark-stub"
+        self.seed = seed
+        self.vectors: Dict[str, np.ndarray] = {}
+        self.topics = np.zeros((0, 0), dtype=np.float32)
+
+    def set_dim(self, dim: int) -> None:
+        self.dim = dim
+        self.model = f"benchmark-stub-{dim}"
+        self.topics = topic_vectors(dim)
+
+    def register(self, text: str, vector: np.ndarray) -> None:
+        self.vectors[text] = np.asarray(vector, dtype=np.float32)
+
+    def embed_text(self, text: str) -> np.ndarray:
+        vector = self.vectors.get(text)
+        if vector is not None:
+            return vector
+        digest = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16)
+        rng = np.random.default_rng([self.seed, digest])
+        topic = np.array([rng.integers(0, self.topics.shape[0])])
+        return synthetic_embedding(self.topics, topic, rng, noise=QUERY_NOISE)[0]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.stack([self.embed_text(text) for text in texts]).astype(np.float32)
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile_ms(samples: List[float], pct: float) -> float:
+    return float(np.percentile(np.array(samples) * 1000.0, pct)) if samples else float("nan")
+
+
+def size_bucket(n: int) -> Tuple[int, str]:
+    """(lower bound, label) of the SIZE_BUCKETS bucket holding a partition of n nights."""
+    lower = 0
+    for upper in SIZE_BUCKETS:
+        if n < upper:
+            return lower, f"{lower:,}-{upper:,}"
+        lower = upper
+    return lower, f">={lower:,}"
+
+
+def build_queries(
+    engine: NightTwinSearchEngine,
+    stub: Optional[StubEmbeddingProvider],
+    queries_per_partition: int,
+    rng: random.Random,
+) -> List[Tuple[Tuple[str, bool], SearchQueryParams]]:
+    """
+    queries_per_partition random queries for every (city, is_weekend)
+    partition. With the stub provider, each is embedded near a random night
+    of its partition (when the bundle is not projected, the night
+    embeddings live in query space).
+    """
+    matrix = engine.night_matrix
+    tags = list(engine.vibe_vocab) or QUERY_TAGS_FALLBACK
+    weekend_days = ["Friday", "Saturday"]
+    weekday_days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Sunday"]
+    near_nights = (
+        stub is not None and engine.embedding_projection is None and matrix.embeddings is not None
+    )
+    np_rng = np.random.default_rng(SEED)
+
+    queries: List[Tuple[Tuple[str, bool], SearchQueryParams]] = []
+    for (city, weekend), rows in sorted(matrix.partitions.items()):
+        for _ in range(queries_per_partition):
+            q = SearchQueryParams(
+                city=city,
+                day_of_week=rng.choice(weekend_days if weekend else weekday_days),
+                time=f"{rng.choice([20, 21, 22, 23, 0, 1, 2]):02d}:{rng.choice([0, 30]):02d}",
+                group_size=rng.randint(1, 10),
+                budget_level=rng.randint(1, 5),
+                party_level=rng.randint(1, 5),
+                tags=rng.sample(tags, k=min(len(tags), rng.randint(1, 3))),
+            )
+            if near_nights:
+                night = rng.randrange(rows.start, rows.stop)
+                anchor = np.asarray(matrix.embeddings[night:night + 1])
+                stub.register(
+                    engine._build_query_text(q),
+                    synthetic_embedding(anchor, np.array([0]), np_rng, noise=QUERY_NOISE)[0],
+                )
+            queries.append(((city, weekend), q))
+    rng.shuffle(queries)
+    return queries
+
+
+def time_calls(
+    fn: Callable[[SearchQueryParams], Any],
+    queries: List[Tuple[Tuple[str, bool], SearchQueryParams]],
+) -> Tuple[List[Tuple[Tuple[str, bool], float]], List[Any]]:
+    timings: List[Tuple[Tuple[str, bool], float]] = []
+    results: List[Any] = []
+    for key, q in queries:
+        t0 = time.perf_counter()
+        results.append(fn(q))
+        timings.append((key, time.perf_counter() - t0))
+    return timings, results
+
+
+def summarize(
+    timings: List[Tuple[Tuple[str, bool], float]],
+    partition_sizes: Dict[Tuple[str, bool], int],
+) -> Dict[str, Any]:
+    by_bucket: Dict[Tuple[int, str], List[float]] = {}
+    for key, seconds in timings:
+        by_bucket.setdefault(size_bucket(partition_sizes[key]), []).append(seconds)
+    everything = [seconds for _, seconds in timings]
+
+    def stats(samples: List[float]) -> Dict[str, float]:
+        return {
+            "count": len(samples),
+            "p50_ms": percentile_ms(samples, 50),
+            "p99_ms": percentile_ms(samples, 99),
+            "max_ms": percentile_ms(samples, 100),
+        }
+
+    return {
+        "all": stats(everything),
+        "by_partition_size": {
+            label: stats(samples) for (_, label), samples in sorted(by_bucket.items())
+        },
+    }
+
+
+# -----------------------------
+# Benchmark of one data directory
+# -----------------------------
+
+def run_benchmark(
+    data_dir: Path,
+    queries_per_partition: int = DEFAULT_QUERIES_PER_PARTITION,
+    ann_nprobe: Optional[int] = None,
+    seed: int = SEED,
+    stub_embeddings: bool = True,
+) -> Dict[str, Any]:
+    """
+    With stub_embeddings=False the provider configured in the environment
+    (NIGHTTWIN_EMBEDDING_PROVIDER, e.g. a local http server) embeds the
+    queries, so its latency is part of the measurement.
+    """
+    stub = StubEmbeddingProvider(seed=seed) if stub_embeddings else None
+
+    rss_before = peak_rss_mb()
+    t0 = time.perf_counter()
+    engine = NightTwinSearchEngine(data_dir=data_dir, embedding_provider=stub)
+    load_seconds = time.perf_counter() - t0
+    rss_after_load = peak_rss_mb()
+
+    matrix = engine.night_matrix
+    if stub is not None:
+        if engine.embedding_projection is not None:
+            stub.set_dim(engine.embedding_projection.source_dim)
+        elif matrix.embeddings is not None:
+            stub.set_dim(int(matrix.embeddings.shape[1]))
+        else:
+            stub.set_dim(DEFAULT_EMBEDDING_DIM)
+        engine.embedding_model = stub.model
+    engine.embedding_cache = QueryEmbeddingCache(max_entries=0)  # every query is embedded
+
+    queries = build_queries(engine, stub, queries_per_partition, random.Random(seed))
+    partition_sizes = {key: rows.stop - rows.start for key, rows in matrix.partitions.items()}
+
+    # First query touches the memory-mapped pages of its partition
+    cold_timings, _ = time_calls(lambda q: engine.search(q, ann_nprobe=ann_nprobe), queries[:1])
+    time_calls(lambda q: engine.search(q, ann_nprobe=ann_nprobe), queries[:WARMUP_QUERIES])
+
+    search_timings, _ = time_calls(lambda q: engine.search(q, ann_nprobe=ann_nprobe), queries)
+    guarded_timings, guarded = time_calls(
+        lambda q: engine.search_with_prompt_guardrail(q, ann_nprobe=ann_nprobe), queries
+    )
+    statuses: Dict[str, int] = {}
+    for result in guarded:
+        statuses[result.status] = statuses.get(result.status, 0) + 1
+
+    return {
+        "data_dir": str(data_dir),
+        "num_nights": len(matrix),
+        "num_venues": len(engine.venues),
+        "num_partitions": len(matrix.partitions),
+        "largest_partition": max(partition_sizes.values(), default=0),
+        "embedding_dim": int(matrix.embeddings.shape[1]) if matrix.embeddings is not None else None,
+        "embedding_storage": engine.embedding_storage,
+        "embedding_model": engine.embedding_model if engine.embedding_provider is not None else None,
+        "ann_index": engine.ann_index is not None,
+        "ann_nprobe": ann_nprobe if ann_nprobe is not None else engine.ann_nprobe,
+        "load_seconds": load_seconds,
+        "peak_rss_mb_before_load": rss_before,
+        "peak_rss_mb_after_load": rss_after_load,
+        "peak_rss_mb": peak_rss_mb(),
+        "cold_query_ms": cold_timings[0][1] * 1000.0 if cold_timings else float("nan"),
+        "search": summarize(search_timings, partition_sizes),
+        "search_with_prompt_guardrail": summarize(guarded_timings, partition_sizes),
+        "guardrail_statuses": statuses,
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(
+        f"\n{result['data_dir']}: {result['num_nights']:,} nights, {result['num_venues']:,} venues, "
+        f"{result['num_partitions']} partitions (largest {result['largest_partition']:,}), "
+        f"embeddings {result['embedding_dim']}-dim {result['embedding_storage']} "
+        f"(queries: {result['embedding_model'] or 'none'}), "
+        f"ANN {'on (nprobe ' + str(result['ann_nprobe']) + ')' if result['ann_index'] else 'off'}"
+    )
+    print(
+        f"  load {result['load_seconds']:.2f}s, peak RSS {result['peak_rss_mb_after_load']:.0f} MB after load / "
+        f"{result['peak_rss_mb']:.0f} MB after queries, cold query {result['cold_query_ms']:.1f} ms"
+    )
+    for method in ("search", "search_with_prompt_guardrail"):
+        summary = result[method]
+        overall = summary["all"]
+        print(f"  {method}: p50 {overall['p50_ms']:.2f} ms, p99 {overall['p99_ms']:.2f} ms ({overall['count']} queries)")
+        for bucket, stats in summary["by_partition_size"].items():
+            print(
+                f"    partition {bucket:>22} nights: p50 {stats['p50_ms']:8.2f} ms  "
+                f"p99 {stats['p99_ms']:8.2f} ms  ({stats['count']})"
+            )
+    print(f"  guardrail statuses: {result['guardrail_statuses']}")
+
+
+# -----------------------------
+# Size sweep
+# -----------------------------
+
+def run_sweep(
+    sizes: List[int],
+    work_dir: Path,
+    embedding_dim: int,
+    ann_min_partition_size: Optional[int],
+    extra_args: List[str],
+) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    for size in sizes:
+        data_dir = work_dir / f"nights_{size}_{embedding_dim}d"
+        if ann_min_partition_size is not None:
+            data_dir = data_dir.with_name(data_dir.name + f"_ivf{ann_min_partition_size}")
+        if not (data_dir / "nights_bundle" / "manifest.json").exists():
+            print(f"Generating {size:,} nights into {data_dir}...")
+            generate_dataset(
+                data_dir,
+                num_nights=size,
+                embedding_dim=embedding_dim,
+                ann_min_partition_size=ann_min_partition_size,
+            )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            out_path = Path(tmp) / "result.json"
+            cmd = [
+                sys.executable, "-m", "scripts.benchmark_engine",
+                "--data-dir", str(data_dir),
+                "--json", str(out_path),
+                "--quiet",
+                *extra_args,
+            ]
+            subprocess.run(cmd, check=True, cwd=Path(__file__).resolve().parents[1], env=os.environ.copy())
+            result = json.loads(out_path.read_text(encoding="utf-8"))
+        print_report(result)
+        results.append(result)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark NightTwinSearchEngine offline.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--data-dir", type=Path, help="benchmark this data directory")
+    target.add_argument("--sizes", type=str, help="comma-separated night counts for a synthetic sweep")
+    parser.add_argument("--work-dir", type=Path, default=Path(tempfile.gettempdir()) / "nighttwin_bench")
+    parser.add_argument("--embedding-dim", type=int, default=DEFAULT_EMBEDDING_DIM)
+    parser.add_argument("--ann-min-partition-size", type=int, default=None)
+    parser.add_argument("--queries-per-partition", type=int, default=DEFAULT_QUERIES_PER_PARTITION)
+    parser.add_argument("--nprobe", type=int, default=None, help="ann_nprobe passed to every search")
+    parser.add_argument(
+        "--embedding-provider",
+        choices=("stub", "env"),
+        default="stub",
+        help="stub: local vectors near the nights; env: NIGHTTWIN_EMBEDDING_PROVIDER (its latency is included)",
+    )
+    parser.add_argument("--json", type=Path, default=None, help="write the results as JSON to this path")
+    parser.add_argument("--quiet", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    per_run_args = [
+        "--queries-per-partition", str(args.queries_per_partition),
+        "--embedding-provider", args.embedding_provider,
+    ]
+    if args.nprobe is not None:
+        per_run_args += ["--nprobe", str(args.nprobe)]
+
+    if args.sizes:
+        sizes = [int(size.replace("_", "")) for size in args.sizes.split(",") if size.strip()]
+        results: Any = run_sweep(
+            sizes, args.work_dir, args.embedding_dim, args.ann_min_partition_size, per_run_args
+        )
+    else:
+        results = run_benchmark(
+            args.data_dir,
+            args.queries_per_partition,
+            args.nprobe,
+            stub_embeddings=args.embedding_provider == "stub",
+        )
+        if not args.quiet:
+            print_report(results)
+
+    if args.json is not None:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+build_nights_bundle.py
+
+Offline script to convert an existing nights_features.jsonl into the binary
+nights_bundle/ that the API memory-maps at startup, without recomputing
+features or embeddings.
+
+preprocess_nights.py already writes the bundle; use this one for
+nights_features.jsonl files produced before the bundle existed, or to rebuild
+the bundle with different projection / ANN settings. It uses the same
+settings as preprocess_nights.py (see write_search_bundle there).
+
+Run:
+
+    cd backend
+    python -m scripts.build_nights_bundle
+"""
+
+from pathlib import Path
+import json
+
+from app.repositories.nights_repository import (
+    NIGHTS_BUNDLE_DIRNAME,
+    build_night_matrix,
+    load_nights_jsonl,
+)
+from scripts.preprocess_nights import write_search_bundle
+
+# -----------------------------
+# Configuration
+# -----------------------------
+
+BASE_DIR = Path(__file__).resolve().parents[1]  # backend/
+DATA_DIR = BASE_DIR / "data"
+
+FEATURES_CONFIG_PATH = DATA_DIR / "features_config.json"
+NIGHTS_FEATURES_PATH = DATA_DIR / "nights_features.jsonl"
+NIGHTS_BUNDLE_DIR = DATA_DIR / NIGHTS_BUNDLE_DIRNAME
+
+
+def build_nights_bundle() -> None:
+    print(f"Loading nights from {NIGHTS_FEATURES_PATH}...")
+    nights = load_nights_jsonl(NIGHTS_FEATURES_PATH)
+
+    config = json.loads(FEATURES_CONFIG_PATH.read_text(encoding="utf-8"))
+
+    matrix = build_night_matrix(nights)
+    write_search_bundle(NIGHTS_BUNDLE_DIR, matrix, config)
+    print(f"Saved {len(matrix)} nights to {NIGHTS_BUNDLE_DIR}")
+
+
+def main() -> None:
+    build_nights_bundle()
+
+
+if __name__ == "__main__":
+    main()
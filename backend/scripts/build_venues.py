@@ -16,15 +16,17 @@ Run once (or when dataset changes):
 
 from pathlib import Path
 from typing import List, Dict, Any, Tuple
+import re
 import pandas as pd
 import numpy as np
-from collections import Counter
 
 
 # -----------------------------
 # Paths
 # -----------------------------
 
+BASE_DIR = Path(__file__).resolve().parents[1]  # backend/
+DATA_DIR = BASE_DIR / "data"
 
 RAW_CSV_PATH = DATA_DIR / "serbia_nightlife_dataset.csv"
 VENUES_CSV_PATH = DATA_DIR / "venues.csv"
@@ -66,20 +68,47 @@ def minutes_to_time_str(minutes: float) -> str:
     return f"{h:02d}:{m:02d}"
 
 
-def unwrap_end_time(start_min: int, end_min: int) -> int:
+def parse_time_column(values: pd.Series) -> np.ndarray:
+    """
+    parse_time_to_minutes() over a whole column.
+
+    A dataset has at most a few thousand distinct time strings, so each one
+    is parsed once and broadcast back to the rows.
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = [parse_time_to_minutes(v) for v in uniques]
+    parsed.append(parse_time_to_minutes(None))  # code -1 = missing value
+    return np.asarray(parsed, dtype=np.int64)[codes]
+
+
+def unwrap_end_times(start_min: np.ndarray, end_min: np.ndarray) -> np.ndarray:
     """
     Handle nights that go past midnight:
     If end_min <= start_min, assume it's after midnight and add 24h.
     """
-    if end_min <= start_min:
-        return end_min + 24 * 60
-    return end_min
+    return np.where(end_min <= start_min, end_min + 24 * 60, end_min)
 
 
 # -----------------------------
 # Venue type inference
 # -----------------------------
 
+# Checked in order; the first type with a keyword in the venue text wins.
+VENUE_TYPE_KEYWORDS: List[Tuple[str, List[str]]] = [
+    ("kafana", ["kafana", "starogradska", "turbo folk", "narodna"]),
+    ("club", ["club", "discoteca", "discotheque", "techno", "edm", "house", "afterparty"]),
+    ("rock_bar", ["rock", "metal", "hard rock", "punk"]),
+    ("pub", ["pub", "pivnica", "craft beer"]),
+    ("cocktail_bar", ["cocktail bar", "rooftop", "wine tasting"]),
+]
+DEFAULT_VENUE_TYPE = "bar"
+
+VENUE_TYPE_PATTERNS: List[Tuple[str, "re.Pattern[str]"]] = [
+    (venue_type, re.compile("|".join(re.escape(k) for k in keywords)))
+    for venue_type, keywords in VENUE_TYPE_KEYWORDS
+]
+
+
 def infer_venue_type(
     names: List[str],
     type_of_music_values: List[str],
@@ -101,28 +130,23 @@ def infer_venue_type(
 
     text = " ".join([all_names, all_music, all_tags])
 
-    # Kafana
-    if "kafana" in text or "starogradska" in text or "turbo folk" in text or "narodna" in text:
-        return "kafana"
-
-    # Club / discotheque
-    if any(k in text for k in ["club", "discoteca", "discotheque", "techno", "edm", "house", "afterparty"]):
-        return "club"
-
-    # Rock bar
-    if any(k in text for k in ["rock", "metal", "hard rock", "punk"]):
-        return "rock_bar"
+    for venue_type, pattern in VENUE_TYPE_PATTERNS:
+        if pattern.search(text):
+            return venue_type
+    return DEFAULT_VENUE_TYPE
 
-    # Pub / beer place
-    if any(k in text for k in ["pub", "pivnica", "craft beer"]):
-        return "pub"
 
-    # Cocktail / rooftop
-    if any(k in text for k in ["cocktail bar", "rooftop", "wine tasting"]):
-        return "cocktail_bar"
-
-    # Fallback
-    return "bar"
+def infer_venue_types(texts: pd.Series) -> np.ndarray:
+    """
+    infer_venue_type() for many venues at once, given each venue's
+    lowercased "names music tags" text (see build_venue_texts).
+    """
+    conditions = [
+        texts.str.contains(pattern.pattern, regex=True).to_numpy(dtype=bool)
+        for _, pattern in VENUE_TYPE_PATTERNS
+    ]
+    choices = [venue_type for venue_type, _ in VENUE_TYPE_PATTERNS]
+    return np.select(conditions, choices, default=DEFAULT_VENUE_TYPE)
 
 
 # -----------------------------
@@ -143,21 +167,123 @@ def parse_vibe_tags_column(vibe_str: Any) -> List[str]:
     return [p for p in parts if p]
 
 
-def get_top_vibe_tags_for_group(series: pd.Series, max_tags: int = 5) -> List[str]:
+def explode_vibe_tags(vibe_col: pd.Series) -> pd.Series:
     """
-    Merge all vibe_tags from all nights of a venue and return the
-    top max_tags by frequency.
+    parse_vibe_tags_column() over a whole column: one entry per (night, tag),
+    indexed by the night's row position, in cell order.
     """
-    counter: Counter = Counter()
-    for cell in series:
-        tags = parse_vibe_tags_column(cell)
-        counter.update(tags)
+    cells = vibe_col.reset_index(drop=True).astype(object)
+    tags = cells.str.split(",").explode().str.strip().str.lower()
+    return tags[tags.notna() & (tags != "")]
+
+
+# -----------------------------
+# Grouped aggregations
+# -----------------------------
+#
+# All helpers take `group_codes`, the venue index (0..n_venues-1) of every
+# night, and return one value per venue.
+
+def grouped_mean(group_codes: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Mean of each venue's values, skipping NaN (NaN if a venue has none).
+
+    Matches Series.mean() on the venue's rows to the last bit: NaN are zeroed
+    and each venue's rows go through numpy's own (pairwise) sum, batched over
+    all venues with the same number of nights. A plain groupby().mean() sums
+    in a different order and can differ in the last digit of venues.csv.
+    """
+    sizes = np.bincount(group_codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    order = np.argsort(group_codes, kind="stable")
+
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)[order]
+    counts = np.bincount(group_codes, weights=present, minlength=n_groups)
+
+    sums = np.zeros(n_groups, dtype=np.float64)
+    for size in np.unique(sizes[sizes > 0]):
+        groups = np.flatnonzero(sizes == size)
+        rows = starts[groups, None] + np.arange(size)
+        sums[groups] = filled[rows].sum(axis=1)
+
+    means = np.full(n_groups, np.nan, dtype=np.float64)
+    np.divide(sums, counts, out=means, where=counts > 0)
+    return means
 
-    if not counter:
-        return []
 
-    top = [tag for tag, _ in counter.most_common(max_tags)]
-    return top
+def grouped_join(group_codes: np.ndarray, values: np.ndarray, n_groups: int, sep: str) -> np.ndarray:
+    """
+    Join each venue's string values with sep, keeping their order ("" if none).
+    `group_codes` here is the venue of each value.
+    """
+    order = np.argsort(group_codes, kind="stable")
+    ordered = values[order].tolist()
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(group_codes, minlength=n_groups))))
+    return np.array(
+        [sep.join(ordered[lo:hi]) for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist())],
+        dtype=object,
+    )
+
+
+def ranked_value_counts(group_codes: np.ndarray, values: pd.Series) -> pd.DataFrame:
+    """
+    Count each value per venue and rank the values within their venue by
+    frequency, ties broken by first occurrence (Counter.most_common order).
+
+    `values` is indexed by night row position; missing values are ignored.
+    Returns columns: group, value, count (sorted by group, then rank).
+    """
+    values = values.dropna()
+    frame = pd.DataFrame(
+        {
+            "group": group_codes[values.index.to_numpy()],
+            "value": values.astype(str).to_numpy(dtype=object),
+            "first": np.arange(len(values)),
+        }
+    )
+    counts = (
+        frame.groupby(["group", "value"], sort=False)["first"]
+        .agg(["size", "min"])
+        .reset_index()
+        .rename(columns={"size": "count", "min": "first"})
+    )
+    counts = counts.sort_values(
+        ["group", "count", "first"], ascending=[True, False, True], kind="stable"
+    )
+    return counts[["group", "value", "count"]]
+
+
+def grouped_top_values(
+    group_codes: np.ndarray,
+    values: pd.Series,
+    n_groups: int,
+    k: int,
+    sep: str = ",",
+) -> np.ndarray:
+    """The k most frequent values of each venue joined with sep ("" if none)."""
+    top = ranked_value_counts(group_codes, values).groupby("group", sort=False).head(k)
+    return grouped_join(top["group"].to_numpy(), top["value"].to_numpy(), n_groups, sep)
+
+
+def grouped_text(group_codes: np.ndarray, values: pd.Series, n_groups: int) -> np.ndarray:
+    """Lowercased non-missing values of each venue joined by spaces, in row order."""
+    values = values.dropna()
+    lowered = values.astype(str).str.lower().to_numpy(dtype=object)
+    return grouped_join(group_codes[values.index.to_numpy()], lowered, n_groups, " ")
+
+
+def build_venue_texts(
+    names: pd.Series,
+    group_codes: np.ndarray,
+    df: pd.DataFrame,
+) -> pd.Series:
+    """Per-venue "name music tags" text, as infer_venue_type() builds it."""
+    n_groups = len(names)
+    all_names = np.array([str(n).lower() for n in names], dtype=object)
+    all_music = grouped_text(group_codes, df["type_of_music"], n_groups)
+    all_tags = grouped_text(group_codes, df["vibe_tags"], n_groups)
+    return pd.Series(all_names + " " + all_music + " " + all_tags, dtype=object)
 
 
 # -----------------------------
@@ -190,103 +316,67 @@ def build_venues_and_nights() -> None:
     # Build venues table
     # -------------------------
 
-    # Group by (name, city, area) to define a venue
+    # Group by (name, city, area) to define a venue; venue_id follows the
+    # sorted group order
+    df = df.reset_index(drop=True)
     group_cols = ["name", "city", "area"]
-    grouped = df.groupby(group_cols, dropna=False)
-
-    venues_rows: List[Dict[str, Any]] = []
-
-    print(f"Building venues from {len(grouped)} unique (name, city, area) combinations...")
-
-    for venue_idx, ((name, city, area), group) in enumerate(grouped, start=1):
-        # Collect raw columns
-        type_of_music_values = group["type_of_music"].dropna().astype(str).tolist()
-        vibe_series = group["vibe_tags"]
-        location_types = group["location_type"].dropna().astype(str).tolist()
-        days = group["day_of_week"].dropna().astype(str).tolist()
-
-        # Infer venue type
-        all_vibe_as_text = [str(v) for v in vibe_series.dropna().tolist()]
-        venue_type = infer_venue_type(
-            names=[str(name)],
-            type_of_music_values=type_of_music_values,
-            all_vibe_tags=all_vibe_as_text,
-        )
-
-        # Typical start/end time:
-        start_minutes = group["start_time"].apply(parse_time_to_minutes)
-        end_minutes_raw = group["end_time"].apply(parse_time_to_minutes)
-        end_minutes_unwrapped = [
-            unwrap_end_time(s, e) for s, e in zip(start_minutes, end_minutes_raw)
-        ]
-
-        if len(start_minutes) > 0:
-            typical_start_min = float(np.median(start_minutes))
-        else:
-            typical_start_min = 21 * 60  # fallback 21:00
-
-        if len(end_minutes_unwrapped) > 0:
-            typical_end_min = float(np.median(end_minutes_unwrapped))
-        else:
-            typical_end_min = typical_start_min + 3 * 60  # fallback +3h
-
-        typical_start_str = minutes_to_time_str(typical_start_min)
-        typical_end_str = minutes_to_time_str(typical_end_min)
-
-        # Aggregated numeric stats
-        def safe_mean(series: pd.Series) -> float:
-            series = pd.to_numeric(series, errors="coerce")
-            if series.notna().sum() == 0:
-                return float("nan")
-            return float(series.mean())
-
-        avg_budget = safe_mean(group["budget_level"])
-        avg_party = safe_mean(group["party_level"])
-        avg_cost = safe_mean(group["cost"])
-        avg_tip = safe_mean(group["tip"])
-        avg_alcohol = safe_mean(group["alcohol_level"])
-        avg_crowd = safe_mean(group["crowd_density"])
-        avg_temp = safe_mean(group["temperature"])
-
-        # Dominant (most frequent) day, location type, type_of_music
-        def mode_or_none(values: List[str]) -> str:
-            if not values:
-                return ""
-            c = Counter(values)
-            return c.most_common(1)[0][0]
-
-        dominant_day = mode_or_none(days)
-        dominant_location_type = mode_or_none(location_types)
-        dominant_music = mode_or_none(type_of_music_values)
-
-        # Top vibe tags
-        top_vibe_tags = get_top_vibe_tags_for_group(vibe_series, max_tags=5)
-        top_vibe_tags_str = ",".join(top_vibe_tags) if top_vibe_tags else ""
-
-        venues_rows.append(
-            {
-                "venue_id": venue_idx,
-                "name": name,
-                "city": city,
-                "area": area,
-                "venue_type": venue_type,
-                "avg_budget_level": avg_budget,
-                "avg_party_level": avg_party,
-                "avg_cost": avg_cost,
-                "avg_tip": avg_tip,
-                "avg_alcohol_level": avg_alcohol,
-                "avg_crowd_density": avg_crowd,
-                "avg_temperature": avg_temp,
-                "typical_start_time": typical_start_str,
-                "typical_end_time": typical_end_str,
-                "dominant_day_of_week": dominant_day,
-                "dominant_location_type": dominant_location_type,
-                "dominant_type_of_music": dominant_music,
-                "top_vibe_tags": top_vibe_tags_str,
-            }
+    grouped = df.groupby(group_cols, dropna=False, sort=True)
+    group_codes = grouped.ngroup().to_numpy()
+    keys = grouped.size().index.to_frame(index=False)
+    n_venues = len(keys)
+
+    print(f"Building venues from {n_venues} unique (name, city, area) combinations...")
+
+    # Infer venue type
+    venue_texts = build_venue_texts(keys["name"], group_codes, df)
+    venue_types = infer_venue_types(venue_texts)
+
+    # Typical start/end time (median per venue)
+    start_minutes = parse_time_column(df["start_time"])
+    end_minutes = unwrap_end_times(start_minutes, parse_time_column(df["end_time"]))
+    times = pd.DataFrame({"start": start_minutes, "end": end_minutes}).groupby(group_codes).median()
+
+    # Aggregated numeric stats (NaN when a venue has no numeric values)
+    numeric_cols = [
+        ("avg_budget_level", "budget_level"),
+        ("avg_party_level", "party_level"),
+        ("avg_cost", "cost"),
+        ("avg_tip", "tip"),
+        ("avg_alcohol_level", "alcohol_level"),
+        ("avg_crowd_density", "crowd_density"),
+        ("avg_temperature", "temperature"),
+    ]
+    means = {
+        out: grouped_mean(
+            group_codes,
+            pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64),
+            n_venues,
         )
+        for out, col in numeric_cols
+    }
 
-    venues_df = pd.DataFrame(venues_rows)
+    # Dominant (most frequent) day, location type, type_of_music; top vibe tags
+    def dominant(col: str) -> np.ndarray:
+        return grouped_top_values(group_codes, df[col], n_venues, k=1)
+
+    venues_df = pd.DataFrame(
+        {
+            "venue_id": np.arange(1, n_venues + 1),
+            "name": keys["name"],
+            "city": keys["city"],
+            "area": keys["area"],
+            "venue_type": venue_types,
+            **means,
+            "typical_start_time": [minutes_to_time_str(m) for m in times["start"]],
+            "typical_end_time": [minutes_to_time_str(m) for m in times["end"]],
+            "dominant_day_of_week": dominant("day_of_week"),
+            "dominant_location_type": dominant("location_type"),
+            "dominant_type_of_music": dominant("type_of_music"),
+            "top_vibe_tags": grouped_top_values(
+                group_codes, explode_vibe_tags(df["vibe_tags"]), n_venues, k=5
+            ),
+        }
+    )
 
     # Save venues table
     VENUES_CSV_PATH.parent.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,422 @@
+"""
+generate_synthetic_nights.py
+
+Offline script to write a synthetic NightTwin data directory for
+benchmarks (see benchmark_engine.py), at any size from a few thousand to
+tens of millions of nights:
+
+    <out>/features_config.json
+    <out>/venues.csv
+    <out>/nights_bundle/           (binary bundle, as written by preprocess_nights.py)
+    <out>/nights_features.jsonl    (only with --jsonl; slow and large past ~1M nights)
+
+The data is random but shaped like the real one:
+- nights per city follow a Zipf-like skew (one big city, a long tail of
+  small ones), split ~40/60 between weekend and weekday nights
+- every venue belongs to one city and gets its nights from that city only
+- night embeddings are unit vectors scattered around a few hundred "vibe"
+  topics, so semantic similarities look like real ones (around 0.5-0.8
+  inside a topic, ~0 across topics); queries can be embedded near the same
+  topics with topic_vectors() and synthetic_embedding()
+
+Embeddings are generated chunk by chunk into a memory-mapped scratch file,
+so RAM stays well below the size of the embedding matrix.
+
+Run:
+
+    cd backend
+    python -m scripts.generate_synthetic_nights --nights 1000000 --out data/synthetic_1m
+"""
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.repositories.nights_repository import (
+    NIGHTS_BUNDLE_DIRNAME,
+    WEEKEND_DAYS,
+    NightMatrix,
+    index_partitions,
+    l2_normalize_rows,
+    write_nights_bundle,
+)
+from app.services.ann_index import build_ivf_index
+from app.services.sparse_struct import SparseStruct, struct_layout
+
+# -----------------------------
+# Configuration
+# -----------------------------
+
+DEFAULT_NUM_NIGHTS = 100_000
+DEFAULT_NUM_CITIES = 12
+DEFAULT_EMBEDDING_DIM = 256
+NIGHTS_PER_VENUE = 200
+
+CITY_SKEW = 1.1         # Zipf exponent of nights per city
+WEEKEND_SHARE = 0.4     # share of nights on Friday / Saturday
+NUM_TOPICS = 256        # vibe topics night embeddings cluster around
+TOPICS_PER_CITY = 48
+EMBEDDING_NOISE = 0.7   # noise norm around the topic (0.7 -> ~0.67 cosine inside a topic)
+GENERATE_CHUNK_ROWS = 65_536
+SEED = 0
+
+EMBEDDING_MODEL = "synthetic"
+
+CITY_NAMES = [
+    "Belgrade", "Novi Sad", "Nis", "Kragujevac", "Subotica", "Zrenjanin",
+    "Pancevo", "Cacak", "Novi Pazar", "Kraljevo", "Smederevo", "Leskovac",
+    "Valjevo", "Krusevac", "Vranje", "Sabac", "Uzice", "Sombor",
+    "Pozarevac", "Pirot", "Zajecar", "Kikinda", "Sremska Mitrovica", "Jagodina",
+]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+SEASONS = ["autumn", "spring", "summer", "winter"]
+LOCATION_TYPES = ["indoor", "outdoor"]
+MUSIC_TYPES = ["house", "jazz", "pop", "rock", "techno", "turbo folk"]
+VIBE_TAGS = [
+    "loud", "chill", "crowded", "kafana", "rakija", "techno", "date", "live music",
+    "rooftop", "cocktails", "craft beer", "dancing", "karaoke", "student", "sports",
+    "wine", "hookah", "retro", "underground", "terrace",
+]
+VENUE_TYPES = ["bar", "club", "kafana", "pub", "lounge", "splav"]
+NUMERIC_FEATURES = [
+    "group_size_norm", "budget_norm", "party_norm", "alcohol_norm", "crowd_norm",
+    "duration_norm", "temperature_norm", "cost_norm", "tip_norm", "start_time_norm",
+    "is_weekend",
+]
+NUMERIC_RANGES = {
+    "group_size": [1, 12],
+    "budget_level": [1, 5],
+    "party_level": [1, 5],
+    "start_time_minutes": [1020, 1620],
+}
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+
+def city_shares(num_cities: int, skew: float = CITY_SKEW) -> np.ndarray:
+    """Share of nights per city, largest first (Zipf-like)."""
+    weights = 1.0 / np.arange(1, num_cities + 1, dtype=np.float64) ** skew
+    return weights / weights.sum()
+
+
+def split_counts(total: int, shares: np.ndarray) -> np.ndarray:
+    """Integer counts proportional to shares that add up to total (each at least 1 if possible)."""
+    counts = np.floor(shares * total).astype(np.int64)
+    counts[np.argsort(-shares)[: total - counts.sum()]] += 1
+    if total >= len(shares):
+        for i in np.flatnonzero(counts == 0):
+            counts[i] = 1
+            counts[np.argmax(counts)] -= 1
+    return counts
+
+
+def topic_vectors(dim: int, num_topics: int = NUM_TOPICS, seed: int = SEED) -> np.ndarray:
+    """Unit topic centers shared by the generator and the benchmark's query stub."""
+    rng = np.random.default_rng([seed, dim, num_topics])
+    return l2_normalize_rows(rng.standard_normal((num_topics, dim)))
+
+
+def synthetic_embedding(
+    topics: np.ndarray,
+    topic_ids: np.ndarray,
+    rng: np.random.Generator,
+    noise: float = EMBEDDING_NOISE,
+) -> np.ndarray:
+    """Unit vectors scattered around topics[topic_ids]; noise is the norm of the offset."""
+    dim = topics.shape[1]
+    offsets = rng.standard_normal((topic_ids.shape[0], dim), dtype=np.float32)
+    offsets *= np.float32(noise / np.sqrt(dim))
+    offsets += topics[topic_ids]
+    return l2_normalize_rows(offsets)
+
+
+def build_features_config(cities: List[str]) -> Dict[str, Any]:
+    return {
+        "cities": cities,
+        "days": DAYS,
+        "seasons": SEASONS,
+        "location_types": LOCATION_TYPES,
+        "music_types": MUSIC_TYPES,
+        "vibe_tags": VIBE_TAGS,
+        "numeric_features": NUMERIC_FEATURES,
+        "numeric_ranges": NUMERIC_RANGES,
+    }
+
+
+def struct_dim(config: Dict[str, Any]) -> int:
+    return (
+        len(config["cities"]) + len(config["days"]) + len(config["seasons"])
+        + len(config["location_types"]) + len(config["music_types"])
+        + len(config["vibe_tags"]) + len(config["numeric_features"])
+    )
+
+
+def build_struct_block(
+    config: Dict[str, Any],
+    city_code: int,
+    day_codes: np.ndarray,
+    is_weekend: bool,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """Struct features for one chunk of a partition, in the layout of preprocess_nights.py."""
+    n = day_codes.shape[0]
+    out = np.zeros((n, struct_dim(config)), dtype=np.float32)
+    rows = np.arange(n)
+    col = 0
+
+    out[:, col + city_code] = 1.0
+    col += len(config["cities"])
+    out[rows, col + day_codes] = 1.0
+    col += len(config["days"])
+    for vocab_key in ("seasons", "location_types", "music_types"):
+        size = len(config[vocab_key])
+        out[rows, col + rng.integers(0, size, n)] = 1.0
+        col += size
+
+    n_vibes = len(config["vibe_tags"])
+    for _ in range(3):  # up to 3 tags per night
+        picked = rng.random(n) < 0.7
+        out[rows[picked], col + rng.integers(0, n_vibes, int(picked.sum()))] = 1.0
+    col += n_vibes
+
+    n_numeric = len(config["numeric_features"])
+    out[:, col:col + n_numeric - 1] = rng.random((n, n_numeric - 1), dtype=np.float32)
+    out[:, col + n_numeric - 1] = 1.0 if is_weekend else 0.0
+    return out
+
+
+# -----------------------------
+# Generation
+# -----------------------------
+
+def generate_venues(
+    cities_by_size: List[str],
+    num_nights: int,
+    rng: np.random.Generator,
+) -> pd.DataFrame:
+    """About NIGHTS_PER_VENUE nights per venue, venues spread over cities like the nights."""
+    num_venues = max(len(cities_by_size), num_nights // NIGHTS_PER_VENUE)
+    per_city = split_counts(num_venues, city_shares(len(cities_by_size)))
+
+    venue_ids = np.arange(1, num_venues + 1)
+    tags = np.array(VIBE_TAGS, dtype=object)
+    return pd.DataFrame({
+        "venue_id": venue_ids,
+        "name": [f"Venue {vid}" for vid in venue_ids],
+        "city": np.repeat(np.array(cities_by_size, dtype=object), per_city),
+        "area": [f"Area {i}" for i in rng.integers(1, 20, num_venues)],
+        "venue_type": rng.choice(VENUE_TYPES, num_venues),
+        "avg_budget_level": np.round(rng.uniform(1, 5, num_venues), 2),
+        "avg_party_level": np.round(rng.uniform(1, 5, num_venues), 2),
+        "typical_start_time": rng.choice(["20:00", "21:00", "22:00", "23:00"], num_venues),
+        "typical_end_time": rng.choice(["01:00", "02:00", "03:00", "04:00"], num_venues),
+        "top_vibe_tags": [",".join(rng.choice(tags, 3, replace=False)) for _ in range(num_venues)],
+    })
+
+
+def generate_nights(
+    scratch_path: Path,
+    config: Dict[str, Any],
+    cities_by_size: List[str],
+    venues: pd.DataFrame,
+    num_nights: int,
+    embedding_dim: int,
+    rng: np.random.Generator,
+) -> NightMatrix:
+    """
+    Nights generated directly in (is_weekend, city) order. Embeddings are
+    written into a .npy memory map at scratch_path, which the caller
+    deletes once the bundle is written.
+    """
+    city_names: List[str] = config["cities"]  # sorted, like the real vocabulary
+    per_city = dict(zip(cities_by_size, split_counts(num_nights, city_shares(len(cities_by_size)))))
+    day_names = sorted(DAYS)
+    weekday_pool = [DAYS.index(d) for d in DAYS if d not in WEEKEND_DAYS]
+    weekend_pool = [DAYS.index(d) for d in WEEKEND_DAYS]
+    # DAYS index -> code into the sorted day names (as build_night_matrix encodes them)
+    day_code_of = np.array([day_names.index(d) for d in DAYS], dtype=np.int8)
+
+    topics = topic_vectors(embedding_dim)
+    venue_city = venues["city"].to_numpy()
+    venue_ids_all = venues["venue_id"].to_numpy(dtype=np.int64)
+
+    venue_ids = np.empty(num_nights, dtype=np.int64)
+    city_codes = np.empty(num_nights, dtype=np.int32)
+    day_codes = np.empty(num_nights, dtype=np.int8)
+    struct = np.empty((num_nights, struct_dim(config)), dtype=np.float32)
+    embeddings = np.lib.format.open_memmap(
+        scratch_path, mode="w+", dtype=np.float32, shape=(num_nights, embedding_dim)
+    )
+
+    # Each venue leans on two topics out of its city's topic set
+    venue_topics: Dict[str, np.ndarray] = {}
+    for city in city_names:
+        city_topics = rng.choice(NUM_TOPICS, TOPICS_PER_CITY, replace=False)
+        venue_topics[city] = rng.choice(city_topics, (int(np.sum(venue_city == city)), 2))
+
+    row = 0
+    for weekend in (False, True):
+        day_pool = np.array(weekend_pool if weekend else weekday_pool)
+        for city_code, city in enumerate(city_names):
+            city_total = int(per_city[city])
+            n_weekend = int(round(city_total * WEEKEND_SHARE))
+            n_rows = n_weekend if weekend else city_total - n_weekend
+            city_venues = venue_ids_all[venue_city == city]
+
+            for start in range(0, n_rows, GENERATE_CHUNK_ROWS):
+                n = min(GENERATE_CHUNK_ROWS, n_rows - start)
+                rows = slice(row, row + n)
+                venue_idx = rng.integers(0, city_venues.shape[0], n)
+                days = day_pool[rng.integers(0, day_pool.shape[0], n)]
+
+                venue_ids[rows] = city_venues[venue_idx]
+                city_codes[rows] = city_code
+                day_codes[rows] = day_code_of[days]
+                struct[rows] = build_struct_block(config, city_code, days, weekend, rng)
+                topic_ids = venue_topics[city][venue_idx, rng.integers(0, 2, n)]
+                embeddings[rows] = synthetic_embedding(topics, topic_ids, rng)
+                row += n
+
+    embeddings.flush()
+    venue_code_ids, venue_codes = np.unique(venue_ids, return_inverse=True)
+    is_weekend = np.isin(day_codes, [day_names.index(d) for d in WEEKEND_DAYS])
+    partitions, week_groups = index_partitions(city_codes, city_names, is_weekend)
+
+    return NightMatrix(
+        night_ids=np.arange(1, num_nights + 1, dtype=np.int64),
+        venue_ids=venue_ids,
+        venue_codes=venue_codes.astype(np.int32),
+        venue_code_ids=venue_code_ids,
+        city_codes=city_codes,
+        city_names=city_names,
+        day_codes=day_codes,
+        day_names=day_names,
+        is_weekend=is_weekend,
+        struct=struct,
+        embeddings=np.asarray(embeddings),
+        partitions=partitions,
+        week_groups=week_groups,
+    )
+
+
+def write_nights_jsonl(path: Path, matrix: NightMatrix) -> None:
+    """Same nights as nights_features.jsonl (the engine's fallback when there is no bundle)."""
+    day_names = matrix.day_names
+    with path.open("w", encoding="utf-8") as out_f:
+        for start in range(0, len(matrix), GENERATE_CHUNK_ROWS):
+            rows = slice(start, start + GENERATE_CHUNK_ROWS)
+            struct = np.round(matrix.struct[rows], 6).tolist()
+            embeddings = (
+                np.round(matrix.embeddings[rows], 6).tolist()
+                if matrix.embeddings is not None else None
+            )
+            for i, night_id in enumerate(matrix.night_ids[rows].tolist()):
+                record = {
+                    "night_id": night_id,
+                    "venue_id": int(matrix.venue_ids[start + i]),
+                    "city": matrix.city_names[matrix.city_codes[start + i]],
+                    "day_of_week": day_names[matrix.day_codes[start + i]],
+                    "struct_features": struct[i],
+                    "embedding": embeddings[i] if embeddings is not None else [],
+                }
+                out_f.write(json.dumps(record))
+                out_f.write("\n")
+
+
+def generate_dataset(
+    out_dir: Path,
+    num_nights: int = DEFAULT_NUM_NIGHTS,
+    num_cities: int = DEFAULT_NUM_CITIES,
+    embedding_dim: int = DEFAULT_EMBEDDING_DIM,
+    ann_min_partition_size: Optional[int] = None,
+    write_jsonl: bool = False,
+    seed: int = SEED,
+) -> None:
+    """
+    Write a complete data directory into out_dir. With ann_min_partition_size
+    set, the bundle also gets an IVF index over partitions at least that big.
+    """
+    if not 1 <= num_cities <= len(CITY_NAMES):
+        raise ValueError(f"num_cities must be in 1..{len(CITY_NAMES)}, got {num_cities}")
+
+    rng = np.random.default_rng(seed)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cities_by_size = CITY_NAMES[:num_cities]
+    config = build_features_config(sorted(cities_by_size))
+
+    (out_dir / "features_config.json").write_text(json.dumps(config, indent=2), encoding="utf-8")
+    venues = generate_venues(cities_by_size, num_nights, rng)
+    venues.to_csv(out_dir / "venues.csv", index=False)
+    print(f"Saved {len(venues)} venues to {out_dir / 'venues.csv'}")
+
+    t0 = time.perf_counter()
+    scratch_path = out_dir / "embeddings.scratch.npy"
+    matrix = generate_nights(
+        scratch_path, config, cities_by_size, venues, num_nights, embedding_dim, rng
+    )
+    print(f"Generated {len(matrix)} nights ({embedding_dim}-dim embeddings) in {time.perf_counter() - t0:.1f}s")
+
+    try:
+        extra_arrays: Dict[str, np.ndarray] = {}
+        sparse_struct = SparseStruct.from_dense(matrix.struct, struct_layout(config))
+        if sparse_struct is not None:
+            extra_arrays.update(sparse_struct.to_arrays())
+        if ann_min_partition_size is not None:
+            ann_index = build_ivf_index(matrix, min_partition_size=ann_min_partition_size)
+            if ann_index is not None:
+                print(f"Built ANN index: {ann_index.n_lists} lists over {len(ann_index.partition_lists)} partitions")
+                extra_arrays.update(ann_index.to_arrays())
+
+        bundle_dir = out_dir / NIGHTS_BUNDLE_DIRNAME
+        write_nights_bundle(
+            bundle_dir,
+            matrix,
+            embedding_model=EMBEDDING_MODEL,
+            extra_arrays=extra_arrays or None,
+        )
+        print(f"Saved binary nights bundle to {bundle_dir}")
+
+        if write_jsonl:
+            write_nights_jsonl(out_dir / "nights_features.jsonl", matrix)
+            print(f"Saved nights to {out_dir / 'nights_features.jsonl'}")
+    finally:
+        del matrix
+        scratch_path.unlink(missing_ok=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic NightTwin data directory.")
+    parser.add_argument("--out", type=Path, required=True, help="output data directory")
+    parser.add_argument("--nights", type=int, default=DEFAULT_NUM_NIGHTS)
+    parser.add_argument("--cities", type=int, default=DEFAULT_NUM_CITIES)
+    parser.add_argument("--embedding-dim", type=int, default=DEFAULT_EMBEDDING_DIM)
+    parser.add_argument(
+        "--ann-min-partition-size",
+        type=int,
+        default=None,
+        help="also build an IVF index over partitions with at least this many nights",
+    )
+    parser.add_argument("--jsonl", action="store_true", help="also write nights_features.jsonl")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    generate_dataset(
+        args.out,
+        num_nights=args.nights,
+        num_cities=args.cities,
+        embedding_dim=args.embedding_dim,
+        ann_min_partition_size=args.ann_min_partition_size,
+        write_jsonl=args.jsonl,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,21 @@ Offline script to:
 1) Read nights_with_venues.csv (output of build_venues.py).
 2) Clean and enrich data (times, durations, numeric normalization).
 3) Build categorical vocabularies and multi-hot encodings.
-4) Optionally call OpenAI embeddings for each night.
+4) Optionally embed each night with the configured embedding provider
+   (OpenAI by default; see app.services.embedding_provider), batched,
+   several requests in flight, with backoff/retry on rate limits.
+   Embeddings are stored in a content-addressed cache keyed by
+   sha256(model + text), so reruns only embed new or changed texts and an
+   interrupted run resumes from whatever batches already finished.
 5) Save:
     - features_config.json (vocabularies, feature indices)
     - nights_features.jsonl (one line per night with features + embedding)
+    - nights_bundle/ (binary float32 matrices + integer columns + manifest.json,
+      memory-mapped by the API at startup), optionally with night embeddings
+      reduced to EMBEDDING_PROJECTION_DIM dims (PCA or prefix truncation),
+      and an IVF index over the embeddings of every (city, weekend) partition
+      with at least ANN_MIN_PARTITION_SIZE nights; struct features are also
+      stored sparse (category codes, packed vibe bits, numeric columns)
 
 Run:
 
@@ -16,16 +27,38 @@ Run:
     python -m scripts.preprocess_nights
 """
 
+from dataclasses import replace
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import hashlib
 import json
 import math
+import random
+import sqlite3
+import time
 
 import numpy as np
 import pandas as pd
 import os
 
+from app.repositories.nights_repository import (
+    NIGHTS_BUNDLE_DIRNAME,
+    NightMatrix,
+    NightRecord,
+    build_night_matrix,
+    write_nights_bundle,
+)
+from app.services.ann_index import DEFAULT_MIN_PARTITION_SIZE, build_ivf_index
+from app.services.embedding_projection import fit_projection
+from app.services.embedding_provider import (
+    EmbeddingProvider,
+    configured_embedding_model,
+    embedding_provider_from_env,
+)
+from app.services.sparse_struct import SparseStruct, struct_layout
+
 
 # Simple .env loader (small, dependency-free). It will load KEY=VALUE lines
 def load_dotenv(path: Path) -> None:
@@ -55,11 +88,6 @@ def load_dotenv(path: Path) -> None:
         if key not in os.environ:
             os.environ[key] = val
 
-try:
-    from openai import OpenAI
-except ImportError:
-    OpenAI = None  # so script can still run without the library
-
 # -----------------------------
 # Configuration
 # -----------------------------
@@ -75,9 +103,31 @@ if DOTENV_PATH.exists():
 NIGHTS_WITH_VENUES_PATH = DATA_DIR / "nights_with_venues.csv"
 FEATURES_CONFIG_PATH = DATA_DIR / "features_config.json"
 NIGHTS_FEATURES_PATH = DATA_DIR / "nights_features.jsonl"
+NIGHTS_BUNDLE_DIR = DATA_DIR / NIGHTS_BUNDLE_DIRNAME
+EMBEDDING_CACHE_PATH = DATA_DIR / "cache" / "night_embeddings.sqlite"
+
+# Embeddings come from NIGHTTWIN_EMBEDDING_PROVIDER (openai | hashing | http),
+# which must match the provider the API embeds queries with
+USE_EMBEDDINGS = True
+EMBEDDING_MODEL = configured_embedding_model()
+
+# Texts per embeddings request / concurrent requests / retries per request
+EMBEDDING_BATCH_SIZE = int(os.getenv("NIGHTTWIN_EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_MAX_IN_FLIGHT = int(os.getenv("NIGHTTWIN_EMBEDDING_MAX_IN_FLIGHT", "4"))
+EMBEDDING_MAX_RETRIES = 6
+EMBEDDING_BACKOFF_BASE_SECONDS = 1.0
+EMBEDDING_BACKOFF_MAX_SECONDS = 60.0
+
+# ANN (IVF) index over night embeddings; smaller partitions are scanned exactly
+BUILD_ANN_INDEX = True
+ANN_MIN_PARTITION_SIZE = int(
+    os.getenv("NIGHTTWIN_ANN_MIN_PARTITION_SIZE", str(DEFAULT_MIN_PARTITION_SIZE))
+)
 
-USE_OPENAI_EMBEDDINGS = True
-EMBEDDING_MODEL = "text-embedding-3-small"
+# Reduced-dimension night embeddings in the bundle: "none", "pca" or "truncate"
+# (the JSONL and the embedding cache always keep the full vectors)
+EMBEDDING_PROJECTION = os.getenv("NIGHTTWIN_EMBEDDING_PROJECTION", "none")
+EMBEDDING_PROJECTION_DIM = int(os.getenv("NIGHTTWIN_EMBEDDING_PROJECTION_DIM", "256"))
 
 
 # -----------------------------
@@ -98,29 +148,6 @@ def parse_time_to_minutes(time_str: str) -> int:
         return 21 * 60
 
 
-def unwrap_end_time(start_min: int, end_min: int) -> int:
-    """Handle nights that go past midnight (end <= start => +24h)."""
-    if end_min <= start_min:
-        return end_min + 24 * 60
-    return end_min
-
-
-def clamp(value: float, lo: float, hi: float) -> float:
-    return max(lo, min(hi, value))
-
-
-def is_weekend(day_of_week: str) -> int:
-    return 1 if day_of_week in ("Friday", "Saturday") else 0
-
-
-def parse_vibe_tags(cell: Any) -> List[str]:
-    """Parse a vibe_tags cell into a list of lowercase tokens."""
-    if not isinstance(cell, str):
-        return []
-    parts = [p.strip().lower() for p in cell.split(",")]
-    return [p for p in parts if p]
-
-
 def safe_float(series: pd.Series, default: float = math.nan) -> float:
     series = pd.to_numeric(series, errors="coerce")
     if series.notna().sum() == 0:
@@ -128,7 +155,22 @@ def safe_float(series: pd.Series, default: float = math.nan) -> float:
     return float(series.mean())
 
 
-def build_struct_features_config(df: pd.DataFrame, top_n_vibe_tags: int = 30) -> Dict[str, Any]:
+def explode_vibe_tags(vibe_col: pd.Series) -> pd.Series:
+    """
+    Parse vibe_tags cells ("Chill, Rooftop,,") into lowercase tokens: one entry
+    per (night, tag), indexed by the night's row position, in cell order.
+    Non-string cells and empty tokens yield nothing.
+    """
+    cells = vibe_col.reset_index(drop=True).astype(object)
+    tags = cells.str.split(",").explode().str.strip().str.lower()
+    return tags[tags.notna() & (tags != "")]
+
+
+def build_struct_features_config(
+    df: pd.DataFrame,
+    top_n_vibe_tags: int = 30,
+    exploded_tags: Optional[pd.Series] = None,
+) -> Dict[str, Any]:
     """
     Build vocabularies for categories and vibe tags from the dataset.
     Returns a config dict that describes feature order.
@@ -140,10 +182,10 @@ def build_struct_features_config(df: pd.DataFrame, top_n_vibe_tags: int = 30) ->
     music_types = sorted(df["type_of_music"].dropna().astype(str).unique().tolist())
 
     # Build global vibe tag vocabulary (top N by frequency)
-    tag_counter: Counter = Counter()
-    for cell in df["vibe_tags"]:
-        tags = parse_vibe_tags(cell)
-        tag_counter.update(tags)
+    if exploded_tags is None:
+        exploded_tags = explode_vibe_tags(df["vibe_tags"])
+    # Counter keeps first-seen order for ties, so the vocab order is stable
+    tag_counter: Counter = Counter(exploded_tags.tolist())
 
     most_common_tags = [tag for tag, _ in tag_counter.most_common(top_n_vibe_tags)]
 
@@ -173,30 +215,83 @@ def build_struct_features_config(df: pd.DataFrame, top_n_vibe_tags: int = 30) ->
     return config
 
 
-def one_hot(value: str, vocab: List[str]) -> List[float]:
-    return [1.0 if value == v else 0.0 for v in vocab]
+def one_hot_block(values: pd.Series, vocab: List[Any]) -> np.ndarray:
+    """(N, len(vocab)) one-hot block; values missing from vocab (or NaN) give a zero row."""
+    codes = pd.Index(vocab).get_indexer(values)
+    block = np.zeros((len(values), len(vocab)), dtype=np.float64)
+    rows = np.flatnonzero(codes >= 0)
+    block[rows, codes[rows]] = 1.0
+    return block
 
 
-def multi_hot(tags: List[str], vocab: List[str]) -> List[float]:
-    vocab_index = {tag: idx for idx, tag in enumerate(vocab)}
-    vec = [0.0] * len(vocab)
-    for t in tags:
-        if t in vocab_index:
-            vec[vocab_index[t]] = 1.0
-    return vec
+def multi_hot_block(exploded_tags: pd.Series, n_rows: int, vocab: List[str]) -> np.ndarray:
+    """(N, len(vocab)) multi-hot block from explode_vibe_tags() output."""
+    codes = pd.Index(vocab).get_indexer(exploded_tags)
+    rows = exploded_tags.index.to_numpy()
+    keep = codes >= 0
+    block = np.zeros((n_rows, len(vocab)), dtype=np.float64)
+    block[rows[keep], codes[keep]] = 1.0
+    return block
 
 
-def normalize_numeric(value: float, min_val: float, max_val: float) -> float:
-    """Simple min-max normalization with clamping."""
-    if math.isnan(value):
-        return 0.0
+def normalize_numeric_column(values: pd.Series, min_val: float, max_val: float) -> np.ndarray:
+    """Min-max normalization with clamping; NaN (or an empty range) gives 0.0."""
+    v = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
     if max_val == min_val:
-        return 0.0
-    scaled = (value - min_val) / (max_val - min_val)
-    return clamp(scaled, 0.0, 1.0)
+        return np.zeros(len(v), dtype=np.float64)
+    scaled = np.clip((v - min_val) / (max_val - min_val), 0.0, 1.0)
+    scaled[np.isnan(v)] = 0.0
+    return scaled
+
+
+# (column, numeric_ranges key) in the order of config["numeric_features"]
+NUMERIC_FEATURE_COLUMNS = [
+    ("group_size", "group_size"),
+    ("budget_level", "budget_level"),
+    ("party_level", "party_level"),
+    ("alcohol_level", "alcohol_level"),
+    ("crowd_density", "crowd_density"),
+    ("duration_hours", "duration_hours"),
+    ("temperature", "temperature"),
+    ("cost", "cost"),
+    ("tip", "tip"),
+    ("start_time_minutes", "start_time_minutes"),
+]
+
+
+def build_struct_feature_matrix(
+    df: pd.DataFrame,
+    config: Dict[str, Any],
+    exploded_tags: pd.Series,
+) -> np.ndarray:
+    """
+    Build every night's struct feature vector at once, in the layout
+    described by features_config.json:
+
+        city | day | season | location_type | music | vibe tags | numeric (11)
+    """
+    n = len(df)
+    ranges = config["numeric_ranges"]
+
+    blocks = [
+        one_hot_block(df["city"], config["cities"]),
+        one_hot_block(df["day_of_week"], config["days"]),
+        one_hot_block(df["season"], config["seasons"]),
+        one_hot_block(df["location_type"], config["location_types"]),
+        one_hot_block(df["type_of_music"].astype(str), config["music_types"]),
+        multi_hot_block(exploded_tags, n, config["vibe_tags"]),
+    ]
+    numeric = [
+        normalize_numeric_column(df[col], *ranges[key])
+        for col, key in NUMERIC_FEATURE_COLUMNS
+    ]
+    numeric.append(df["is_weekend"].to_numpy(dtype=np.float64))
+    blocks.append(np.column_stack(numeric))
+
+    return np.hstack(blocks)
 
 
-def build_text_for_embedding(row: pd.Series, clean_tags: List[str]) -> str:
+def build_text_for_embedding(row: Dict[str, Any], clean_tags: List[str]) -> str:
     """
     Build a descriptive text that summarises the night.
     This text will be fed into the embedding model.
@@ -229,38 +324,268 @@ def build_text_for_embedding(row: pd.Series, clean_tags: List[str]) -> str:
     return text
 
 
-def get_openai_client() -> Any:
-    if not USE_OPENAI_EMBEDDINGS:
+def get_embedding_provider() -> Optional[EmbeddingProvider]:
+    if not USE_EMBEDDINGS:
         return None
-    if OpenAI is None:
+
+    # Retries are handled by embed_batch_with_retry (with Retry-After support)
+    provider = embedding_provider_from_env(max_retries=0)
+    if provider is None:
         raise RuntimeError(
-            "openai library is not installed. Install with 'pip install openai'."
+            "OPENAI_API_KEY environment variable is not set "
+            "(or set NIGHTTWIN_EMBEDDING_PROVIDER=hashing|http)."
         )
+    return provider
+
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY environment variable is not set.")
+def compute_embeddings(provider: EmbeddingProvider, texts: List[str]) -> List[List[float]]:
+    """One embeddings request for many texts; results in input order."""
+    return provider.embed(texts).tolist()
 
-    client = OpenAI(api_key=api_key)
-    return client
 
+def is_retryable_error(exc: Exception) -> bool:
+    """Rate limits, server errors and network errors are worth retrying."""
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError", "EmbeddingConnectionError")
 
-def compute_embedding(client: Any, text: str) -> List[float]:
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def embed_batch_with_retry(provider: Any, texts: List[str]) -> List[List[float]]:
+    """compute_embeddings() with exponential backoff + jitter on retryable errors."""
+    for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+        try:
+            return compute_embeddings(provider, texts)
+        except Exception as e:
+            if attempt == EMBEDDING_MAX_RETRIES or not is_retryable_error(e):
+                raise
+            delay = retry_after_seconds(e)
+            if delay is None:
+                delay = min(
+                    EMBEDDING_BACKOFF_MAX_SECONDS,
+                    EMBEDDING_BACKOFF_BASE_SECONDS * (2 ** attempt),
+                )
+                delay *= 0.5 + random.random() / 2
+            print(f"  embeddings request failed ({type(e).__name__}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+class ProgressReporter:
+    """Prints 'done/total rows (rows/s)' at most every interval_seconds."""
+
+    def __init__(self, total: int, label: str, interval_seconds: float = 5.0) -> None:
+        self.total = total
+        self.label = label
+        self.interval_seconds = interval_seconds
+        self.done = 0
+        self.started = time.monotonic()
+        self._last_print = self.started
+
+    def advance(self, n: int) -> None:
+        self.done += n
+        now = time.monotonic()
+        if now - self._last_print >= self.interval_seconds or self.done >= self.total:
+            self._last_print = now
+            elapsed = max(now - self.started, 1e-9)
+            print(
+                f"  {self.label}: {self.done}/{self.total} rows "
+                f"({self.done / elapsed:.1f} rows/s)"
+            )
+
+
+def embed_texts(
+    provider: Any,
+    texts: List[str],
+    on_batch_done: Optional[Callable[[List[str], List[List[float]]], None]] = None,
+) -> List[List[float]]:
     """
-    Call OpenAI embedding API. If USE_OPENAI_EMBEDDINGS is False,
-    this will never be called.
+    Embed texts in batches of EMBEDDING_BATCH_SIZE with up to
+    EMBEDDING_MAX_IN_FLIGHT requests running concurrently.
+
+    on_batch_done(texts, embeddings) is called from the calling thread as
+    soon as each batch finishes (used to checkpoint into the cache).
+
+    Batches are submitted as earlier ones finish, never more than
+    EMBEDDING_MAX_IN_FLIGHT at a time. After a failed batch (fatal error or
+    retries used up) nothing new is sent; the requests already in flight
+    are waited for and checkpointed, then the first error is raised.
+    """
+    batches = [
+        texts[i:i + EMBEDDING_BATCH_SIZE]
+        for i in range(0, len(texts), EMBEDDING_BATCH_SIZE)
+    ]
+    results: List[List[List[float]]] = [[] for _ in batches]
+    progress = ProgressReporter(len(texts), "embedded")
+    max_in_flight = max(1, EMBEDDING_MAX_IN_FLIGHT)
+
+    error: Optional[BaseException] = None
+    queued = iter(range(len(batches)))
+    in_flight: Dict[Future, int] = {}
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        def submit_next() -> None:
+            i = next(queued, None)
+            if i is not None:
+                in_flight[pool.submit(embed_batch_with_retry, provider, batches[i])] = i
+
+        for _ in range(max_in_flight):
+            submit_next()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = in_flight.pop(future)
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                if on_batch_done is not None:
+                    on_batch_done(batches[i], results[i])
+                progress.advance(len(batches[i]))
+                if error is None:
+                    submit_next()
+
+    if error is not None:
+        raise error
+    return [emb for batch in results for emb in batch]
+
+
+def embedding_key(text: str, model: str = EMBEDDING_MODEL) -> str:
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Content-addressed embedding cache in a SQLite file:
+    sha256(model + text) -> float32 vector.
+
+    It doubles as the checkpoint of a run: every finished batch is
+    committed immediately, so a crashed run loses at most the requests
+    that were in flight.
     """
-    resp = client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=text,
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(str(path))
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL)"
+            )
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        chunk = 500  # stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), chunk):
+            part = keys[i:i + chunk]
+            placeholders = ",".join("?" * len(part))
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype="<f4").tolist()
+        return found
+
+    def put_many(self, items: List[Tuple[str, List[float]]], model: str = EMBEDDING_MODEL) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                [
+                    (key, model, np.asarray(emb, dtype="<f4").tobytes())
+                    for key, emb in items
+                ],
+            )
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def embed_texts_cached(provider: Any, texts: List[str], store: EmbeddingStore) -> List[List[float]]:
+    """
+    Embed texts, reusing the store: identical texts are embedded once per
+    run, and texts embedded by any earlier (or interrupted) run are not
+    embedded again. Every batch is stored as soon as it finishes, so a run
+    that fails part-way keeps what it already paid for.
+    """
+    keys = [embedding_key(t) for t in texts]
+    unique: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        unique.setdefault(key, text)
+
+    known = store.get_many(list(unique))
+    missing_keys = [k for k in unique if k not in known]
+    print(
+        f"  {len(texts)} texts, {len(unique)} unique, "
+        f"{len(known)} cached, {len(missing_keys)} to embed"
     )
-    return resp.data[0].embedding
+
+    def checkpoint(batch_texts: List[str], batch_embs: List[List[float]]) -> None:
+        items = list(zip((embedding_key(t) for t in batch_texts), batch_embs))
+        store.put_many(items)
+        known.update(items)
+
+    if missing_keys:
+        embed_texts(provider, [unique[k] for k in missing_keys], on_batch_done=checkpoint)
+
+    return [known[key] for key in keys]
 
 
 # -----------------------------
 # Main preprocessing logic
 # -----------------------------
 
+def write_search_bundle(bundle_dir: Path, matrix: NightMatrix, config: Dict[str, Any]) -> None:
+    """
+    Write the binary bundle the API loads: nights projected to the reduced
+    embedding space (if EMBEDDING_PROJECTION is set), plus the ANN index
+    built in that same space and the sparse struct store for the
+    features_config.json layout.
+    """
+    extra_arrays: Dict[str, np.ndarray] = {}
+
+    sparse_struct = SparseStruct.from_dense(matrix.struct, struct_layout(config))
+    if sparse_struct is None:
+        print("  struct features do not match features_config.json, no sparse struct store")
+    else:
+        extra_arrays.update(sparse_struct.to_arrays())
+
+    if EMBEDDING_PROJECTION != "none" and matrix.embeddings is not None:
+        print(f"Fitting {EMBEDDING_PROJECTION} projection to {EMBEDDING_PROJECTION_DIM} dims...")
+        projection = fit_projection(matrix.embeddings, EMBEDDING_PROJECTION, EMBEDDING_PROJECTION_DIM)
+        if projection is not None:
+            matrix = replace(matrix, embeddings=projection.apply(matrix.embeddings))
+            extra_arrays.update(projection.to_arrays())
+
+    if BUILD_ANN_INDEX:
+        print(f"Building ANN index (partitions with >= {ANN_MIN_PARTITION_SIZE} nights)...")
+        ann_index = build_ivf_index(matrix, min_partition_size=ANN_MIN_PARTITION_SIZE)
+        if ann_index is None:
+            print("  no partition large enough, search stays exact")
+        else:
+            print(f"  {ann_index.n_lists} lists over {len(ann_index.partition_lists)} partitions")
+            extra_arrays.update(ann_index.to_arrays())
+
+    write_nights_bundle(
+        bundle_dir,
+        matrix,
+        embedding_model=EMBEDDING_MODEL,
+        extra_arrays=extra_arrays or None,
+    )
+
+
 def preprocess_nights() -> None:
     DATA_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -282,24 +607,24 @@ def preprocess_nights() -> None:
     for col in numeric_cols:
         df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    # Time features
-    start_min = df["start_time"].apply(parse_time_to_minutes)
-    end_min_raw = df["end_time"].apply(parse_time_to_minutes)
-    end_min_unwrapped = [
-        unwrap_end_time(s, e) for s, e in zip(start_min, end_min_raw)
-    ]
+    # Time features (nights that go past midnight: end <= start => +24h)
+    start_min = df["start_time"].apply(parse_time_to_minutes).to_numpy()
+    end_min_raw = df["end_time"].apply(parse_time_to_minutes).to_numpy()
     df["start_time_minutes"] = start_min
-    df["end_time_minutes"] = end_min_unwrapped
+    df["end_time_minutes"] = np.where(end_min_raw <= start_min, end_min_raw + 24 * 60, end_min_raw)
 
     df["duration_minutes"] = df["end_time_minutes"] - df["start_time_minutes"]
     df["duration_hours"] = df["duration_minutes"] / 60.0
 
     # Weekend flag
-    df["is_weekend"] = df["day_of_week"].apply(is_weekend)
+    df["is_weekend"] = df["day_of_week"].isin(["Friday", "Saturday"]).astype(int)
+
+    # Vibe tags, parsed once for the vocabulary, the multi-hot block and the texts
+    exploded_tags = explode_vibe_tags(df["vibe_tags"])
 
     # Build global vocabularies and config
     print("Building feature configuration (vocabularies)...")
-    config = build_struct_features_config(df, top_n_vibe_tags=30)
+    config = build_struct_features_config(df, top_n_vibe_tags=30, exploded_tags=exploded_tags)
 
     # Precompute min/max for numeric normalization
     def col_min_max(col: str, default_min: float, default_max: float) -> Tuple[float, float]:
@@ -338,98 +663,83 @@ def preprocess_nights() -> None:
     FEATURES_CONFIG_PATH.write_text(json.dumps(config, indent=2), encoding="utf-8")
     print(f"Saved feature configuration to {FEATURES_CONFIG_PATH}")
 
-    # Prepare OpenAI client (if enabled)
-    client = get_openai_client()
-
-    # Process each night into features + embedding
-    cities_vocab = config["cities"]
-    days_vocab = config["days"]
-    seasons_vocab = config["seasons"]
-    location_types_vocab = config["location_types"]
-    music_types_vocab = config["music_types"]
-    vibe_vocab = config["vibe_tags"]
-
-    print("Building features and (optionally) embeddings for each night...")
-    with NIGHTS_FEATURES_PATH.open("w", encoding="utf-8") as out_f:
-        for _, row in df.iterrows():
-            night_id = int(row["id"])
-            venue_id = int(row["venue_id"])
-
-            # Clean tags
-            raw_tags = row["vibe_tags"]
-            clean_tags = parse_vibe_tags(raw_tags)
-
-            # --- Numeric normalization ---
-            group_size_norm = normalize_numeric(row["group_size"], group_min, group_max)
-            budget_norm = normalize_numeric(row["budget_level"], budget_min, budget_max)
-            party_norm = normalize_numeric(row["party_level"], party_min, party_max)
-            alcohol_norm = normalize_numeric(row["alcohol_level"], alcohol_min, alcohol_max)
-            crowd_norm = normalize_numeric(row["crowd_density"], crowd_min, crowd_max)
-            duration_norm = normalize_numeric(row["duration_hours"], duration_min, duration_max)
-            temp_norm = normalize_numeric(row["temperature"], temp_min, temp_max)
-            cost_norm = normalize_numeric(row["cost"], cost_min, cost_max)
-            tip_norm = normalize_numeric(row["tip"], tip_min, tip_max)
-            start_time_norm = normalize_numeric(row["start_time_minutes"], start_min_val, start_max_val)
-            is_weekend_norm = float(row["is_weekend"])
-
-            # --- Categorical encodings ---
-            city_oh = one_hot(row["city"], cities_vocab)
-            day_oh = one_hot(row["day_of_week"], days_vocab)
-            season_oh = one_hot(row["season"], seasons_vocab)
-            loc_type_oh = one_hot(row["location_type"], location_types_vocab)
-            music_oh = one_hot(str(row["type_of_music"]), music_types_vocab)
-            vibe_mh = multi_hot(clean_tags, vibe_vocab)
-
-            numeric_vec = [
-                group_size_norm,
-                budget_norm,
-                party_norm,
-                alcohol_norm,
-                crowd_norm,
-                duration_norm,
-                temp_norm,
-                cost_norm,
-                tip_norm,
-                start_time_norm,
-                is_weekend_norm,
-            ]
-
-            struct_features = (
-                city_oh
-                + day_oh
-                + season_oh
-                + loc_type_oh
-                + music_oh
-                + vibe_mh
-                + numeric_vec
-            )
-
-            # --- Text for embedding ---
-            text_for_embedding = build_text_for_embedding(row, clean_tags)
-
-            # --- Embedding (optional) ---
-            if USE_OPENAI_EMBEDDINGS:
-                embedding = compute_embedding(client, text_for_embedding)
-            else:
-                embedding = []  # will be filled later or computed at query-time
-
-            record = {
-                "night_id": night_id,
-                "venue_id": venue_id,
+    # Prepare the embedding provider (if enabled)
+    provider = get_embedding_provider()
+
+    # Struct features for all nights, column-wise
+    print("Building struct features...")
+    struct_rows = build_struct_feature_matrix(df, config, exploded_tags).tolist()
+
+    tags_per_row = exploded_tags.groupby(level=0).agg(list)
+    clean_tags_by_row: List[List[str]] = [[] for _ in range(len(df))]
+    for pos, tags in zip(tags_per_row.index.tolist(), tags_per_row.tolist()):
+        clean_tags_by_row[pos] = tags
+
+    print("Building texts for embedding...")
+    records: List[Dict[str, Any]] = []
+    for row, struct_features, clean_tags in zip(
+        df.to_dict("records"), struct_rows, clean_tags_by_row
+    ):
+        records.append(
+            {
+                "night_id": int(row["id"]),
+                "venue_id": int(row["venue_id"]),
                 "city": row["city"],
                 "area": row["area"],
                 "day_of_week": row["day_of_week"],
                 "season": row["season"],
                 "struct_features": struct_features,
-                "text_for_embedding": text_for_embedding,
-                "embedding": embedding,
+                "text_for_embedding": build_text_for_embedding(row, clean_tags),
+                "embedding": [],
             }
+        )
 
+    # --- Embeddings (optional), batched and concurrent ---
+    if provider is not None:
+        print(
+            f"Computing embeddings for {len(records)} nights "
+            f"(batch={EMBEDDING_BATCH_SIZE}, in flight={EMBEDDING_MAX_IN_FLIGHT})..."
+        )
+        store = EmbeddingStore(EMBEDDING_CACHE_PATH)
+        try:
+            embeddings = embed_texts_cached(
+                provider, [r["text_for_embedding"] for r in records], store
+            )
+        finally:
+            store.close()
+        for record, embedding in zip(records, embeddings):
+            record["embedding"] = embedding
+    # else: embeddings stay empty (will be filled later or computed at query-time)
+
+    # Same nights, kept for the binary bundle written at the end
+    night_records: List[NightRecord] = []
+
+    # Write next to the target and rename, so a crash never leaves a truncated file
+    tmp_features_path = NIGHTS_FEATURES_PATH.with_name(NIGHTS_FEATURES_PATH.name + ".tmp")
+    with tmp_features_path.open("w", encoding="utf-8") as out_f:
+        for record in records:
             out_f.write(json.dumps(record, ensure_ascii=False))
             out_f.write("\n")
 
+            embedding = record["embedding"]
+            night_records.append(
+                NightRecord(
+                    night_id=record["night_id"],
+                    venue_id=record["venue_id"],
+                    city=str(record["city"]),
+                    day_of_week=str(record["day_of_week"]),
+                    is_weekend=record["day_of_week"] in ("Friday", "Saturday"),
+                    struct_features=np.array(record["struct_features"], dtype=np.float32),
+                    embedding=np.array(embedding, dtype=np.float32) if embedding else None,
+                )
+            )
+
+    tmp_features_path.replace(NIGHTS_FEATURES_PATH)
     print(f"Saved processed nights with features to {NIGHTS_FEATURES_PATH}")
 
+    write_search_bundle(NIGHTS_BUNDLE_DIR, build_night_matrix(night_records), config)
+    print(f"Saved binary nights bundle to {NIGHTS_BUNDLE_DIR}")
+
 
 def main() -> None:
     preprocess_nights()
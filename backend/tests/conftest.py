@@ -0,0 +1,95 @@
+# backend/tests/conftest.py
+
+from __future__ import annotations
+
+import random
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+# Tests import `app` and `scripts` the way the server and the scripts do: from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Synthetic nights shared by the engine tests: two cities, an IVF index on every partition
+SYNTHETIC_NIGHTS = 6000
+SYNTHETIC_EMBEDDING_DIM = 32
+SYNTHETIC_ANN_MIN_PARTITION_SIZE = 500
+QUERIES_PER_PARTITION = 8
+
+
+class Clock:
+    """Settable stand-in for time.time()."""
+
+    def __init__(self, now: float = 1_000_000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake clock for the TTL caches (app.services.ttl_cache)."""
+    import app.services.ttl_cache as ttl_cache
+
+    clock = Clock()
+    monkeypatch.setattr(ttl_cache, "time", SimpleNamespace(time=clock))
+    return clock
+
+
+@pytest.fixture(scope="session")
+def synthetic_data_dir(tmp_path_factory) -> Path:
+    """A small data directory from scripts.generate_synthetic_nights."""
+    from scripts.generate_synthetic_nights import generate_dataset
+
+    data_dir = tmp_path_factory.mktemp("synthetic")
+    generate_dataset(
+        data_dir,
+        num_nights=SYNTHETIC_NIGHTS,
+        num_cities=2,
+        embedding_dim=SYNTHETIC_EMBEDDING_DIM,
+        ann_min_partition_size=SYNTHETIC_ANN_MIN_PARTITION_SIZE,
+    )
+    return data_dir
+
+
+@pytest.fixture(scope="session")
+def stub_provider():
+    """The benchmark's offline query embeddings, shared so every engine embeds alike."""
+    from scripts.benchmark_engine import StubEmbeddingProvider
+
+    stub = StubEmbeddingProvider()
+    stub.set_dim(SYNTHETIC_EMBEDDING_DIM)
+    return stub
+
+
+@pytest.fixture
+def make_engine(monkeypatch, synthetic_data_dir, stub_provider):
+    """Factory for engines over the synthetic data (keyword arguments go to the engine)."""
+    from app.services.embedding_cache import QueryEmbeddingCache
+    from app.services.search_engine import NightTwinSearchEngine
+
+    for name in ("NIGHTTWIN_ANN_NPROBE", "NIGHTTWIN_EMBEDDING_STORAGE", "NIGHTTWIN_RESCORE_FACTOR"):
+        monkeypatch.delenv(name, raising=False)
+
+    def make(**kwargs) -> NightTwinSearchEngine:
+        return NightTwinSearchEngine(
+            data_dir=synthetic_data_dir,
+            embedding_provider=stub_provider,
+            embedding_cache=QueryEmbeddingCache(max_entries=0),
+            **kwargs,
+        )
+
+    return make
+
+
+@pytest.fixture
+def queries(make_engine, stub_provider) -> List:
+    """Queries for every partition, each embedded next to one of its nights."""
+    from scripts.benchmark_engine import build_queries
+
+    built = build_queries(make_engine(), stub_provider, QUERIES_PER_PARTITION, random.Random(0))
+    return [q for _, q in built]
@@ -0,0 +1,68 @@
+# backend/tests/test_ann_index.py
+
+from __future__ import annotations
+
+from typing import List
+
+import numpy as np
+import pytest
+
+from app.services.search_engine import VenueSearchResult
+
+
+def ranking(results: List[VenueSearchResult]):
+    return [(r.venue_id, r.score) for r in results]
+
+
+def test_every_partition_is_indexed(make_engine):
+    engine = make_engine()
+    index = engine.ann_index
+    assert index is not None
+    assert set(index.partition_lists) == {
+        (rows.start, rows.stop) for rows in engine.night_matrix.partitions.values()
+    }
+    # The lists of a partition hold each of its rows exactly once
+    for (start, stop), lists in index.partition_lists.items():
+        members = np.concatenate([index.list_members(c) for c in range(lists.start, lists.stop)])
+        np.testing.assert_array_equal(np.sort(members), np.arange(start, stop))
+
+
+def test_nprobe_zero_is_the_exact_scan(make_engine, queries):
+    engine = make_engine()
+    exact = make_engine()
+    exact.ann_index = None
+
+    for q in queries:
+        assert ranking(engine.search(q, ann_nprobe=0)) == ranking(exact.search(q))
+
+
+def test_probing_every_list_is_the_exact_scan(make_engine, queries):
+    engine = make_engine()
+    exact = make_engine()
+    exact.ann_index = None
+    all_lists = max(lists.stop - lists.start for lists in engine.ann_index.partition_lists.values())
+
+    for q in queries:
+        # Same nights, but gathered by row ids: scores may differ in the last bits
+        approx = engine.search(q, ann_nprobe=all_lists)
+        expected = exact.search(q)
+        assert [r.venue_id for r in approx] == [r.venue_id for r in expected]
+        assert [r.score for r in approx] == pytest.approx([r.score for r in expected], rel=1e-6)
+
+
+@pytest.mark.parametrize("nprobe", [1, 3, 16])
+def test_candidates_are_the_closest_lists(make_engine, queries, nprobe):
+    engine = make_engine()
+    index = engine.ann_index
+
+    for q in queries[::4]:
+        partition = engine._filter_nights_by_query(q)
+        q_unit = engine._query_unit(engine._build_query_embedding(q))
+        candidates = index.candidate_rows(partition, q_unit, nprobe)
+
+        lists = index.partition_lists[(partition.start, partition.stop)]
+        sims = index.centroids[lists] @ q_unit
+        closest = np.argsort(-sims)[:nprobe] + lists.start
+        expected = np.concatenate([index.list_members(int(c)) for c in closest])
+        np.testing.assert_array_equal(candidates, np.sort(expected))
+
@@ -0,0 +1,150 @@
+# backend/tests/test_build_venues.py
+
+from __future__ import annotations
+
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import scripts.build_venues as bv
+
+NAMES = ["Kafana Stara", "Club Tresor", "Rock Pub", "Sky Rooftop", "Corner"]
+AREAS = ["Dorcol", "Centar"]
+MUSIC = ["turbo folk", "techno", "rock", "jazz", None]
+TAGS = ["Loud", "chill", " crowded ", "local gem", "rooftop", "", "techno"]
+TIMES = ["21:00", "22:30", "23:15", "00:30", "02:00", "03:45", "bad", None, "25:00"]
+
+
+def raw_nights(n: int = 120, seed: int = 3) -> pd.DataFrame:
+    """
+    A small raw dataset with the awkward parts of the real one: missing and
+    non-numeric values, invalid and past-midnight times, messy vibe tags.
+    """
+    rng = np.random.default_rng(seed)
+
+    def pick(values: List[Any]) -> List[Any]:
+        return [values[i] for i in rng.integers(0, len(values), n)]
+
+    def numeric(lo: int, hi: int, missing: float = 0.15) -> List[Any]:
+        values: List[Any] = rng.integers(lo, hi + 1, n).astype(float).tolist()
+        for i in np.flatnonzero(rng.random(n) < missing):
+            values[i] = None if i % 2 else "n/a"
+        return values
+
+    tags = [
+        ", ".join(pick(TAGS)[: rng.integers(0, 4)]) if rng.random() > 0.1 else None
+        for _ in range(n)
+    ]
+    return pd.DataFrame(
+        {
+            "id": np.arange(1, n + 1),
+            "name": pick(NAMES),
+            "city": pick(["Belgrade", "Nis"]),
+            "area": pick(AREAS),
+            "location": "x",
+            "day_of_week": pick(["Monday", "Friday", "Saturday", "Sunday", None]),
+            "date": "2024-01-01",
+            "season": pick(["winter", "summer"]),
+            "start_time": pick(TIMES),
+            "end_time": pick(TIMES),
+            "group_size": numeric(1, 12),
+            "number_of_males": 1,
+            "number_of_females": 1,
+            "budget_level": numeric(1, 5),
+            "party_level": numeric(1, 5),
+            "cost": numeric(10, 300),
+            "tip": numeric(0, 40),
+            "type_of_music": pick(MUSIC),
+            "vibe_tags": tags,
+            "weather": "clear",
+            "temperature": numeric(-5, 35),
+            "location_type": pick(["indoor", "outdoor", None]),
+            "alcohol_level": numeric(0, 10),
+            "crowd_density": numeric(0, 10),
+            "description": pick(["great night", None]),
+        }
+    )
+
+
+def reference_venues(df: pd.DataFrame) -> pd.DataFrame:
+    """venues.csv as the original per-venue loop built it."""
+    rows: List[Dict[str, Any]] = []
+    grouped = df.groupby(["name", "city", "area"], dropna=False)
+    for venue_idx, ((name, city, area), group) in enumerate(grouped, start=1):
+        music = group["type_of_music"].dropna().astype(str).tolist()
+
+        start = group["start_time"].apply(bv.parse_time_to_minutes)
+        end_raw = group["end_time"].apply(bv.parse_time_to_minutes)
+        end = [e + 24 * 60 if e <= s else e for s, e in zip(start, end_raw)]
+
+        def mean(col: str) -> float:
+            series = pd.to_numeric(group[col], errors="coerce")
+            return float("nan") if series.notna().sum() == 0 else float(series.mean())
+
+        def mode(col: str) -> str:
+            values = group[col].dropna().astype(str).tolist()
+            return Counter(values).most_common(1)[0][0] if values else ""
+
+        tag_counts = Counter(
+            tag for cell in group["vibe_tags"] for tag in bv.parse_vibe_tags_column(cell)
+        )
+        rows.append(
+            {
+                "venue_id": venue_idx,
+                "name": name,
+                "city": city,
+                "area": area,
+                "venue_type": bv.infer_venue_type(
+                    [str(name)], music, [str(v) for v in group["vibe_tags"].dropna()]
+                ),
+                "avg_budget_level": mean("budget_level"),
+                "avg_party_level": mean("party_level"),
+                "avg_cost": mean("cost"),
+                "avg_tip": mean("tip"),
+                "avg_alcohol_level": mean("alcohol_level"),
+                "avg_crowd_density": mean("crowd_density"),
+                "avg_temperature": mean("temperature"),
+                "typical_start_time": bv.minutes_to_time_str(float(np.median(start))),
+                "typical_end_time": bv.minutes_to_time_str(float(np.median(end))),
+                "dominant_day_of_week": mode("day_of_week"),
+                "dominant_location_type": mode("location_type"),
+                "dominant_type_of_music": mode("type_of_music"),
+                "top_vibe_tags": ",".join(tag for tag, _ in tag_counts.most_common(5)),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def build(monkeypatch, data_dir: Path, raw: pd.DataFrame) -> None:
+    raw.to_csv(data_dir / "serbia_nightlife_dataset.csv", index=False)
+    monkeypatch.setattr(bv, "DATA_DIR", data_dir)
+    monkeypatch.setattr(bv, "RAW_CSV_PATH", data_dir / "serbia_nightlife_dataset.csv")
+    monkeypatch.setattr(bv, "VENUES_CSV_PATH", data_dir / "venues.csv")
+    monkeypatch.setattr(bv, "NIGHTS_WITH_VENUES_PATH", data_dir / "nights_with_venues.csv")
+    bv.build_venues_and_nights()
+
+
+@pytest.mark.parametrize("seed", [3, 11])
+def test_venues_csv_matches_per_venue_reference(monkeypatch, tmp_path, seed):
+    build(monkeypatch, tmp_path, raw_nights(seed=seed))
+
+    # Same CSV the per-venue loop wrote (read back, as it is written to disk)
+    raw = pd.read_csv(tmp_path / "serbia_nightlife_dataset.csv")
+    expected = tmp_path / "expected_venues.csv"
+    reference_venues(raw).to_csv(expected, index=False)
+    assert (tmp_path / "venues.csv").read_bytes() == expected.read_bytes()
+
+
+def test_every_night_gets_its_venue_id(monkeypatch, tmp_path):
+    build(monkeypatch, tmp_path, raw_nights())
+
+    venues = pd.read_csv(tmp_path / "venues.csv")
+    nights = pd.read_csv(tmp_path / "nights_with_venues.csv")
+    ids = venues.set_index(["name", "city", "area"])["venue_id"]
+    expected = [ids[key] for key in zip(nights["name"], nights["city"], nights["area"])]
+    assert nights["venue_id"].tolist() == expected
+    assert nights["id"].tolist() == list(range(1, len(nights) + 1))
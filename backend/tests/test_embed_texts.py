@@ -0,0 +1,64 @@
+# backend/tests/test_embed_texts.py
+
+from __future__ import annotations
+
+import threading
+from typing import List
+
+import numpy as np
+import pytest
+
+import scripts.preprocess_nights as pp
+
+
+class AuthError(Exception):
+    status_code = 401
+
+
+class FakeProvider:
+    """Embeds text "tN" as [N, 1]; fails (non-retryable) on the texts in fail_on."""
+
+    def __init__(self, fail_on=()) -> None:
+        self.fail_on = set(fail_on)
+        self.requests: List[List[str]] = []
+        self._lock = threading.Lock()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        with self._lock:
+            self.requests.append(list(texts))
+        if self.fail_on.intersection(texts):
+            raise AuthError("invalid api key")
+        return np.array([[float(t[1:]), 1.0] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr(pp, "EMBEDDING_BATCH_SIZE", 2)
+    monkeypatch.setattr(pp, "EMBEDDING_MAX_IN_FLIGHT", 2)
+
+
+def texts(n: int) -> List[str]:
+    return [f"t{i}" for i in range(n)]
+
+
+def test_embed_texts_keeps_input_order():
+    provider = FakeProvider()
+    done = []
+    out = pp.embed_texts(provider, texts(7), on_batch_done=lambda t, e: done.extend(t))
+    assert out == [[float(i), 1.0] for i in range(7)]
+    assert sorted(done, key=lambda t: int(t[1:])) == texts(7)
+    assert len(provider.requests) == 4
+
+
+def test_embed_texts_stops_sending_after_a_fatal_error():
+    provider = FakeProvider(fail_on={"t2"})
+    done: List[str] = []
+    with pytest.raises(AuthError):
+        pp.embed_texts(provider, texts(40), on_batch_done=lambda t, e: done.extend(t))
+
+    # Only the batches in flight when the error surfaced were sent, not the whole corpus
+    assert len(provider.requests) <= 2 + pp.EMBEDDING_MAX_IN_FLIGHT
+    # ... and every one of them that succeeded was checkpointed
+    sent_ok = [t for batch in provider.requests if "t2" not in batch for t in batch]
+    assert sorted(done) == sorted(sent_ok)
+    assert {"t0", "t1"} <= set(done)
@@ -0,0 +1,63 @@
+# backend/tests/test_embedding_provider.py
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+import pytest
+
+from app.services.embedding_provider import (
+    EmbeddingProvider,
+    HashingEmbeddingProvider,
+    OpenAIEmbeddingProvider,
+)
+
+
+def test_provider_without_embed_fails_at_construction():
+    class Incomplete(EmbeddingProvider):
+        model = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_hashing_provider_is_deterministic_and_normalized():
+    provider = HashingEmbeddingProvider(dim=64)
+    a = provider.embed(["loud techno in Belgrade", ""])
+    b = provider.embed(["loud techno in Belgrade"])
+    assert a.shape == (2, 64) and a.dtype == np.float32
+    np.testing.assert_array_equal(a[:1], b)
+    assert np.isclose(np.linalg.norm(a[0]), 1.0)
+    assert not a[1].any()
+
+
+def test_openai_sync_client_is_created_on_first_embed(monkeypatch):
+    import openai
+
+    created: List[dict] = []
+
+    class FakeOpenAI:
+        def __init__(self, **kwargs):
+            created.append(kwargs)
+            self.embeddings = SimpleNamespace(create=self._create)
+
+        @staticmethod
+        def _create(model, input):
+            return SimpleNamespace(data=[
+                SimpleNamespace(index=i, embedding=[float(i), 1.0]) for i in reversed(range(len(input)))
+            ])
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(openai, "OpenAI", FakeOpenAI)
+    provider = OpenAIEmbeddingProvider(api_key="x", async_client=object())
+    assert created == []  # the server only uses the injected async client
+
+    out = provider.embed(["a", "b"])
+    np.testing.assert_array_equal(out, [[0.0, 1.0], [1.0, 1.0]])
+    provider.embed(["c"])
+    assert len(created) == 1
+    provider.close()
@@ -0,0 +1,54 @@
+# backend/tests/test_embedding_store.py
+
+from __future__ import annotations
+
+import pytest
+
+import scripts.preprocess_nights as pp
+from tests.test_embed_texts import AuthError, FakeProvider, texts
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr(pp, "EMBEDDING_BATCH_SIZE", 2)
+    monkeypatch.setattr(pp, "EMBEDDING_MAX_IN_FLIGHT", 2)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = pp.EmbeddingStore(tmp_path / "night_embeddings.sqlite")
+    yield store
+    store.close()
+
+
+def test_duplicates_are_embedded_once(store):
+    provider = FakeProvider()
+    out = pp.embed_texts_cached(provider, ["t1", "t2", "t1", "t2", "t3"], store)
+    assert out == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0], [2.0, 1.0], [3.0, 1.0]]
+    assert sorted(t for batch in provider.requests for t in batch) == ["t1", "t2", "t3"]
+
+
+def test_interrupted_run_resumes_without_re_requesting_stored_texts(store):
+    corpus = texts(20)
+
+    failing = FakeProvider(fail_on={"t6"})
+    with pytest.raises(AuthError):
+        pp.embed_texts_cached(failing, corpus, store)
+    first_ok = {t for batch in failing.requests if "t6" not in batch for t in batch}
+    assert {"t0", "t1", "t2", "t3"} <= first_ok
+
+    # Everything the failed run got back was checkpointed ...
+    stored = store.get_many([pp.embedding_key(t) for t in corpus])
+    assert {pp.embedding_key(t) for t in first_ok} == set(stored)
+
+    # ... so the rerun only asks for the rest
+    healthy = FakeProvider()
+    out = pp.embed_texts_cached(healthy, corpus, store)
+    resent = {t for batch in healthy.requests for t in batch}
+    assert resent == set(corpus) - first_ok
+    assert out == [[float(i), 1.0] for i in range(20)]
+
+    # A third run is fully cached
+    cached = FakeProvider()
+    assert pp.embed_texts_cached(cached, corpus, store) == out
+    assert cached.requests == []
@@ -0,0 +1,98 @@
+# backend/tests/test_preprocess_features.py
+
+from __future__ import annotations
+
+import json
+import math
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+import scripts.preprocess_nights as pp
+from tests.test_build_venues import build, raw_nights
+
+
+def reference_struct_features(row: pd.Series, config: Dict[str, Any]) -> List[float]:
+    """One night's struct features, as the original per-row loop built them."""
+    ranges = config["numeric_ranges"]
+
+    def one_hot(value: Any, vocab: List[Any]) -> List[float]:
+        return [1.0 if value == v else 0.0 for v in vocab]
+
+    def norm(value: Any, key: str) -> float:
+        lo, hi = ranges[key]
+        value = float(pd.to_numeric(value, errors="coerce"))
+        if math.isnan(value) or hi == lo:
+            return 0.0
+        return min(1.0, max(0.0, (value - lo) / (hi - lo)))
+
+    start = pp.parse_time_to_minutes(row["start_time"])
+    end = pp.parse_time_to_minutes(row["end_time"])
+    if end <= start:
+        end += 24 * 60
+    tags = set(reference_tags(row["vibe_tags"]))
+
+    return (
+        one_hot(row["city"], config["cities"])
+        + one_hot(row["day_of_week"], config["days"])
+        + one_hot(row["season"], config["seasons"])
+        + one_hot(row["location_type"], config["location_types"])
+        + one_hot(str(row["type_of_music"]), config["music_types"])
+        + [1.0 if tag in tags else 0.0 for tag in config["vibe_tags"]]
+        + [
+            norm(row["group_size"], "group_size"),
+            norm(row["budget_level"], "budget_level"),
+            norm(row["party_level"], "party_level"),
+            norm(row["alcohol_level"], "alcohol_level"),
+            norm(row["crowd_density"], "crowd_density"),
+            norm((end - start) / 60.0, "duration_hours"),
+            norm(row["temperature"], "temperature"),
+            norm(row["cost"], "cost"),
+            norm(row["tip"], "tip"),
+            norm(start, "start_time_minutes"),
+            1.0 if row["day_of_week"] in ("Friday", "Saturday") else 0.0,
+        ]
+    )
+
+
+def reference_tags(cell: Any) -> List[str]:
+    if not isinstance(cell, str):
+        return []
+    return [p for p in (p.strip().lower() for p in cell.split(",")) if p]
+
+
+def test_struct_features_and_texts_match_per_row_reference(monkeypatch, tmp_path):
+    raw = raw_nights(n=150, seed=5)
+    # The embedding text needs these as integers
+    for col in ("group_size", "budget_level", "party_level"):
+        raw[col] = np.random.default_rng(1).integers(1, 6, len(raw))
+    build(monkeypatch, tmp_path, raw)
+
+    monkeypatch.setattr(pp, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(pp, "NIGHTS_WITH_VENUES_PATH", tmp_path / "nights_with_venues.csv")
+    monkeypatch.setattr(pp, "FEATURES_CONFIG_PATH", tmp_path / "features_config.json")
+    monkeypatch.setattr(pp, "NIGHTS_FEATURES_PATH", tmp_path / "nights_features.jsonl")
+    monkeypatch.setattr(pp, "NIGHTS_BUNDLE_DIR", tmp_path / "nights_bundle")
+    monkeypatch.setattr(pp, "USE_EMBEDDINGS", False)
+    pp.preprocess_nights()
+
+    nights = pd.read_csv(tmp_path / "nights_with_venues.csv")
+    config = json.loads((tmp_path / "features_config.json").read_text(encoding="utf-8"))
+    lines = (tmp_path / "nights_features.jsonl").read_text(encoding="utf-8").splitlines()
+    records = [json.loads(line) for line in lines]
+    assert len(records) == len(nights)
+
+    # Vibe vocabulary: most frequent tags, ties in first-seen order
+    tag_counts: Dict[str, int] = {}
+    for cell in nights["vibe_tags"]:
+        for tag in reference_tags(cell):
+            tag_counts[tag] = tag_counts.get(tag, 0) + 1
+    assert config["vibe_tags"] == sorted(tag_counts, key=lambda t: -tag_counts[t])[:30]
+
+    for (_, row), record in zip(nights.iterrows(), records):
+        assert record["night_id"] == row["id"]
+        assert record["struct_features"] == reference_struct_features(row, config)
+        assert record["text_for_embedding"] == pp.build_text_for_embedding(
+            row.to_dict(), reference_tags(row["vibe_tags"])
+        )
@@ -0,0 +1,115 @@
+# backend/tests/test_prompt_parser.py
+
+from __future__ import annotations
+
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from app.services.prompt_parser import ParsedPrompt, PromptParseCache, PromptParser, normalize_prompt
+
+VALID = {"valid": True, "city": "Nis", "day_of_week": "Friday", "time": "23:30", "tags": ["kafana"]}
+
+
+class FakeResponses:
+    """responses.create() stand-in answering with queued output texts."""
+
+    def __init__(self, outputs: List[str]) -> None:
+        self.outputs = list(outputs)
+        self.prompts: List[str] = []
+
+    def create(self, model, input, **kwargs):
+        self.prompts.append(input[-1]["content"])
+        text = self.outputs.pop(0)
+        return SimpleNamespace(output=[SimpleNamespace(content=[SimpleNamespace(text=text)])])
+
+
+class FakeAsyncResponses(FakeResponses):
+    async def create(self, model, input, **kwargs):
+        return FakeResponses.create(self, model, input, **kwargs)
+
+
+@pytest.fixture
+def parser(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    for name in ("NIGHTTWIN_PARSE_CACHE_PATH", "NIGHTTWIN_PARSE_CACHE_TTL", "NIGHTTWIN_PARSE_CACHE_INVALID_TTL"):
+        monkeypatch.delenv(name, raising=False)
+    return PromptParser()
+
+
+def use_outputs(parser: PromptParser, *outputs: str) -> FakeResponses:
+    responses = FakeResponses(outputs)
+    parser._client = SimpleNamespace(responses=responses)
+    return responses
+
+
+def test_normalized_prompts_share_a_cache_key():
+    assert normalize_prompt("  Kafana in NIS, at 23:30!! ") == "kafana in nis at 23:30"
+    assert PromptParseCache.key("Kafana in Nis?", "m") == PromptParseCache.key("kafana  in nis", "m")
+    assert PromptParseCache.key("kafana in nis", "m") != PromptParseCache.key("kafana in nis", "other")
+
+
+def test_valid_and_invalid_parses_expire_separately(clock):
+    cache = PromptParseCache(valid_ttl_seconds=100.0, invalid_ttl_seconds=10.0)
+    cache.set("techno in belgrade", "m", ParsedPrompt(**VALID))
+    cache.set("pizza recipe", "m", ParsedPrompt(valid=False))
+
+    clock.now += 10.0
+    assert cache.get("pizza recipe", "m") is None
+    assert cache.get("techno in belgrade", "m").city == "Nis"
+    clock.now += 90.0
+    assert cache.get("techno in belgrade", "m") is None
+
+
+def test_zero_invalid_ttl_keeps_invalid_parses_out_of_the_store(clock, tmp_path):
+    path = tmp_path / "parsed.sqlite"
+    cache = PromptParseCache(invalid_ttl_seconds=0.0, path=path)
+    cache.set("pizza recipe", "m", ParsedPrompt(valid=False))
+    cache.set("techno in belgrade", "m", ParsedPrompt(**VALID))
+
+    restarted = PromptParseCache(invalid_ttl_seconds=0.0, path=path)
+    assert restarted.get("pizza recipe", "m") is None
+    assert restarted.get("Techno in Belgrade!", "m") == ParsedPrompt(**VALID)
+
+
+def test_repeated_prompt_is_parsed_once_and_copied(parser):
+    responses = use_outputs(parser, json.dumps(VALID))
+    first = parser.parse_prompt("Kafana in Nis")
+    first.tags.append("mutated")
+
+    again = parser.parse_prompt("kafana in nis.")
+    assert responses.prompts == ["Kafana in Nis"]
+    assert again.tags == ["kafana"]
+
+
+def test_invalid_verdict_is_cached(parser):
+    responses = use_outputs(parser, json.dumps({"valid": False}))
+    assert not parser.parse_prompt("pizza recipe").valid
+    assert not parser.parse_prompt("pizza recipe").valid
+    assert len(responses.prompts) == 1
+
+
+def test_malformed_output_falls_back_uncached(parser):
+    responses = use_outputs(parser, "not json", json.dumps(VALID))
+    assert parser.parse_prompt("kafana in nis") == ParsedPrompt(valid=False)
+    # The next call asks again instead of serving the fallback
+    assert parser.parse_prompt("kafana in nis").valid
+    assert len(responses.prompts) == 2
+
+
+def test_async_parse_shares_the_cache(parser):
+    responses = FakeAsyncResponses(["not json", json.dumps(VALID)])
+    parser.async_client = SimpleNamespace(responses=responses)
+
+    async def run():
+        fallback = await parser.aparse_prompt("kafana in nis")
+        parsed = await parser.aparse_prompt("kafana in nis")
+        return fallback, parsed, await parser.aparse_prompt("Kafana in Nis!")
+
+    fallback, parsed, cached = asyncio.run(run())
+    assert not fallback.valid and parsed.valid and cached == parsed
+    assert len(responses.prompts) == 2
+    assert parser.parse_prompt("kafana in nis") == parsed
@@ -0,0 +1,65 @@
+# backend/tests/test_quantized_embeddings.py
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.services.quantized_embeddings import QuantizedEmbeddings
+
+
+@pytest.fixture
+def unit_rows():
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(500, 32)).astype(np.float32)
+    x[7] = 0.0  # nights without an embedding
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norms > 0, norms, 1.0)
+
+
+@pytest.mark.parametrize("mode, tolerance", [("float16", 1e-3), ("int8", 2e-2)])
+def test_dot_approximates_float32(unit_rows, mode, tolerance):
+    quantized = QuantizedEmbeddings.from_float32(unit_rows, mode)
+    q = unit_rows[:3].T.copy()  # three queries at once
+
+    rows = np.array([0, 7, 42, 499])
+    np.testing.assert_allclose(quantized.dot(rows, q), unit_rows[rows] @ q, atol=tolerance)
+    np.testing.assert_allclose(quantized.dot(slice(10, 300), q[:, 0]), unit_rows[10:300] @ q[:, 0], atol=tolerance)
+    assert quantized.dot(slice(7, 8), q[:, 0])[0] == 0.0
+
+
+def test_unknown_storage_is_rejected(unit_rows):
+    with pytest.raises(ValueError):
+        QuantizedEmbeddings.from_float32(unit_rows, "int4")
+
+
+@pytest.mark.parametrize("mode", ["float16", "int8"])
+def test_rescoring_every_candidate_equals_the_float32_scan(make_engine, queries, mode):
+    exact = make_engine()
+    engine = make_engine(embedding_storage=mode)
+    assert engine.quantized_embeddings is not None
+    engine.rescore_factor = len(engine.night_matrix)  # every night is re-scored
+
+    for q in queries:
+        for ann_nprobe in (0, None):
+            results = engine.search(q, ann_nprobe=ann_nprobe)
+            expected = exact.search(q, ann_nprobe=ann_nprobe)
+            assert [r.venue_id for r in results] == [r.venue_id for r in expected]
+            assert [r.score for r in results] == pytest.approx([r.score for r in expected], rel=1e-6)
+
+
+@pytest.mark.parametrize("mode", ["float16", "int8"])
+def test_returned_nights_carry_exact_scores(make_engine, queries, mode):
+    exact = make_engine()
+    engine = make_engine(embedding_storage=mode)
+
+    for q in queries:
+        query_struct = engine._build_query_struct_features(q)
+        q_unit = engine._query_unit(engine._build_query_embedding(q))
+        partition = engine._filter_nights_by_query(q)
+        scan = engine._scan_candidates(partition, query_struct, q_unit, 1.0, 20)
+
+        expected = exact.night_matrix.embeddings[scan.rows] @ q_unit
+        expected += exact._struct_dot(scan.rows, exact._struct_query(query_struct))
+        np.testing.assert_allclose(scan.scores, expected, rtol=1e-6)
+        assert np.all(np.diff(scan.scores) <= 0)
@@ -0,0 +1,89 @@
+# backend/tests/test_response_encoder.py
+
+from __future__ import annotations
+
+import itertools
+import json
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+import app.services.response_encoder as response_encoder
+from app.models import PromptSearchResponse, SearchRequest, VenueResult
+from app.services.response_encoder import VENUE_FIELDS, VenueResultEncoder, select_fields
+from app.services.search_engine import VenueSearchResult
+
+VENUES = {
+    7: SimpleNamespace(name='Kafana "Question Mark"', city="Belgrade", area="Dorćol", venue_type="kafana"),
+    9: SimpleNamespace(name="Drugstore", city="Belgrade", area="Palilula", venue_type="club"),
+}
+
+RESULTS = [
+    VenueSearchResult(
+        venue_id=vid, name=v.name, city=v.city, area=v.area, venue_type=v.venue_type,
+        score=score, reasons=["Late nights – fits 02:00", 'Tags: "rakija"'],
+    )
+    for (vid, v), score in zip(VENUES.items(), (0.8125, 1 / 3))
+]
+
+FIELD_SUBSETS = [
+    list(c) for n in range(1, len(VENUE_FIELDS) + 1) for c in itertools.combinations(VENUE_FIELDS, n)
+]
+
+
+@pytest.fixture(params=["orjson", "pydantic"])
+def encoder(request, monkeypatch):
+    if request.param == "pydantic":
+        monkeypatch.setattr(response_encoder, "orjson", None)
+    elif response_encoder.orjson is None:
+        pytest.skip("orjson is not installed")
+    return VenueResultEncoder(VENUES)
+
+
+def expected(fields: List[str]) -> List[dict]:
+    return [{name: getattr(r, name) for name in fields} for r in RESULTS]
+
+
+def test_all_fields_match_the_pydantic_models_byte_for_byte(encoder):
+    models = [VenueResult(**vars(r)) for r in RESULTS]
+    old = TypeAdapter(List[VenueResult]).dump_json(models)
+    assert encoder.encode_results(RESULTS, select_fields(None)) == old
+
+
+@pytest.mark.parametrize("fields", FIELD_SUBSETS, ids=",".join)
+def test_field_subsets_parse(encoder, fields):
+    order = select_fields(fields[::-1])  # request order does not matter
+    assert order == fields
+    assert json.loads(encoder.encode_results(RESULTS, order)) == expected(fields)
+    assert json.loads(encoder.encode_batch([RESULTS, []], order)) == [expected(fields), []]
+
+
+def test_unknown_venue_falls_back_to_the_result_itself(encoder):
+    stray = VenueSearchResult(venue_id=1, name="N", city="C", area="A", venue_type="bar", score=0.5, reasons=[])
+    assert json.loads(encoder.encode_results([stray], ["venue_id", "name"])) == [{"venue_id": 1, "name": "N"}]
+
+
+@pytest.mark.parametrize("fields", [None, ["venue_id", "score"], ["reasons"]])
+def test_prompt_search_body_parses(encoder, fields):
+    from app.main import _prompt_search_body
+
+    query = SearchRequest(
+        city="Novi Sad", day_of_week="Friday", time="23:00", group_size=2,
+        budget_level=3, party_level=4, tags=["živa muzika"],
+    )
+    order = select_fields(fields)
+    body = _prompt_search_body("ok", None, query, encoder.encode_results(RESULTS, order))
+    parsed = json.loads(body)
+    assert parsed == {
+        "status": "ok",
+        "reason": None,
+        "parsed_query": query.model_dump(),
+        "venues": expected(order),
+    }
+    if fields is None:
+        assert PromptSearchResponse.model_validate_json(body).venues == expected(order)
+
+    invalid = json.loads(_prompt_search_body("invalid", "Not a nightlife request.", None))
+    assert invalid == {"status": "invalid", "reason": "Not a nightlife request.", "parsed_query": None, "venues": []}
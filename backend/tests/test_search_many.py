@@ -0,0 +1,54 @@
+# backend/tests/test_search_many.py
+
+from __future__ import annotations
+
+import asyncio
+from typing import List
+
+import pytest
+
+from app.services.search_engine import VenueSearchResult
+
+
+def assert_same_results(batch: List[List[VenueSearchResult]], single: List[List[VenueSearchResult]]) -> None:
+    """Same venues, reasons and order; one matrix product vs. k scans may differ in the last bits."""
+    assert len(batch) == len(single)
+    for got, expected in zip(batch, single):
+        assert [(r.venue_id, r.reasons) for r in got] == [(r.venue_id, r.reasons) for r in expected]
+        assert [r.score for r in got] == pytest.approx([r.score for r in expected], rel=1e-6)
+
+
+@pytest.mark.parametrize("ann_nprobe", [None, 0, 2])
+def test_search_many_equals_repeated_search(make_engine, queries, ann_nprobe):
+    engine = make_engine()
+    qs = queries + queries[:3]  # repeated queries are answered like the others
+
+    batch = engine.search_many(qs, ann_nprobe=ann_nprobe, top_k_venues=7)
+    assert_same_results(batch, [engine.search(q, ann_nprobe=ann_nprobe, top_k_venues=7) for q in qs])
+
+
+@pytest.mark.parametrize("aggregation", ["max", "softmax"])
+def test_search_many_passes_ranking_options(make_engine, queries, aggregation):
+    engine = make_engine(embedding_storage="int8")
+    options = dict(venue_aggregation=aggregation, lambda_struct=0.3, top_n_nights=50, with_reasons=False)
+
+    batch = engine.search_many(queries, ann_nprobe=0, **options)
+    assert_same_results(batch, [engine.search(q, ann_nprobe=0, **options) for q in queries])
+    assert all(r.reasons == [] for results in batch for r in results)
+
+
+def test_asearch_many_equals_asearch(make_engine, queries):
+    engine = make_engine()
+
+    async def run():
+        batch = await engine.asearch_many(queries)
+        single = [await engine.asearch(q) for q in queries]
+        return batch, single
+
+    batch, single = asyncio.run(run())
+    assert_same_results(batch, single)
+    assert_same_results(batch, [engine.search(q) for q in queries])
+
+
+def test_empty_batch(make_engine):
+    assert make_engine().search_many([]) == []
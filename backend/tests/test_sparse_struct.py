@@ -0,0 +1,87 @@
+# backend/tests/test_sparse_struct.py
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.services.sparse_struct import SparseStruct
+
+LAYOUT = (3, 7, 4, 1, 300, 13, 4)  # one-hot blocks (one wider than a uint8 code), vibe tags, numeric
+
+
+def dense_struct(n: int, seed: int = 0) -> np.ndarray:
+    """Random struct rows with this layout; some one-hot blocks left empty."""
+    rng = np.random.default_rng(seed)
+    *category_sizes, vibe_size, numeric_size = LAYOUT
+    blocks = []
+    for size in category_sizes:
+        block = np.zeros((n, size), dtype=np.float32)
+        filled = rng.random(n) < 0.8
+        block[np.flatnonzero(filled), rng.integers(0, size, int(filled.sum()))] = 1.0
+        blocks.append(block)
+    blocks.append((rng.random((n, vibe_size)) < 0.3).astype(np.float32))
+    blocks.append(rng.normal(size=(n, numeric_size)).astype(np.float32))
+    return np.hstack(blocks)
+
+
+def test_dot_equals_the_dense_product():
+    struct = dense_struct(1000)
+    sparse = SparseStruct.from_dense(struct, LAYOUT)
+    assert sparse is not None and len(sparse) == 1000 and sparse.dim == struct.shape[1]
+    assert sparse.category_codes.dtype == np.uint16
+
+    rng = np.random.default_rng(1)
+    queries = dense_struct(3, seed=2).T * rng.random((struct.shape[1], 1)).astype(np.float32)
+    queries[3:10, 1] = 0.0  # a block the second query does not use
+
+    rows = rng.integers(0, 1000, 300)  # unsorted, with repeats
+    np.testing.assert_allclose(sparse.dot(rows, sparse.query(queries)), struct[rows] @ queries, rtol=1e-5, atol=1e-5)
+    np.testing.assert_allclose(
+        sparse.dot(slice(100, 700), sparse.query(queries[:, 1])), struct[100:700] @ queries[:, 1], rtol=1e-5, atol=1e-5
+    )
+
+
+def test_round_trip_through_bundle_arrays():
+    sparse = SparseStruct.from_dense(dense_struct(50), LAYOUT)
+    loaded = SparseStruct.from_arrays(sparse.to_arrays())
+    assert loaded.layout == LAYOUT
+    for name, array in sparse.to_arrays().items():
+        np.testing.assert_array_equal(loaded.to_arrays()[name], array)
+
+    arrays = sparse.to_arrays()
+    del arrays["struct_vibe_bits"]
+    assert SparseStruct.from_arrays(arrays) is None
+
+
+def test_struct_without_this_layout_is_left_dense():
+    struct = dense_struct(20)
+    assert SparseStruct.from_dense(struct[:, 1:], LAYOUT) is None
+
+    two_hot = struct.copy()
+    two_hot[3, :3] = 1.0
+    assert SparseStruct.from_dense(two_hot, LAYOUT) is None
+
+    weighted_tag = struct.copy()
+    weighted_tag[4, 20] = 0.5
+    assert SparseStruct.from_dense(weighted_tag, LAYOUT) is None
+
+
+def test_query_dimension_is_checked():
+    sparse = SparseStruct.from_dense(dense_struct(5), LAYOUT)
+    with pytest.raises(ValueError):
+        sparse.query(np.zeros(sum(LAYOUT) - 1, dtype=np.float32))
+
+
+def test_engine_ranks_the_same_with_the_dense_matrix(make_engine, queries):
+    engine = make_engine()
+    assert engine.sparse_struct is not None
+    dense = make_engine()
+    dense.sparse_struct = None
+
+    for q in queries:
+        for ann_nprobe in (0, None):
+            results = engine.search(q, ann_nprobe=ann_nprobe)
+            expected = dense.search(q, ann_nprobe=ann_nprobe)
+            assert [(r.venue_id, r.reasons) for r in results] == [(r.venue_id, r.reasons) for r in expected]
+            assert [r.score for r in results] == pytest.approx([r.score for r in expected], rel=1e-5)
@@ -0,0 +1,87 @@
+# backend/tests/test_streaming_scan.py
+
+from __future__ import annotations
+
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+
+from app.services.search_engine import NightTwinSearchEngine, RunningTopK, SearchQueryParams, top_k_indices
+
+
+def stable_top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Reference: a stable sort of the whole array (ties by position)."""
+    return np.argsort(-scores, kind="stable")[:k]
+
+
+@pytest.mark.parametrize("k", [0, 1, 5, 37, 500])
+@pytest.mark.parametrize("block", [1, 16, 100, 1000])
+def test_running_top_k_equals_a_full_stable_sort(k, block):
+    rng = np.random.default_rng(k * 1000 + block)
+    # Few distinct values, so there are ties everywhere (also across blocks)
+    scores = rng.integers(0, 20, 300).astype(np.float32)
+
+    top = RunningTopK(k)
+    for start in range(0, scores.shape[0], block):
+        top.push(scores[start:start + block], start)
+    positions, best = top.result()
+
+    expected = stable_top_k(scores, k)
+    np.testing.assert_array_equal(positions, expected)
+    np.testing.assert_array_equal(best, scores[expected])
+    np.testing.assert_array_equal(top_k_indices(scores, k), expected)
+
+
+def reference_search(
+    engine: NightTwinSearchEngine,
+    q: SearchQueryParams,
+    top_n_nights: int = 100,
+    top_k_venues: int = 5,
+    lambda_struct: float = 1.0,
+) -> List[Tuple[int, float]]:
+    """(venue_id, score) from scoring the whole partition at once in float64, with the dense struct matrix."""
+    m = engine.night_matrix
+    rows = engine._filter_nights_by_query(q)
+    q_unit = engine._query_unit(engine._build_query_embedding(q)).astype(np.float64)
+    query_struct = engine._build_query_struct_features(q).astype(np.float64)
+
+    scores = np.asarray(m.embeddings[rows], dtype=np.float64) @ q_unit
+    scores += lambda_struct * (np.asarray(m.struct[rows], dtype=np.float64) @ query_struct)
+    nights = stable_top_k(scores, top_n_nights)
+
+    venues = m.venue_code_ids[m.venue_codes[rows][nights]]
+    means = {v: float(scores[nights][venues == v].mean()) for v in np.unique(venues).tolist()}
+    ranked = sorted(means.items(), key=lambda item: -item[1])[:top_k_venues]
+    return [(int(v), s) for v, s in ranked]
+
+
+@pytest.mark.parametrize("block_rows", [97, 1024, None])
+def test_block_scan_equals_a_whole_partition_reference(make_engine, queries, block_rows):
+    engine = make_engine()
+    if block_rows is not None:
+        engine.score_block_rows = block_rows
+
+    for q in queries:
+        results = engine.search(q, ann_nprobe=0, top_n_nights=100, lambda_struct=0.5)
+        expected = reference_search(engine, q, lambda_struct=0.5)
+        assert [r.venue_id for r in results] == [v for v, _ in expected]
+        assert [r.score for r in results] == pytest.approx([s for _, s in expected], rel=1e-5)
+
+
+def test_guardrail_counters_do_not_depend_on_the_block_size(make_engine, queries):
+    whole = make_engine()
+    blocked = make_engine()
+    blocked.score_block_rows = 97
+
+    for q in queries:
+        query_struct = whole._build_query_struct_features(q)
+        q_unit = whole._query_unit(whole._build_query_embedding(q))
+        partition = whole._filter_nights_by_query(q)
+        a = whole._scan_candidates(partition, query_struct, q_unit, 1.0, 50)
+        b = blocked._scan_candidates(partition, query_struct, q_unit, 1.0, 50)
+
+        np.testing.assert_array_equal(a.rows, b.rows)
+        assert a.candidates == b.candidates == partition.stop - partition.start
+        assert a.max_semantic == pytest.approx(b.max_semantic, rel=1e-6)
+        assert a.strong_matches == b.strong_matches
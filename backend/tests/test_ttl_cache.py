@@ -0,0 +1,118 @@
+# backend/tests/test_ttl_cache.py
+
+from __future__ import annotations
+
+import asyncio
+from typing import Optional
+
+import numpy as np
+import pytest
+
+from app.services.embedding_cache import QueryEmbeddingCache
+from app.services.ttl_cache import SqliteCacheStore, TTLCache
+
+
+def text_cache(max_entries: int = 8, ttl: float = 10.0, store: Optional[SqliteCacheStore] = None) -> TTLCache[str]:
+    return TTLCache(
+        max_entries=max_entries,
+        ttl_seconds=ttl,
+        store=store,
+        encode=lambda value: value.encode("utf-8"),
+        decode=lambda raw: raw.decode("utf-8"),
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SqliteCacheStore(tmp_path / "cache.sqlite", table="entries")
+    yield store
+    store.close()
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = text_cache(ttl=10.0)
+    cache.set("a", "1")
+    cache.set("b", "2", ttl=30.0)
+
+    clock.now += 9.9
+    assert cache.get("a") == "1"
+    clock.now += 0.1
+    assert cache.get("a") is None
+    assert cache.get("b") == "2"
+    clock.now += 20.0
+    assert cache.get("b") is None
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+
+@pytest.mark.parametrize("ttl", [0.0, -1.0])
+def test_non_positive_ttl_is_not_cached(clock, store, ttl):
+    cache = text_cache(store=store)
+    cache.set("a", "1", ttl=ttl)
+    assert cache.get("a") is None
+    assert store.get("a") is None
+
+
+def test_lru_evicts_least_recently_used(clock):
+    cache = text_cache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # b is now the oldest
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+
+
+def test_store_tier_survives_a_new_cache_and_keeps_the_expiry(clock, store):
+    text_cache(ttl=10.0, store=store).set("a", "1")
+
+    restarted = text_cache(ttl=10.0, store=store)
+    clock.now += 5.0
+    assert restarted.get("a") == "1"
+    assert restarted.stats()["store_hits"] == 1
+
+    # The promoted entry expires when the stored one does, not 10 s from now
+    clock.now += 5.0
+    assert restarted.get("a") is None
+    assert store.get("a") is None
+
+
+def test_undecodable_store_entry_is_a_miss(clock, store):
+    store.set("a", b"\xff", clock.now + 10.0)
+    cache = text_cache(store=store)
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_store_needs_encode_and_decode(store):
+    with pytest.raises(ValueError):
+        TTLCache(max_entries=1, ttl_seconds=1.0, store=store)
+
+
+def test_async_many_matches_sync_paths(clock, store):
+    cache = text_cache(max_entries=0, store=store)  # every read goes to the store
+
+    async def run():
+        await cache.aset_many([("a", "1"), ("b", "2")])
+        await cache.aset("c", "3", ttl=0.0)
+        return await cache.aget_many(["a", "b", "c"]), await cache.aget("a")
+
+    found, a = asyncio.run(run())
+    assert found == {"a": "1", "b": "2"} and a == "1"
+    assert text_cache(store=store).get("b") == "2"
+
+
+def test_query_embedding_cache_is_keyed_by_model_and_normalized_text(clock, tmp_path):
+    cache = QueryEmbeddingCache(max_entries=4, ttl_seconds=10.0, path=tmp_path / "emb.sqlite")
+    emb = np.arange(4, dtype=np.float32)
+    cache.set("Techno  in Belgrade", "model-a", emb)
+
+    cached = cache.get("techno in belgrade", "model-a")
+    np.testing.assert_array_equal(cached, emb)
+    assert not cached.flags.writeable
+    assert cache.get("techno in belgrade", "model-b") is None
+
+    restarted = QueryEmbeddingCache(max_entries=4, ttl_seconds=10.0, path=tmp_path / "emb.sqlite")
+    np.testing.assert_array_equal(restarted.get("Techno in Belgrade", "model-a"), emb)
+    clock.now += 10.0
+    assert QueryEmbeddingCache(path=tmp_path / "emb.sqlite").get("Techno in Belgrade", "model-a") is None
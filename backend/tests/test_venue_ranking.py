@@ -0,0 +1,52 @@
+# backend/tests/test_venue_ranking.py
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.services.search_engine import aggregate_venue_scores, top_k_indices
+
+
+@pytest.mark.parametrize("k", [0, 1, 3, 10, 99, 100, 150])
+@pytest.mark.parametrize("distinct", [3, 20, 1000])
+def test_top_k_indices_equals_a_stable_sort(k, distinct):
+    rng = np.random.default_rng(k + distinct)
+    scores = rng.integers(0, distinct, 100).astype(np.float32)
+    np.testing.assert_array_equal(
+        top_k_indices(scores, k), np.argsort(-scores, kind="stable")[:k]
+    )
+
+
+def test_top_k_indices_of_nothing():
+    assert top_k_indices(np.zeros(0, dtype=np.float32), 5).shape == (0,)
+
+
+@pytest.mark.parametrize("how", ["mean", "max", "softmax"])
+def test_aggregation_equals_per_venue_reference(how):
+    rng = np.random.default_rng(1)
+    scores = rng.normal(size=200).astype(np.float32)
+    venue_codes = rng.integers(0, 15, 200) * 3  # sparse codes, some venues absent
+
+    codes, aggregated = aggregate_venue_scores(scores, venue_codes, how=how, softmax_temperature=0.2)
+
+    np.testing.assert_array_equal(codes, np.unique(venue_codes))
+    for code, value in zip(codes.tolist(), aggregated.tolist()):
+        s = scores[venue_codes == code].astype(np.float64)
+        if how == "mean":
+            expected = s.mean()
+        elif how == "max":
+            expected = s.max()
+        else:
+            weights = np.exp(s / 0.2)
+            expected = (weights * s).sum() / weights.sum()
+        assert value == pytest.approx(expected, rel=1e-9)
+
+
+def test_aggregation_rejects_bad_options():
+    scores = np.ones(3, dtype=np.float32)
+    codes = np.zeros(3, dtype=np.int64)
+    with pytest.raises(ValueError):
+        aggregate_venue_scores(scores, codes, how="median")
+    with pytest.raises(ValueError):
+        aggregate_venue_scores(scores, codes, how="softmax", softmax_temperature=0.0)